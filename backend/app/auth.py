@@ -1,20 +1,37 @@
+import base64
+import hashlib
+import hmac
+import struct
+import time
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional, Dict, Any
+from uuid import UUID
 
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 
 from .config import settings
+from .metrics import ARGON2_DURATION
 
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    with ARGON2_DURATION.time("hash"):
+        return pwd_context.hash(password)
 
 
 def verify_password(password: str, password_hash: str) -> bool:
-    return pwd_context.verify(password, password_hash)
+    with ARGON2_DURATION.time("verify"):
+        return pwd_context.verify(password, password_hash)
+
+
+def check_admin_token(token: Optional[str]) -> bool:
+    """True if `token` matches ADMIN_TOKEN (always False when it isn't set)."""
+    if not settings.ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode())
 
 
 def create_access_token(subject: str) -> str:
@@ -33,3 +50,67 @@ def decode_token(token: str) -> Optional[Dict[str, Any]]:
         return jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALG])
     except JWTError:
         return None
+
+
+# -----------------------------------------------------------------------------
+# Click tokens: short signed user references for the /r/{deal_id} redirect,
+# verified with one HMAC instead of a JWT decode and user lookup.
+# -----------------------------------------------------------------------------
+
+CLICK_TOKEN_SIG_BYTES = 12
+_UUID_ID = b"\x01"  # user id packed as 16 raw UUID bytes
+_RAW_ID = b"\x02"  # user id as UTF-8
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _unb64(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+@lru_cache(maxsize=1)
+def _click_key(secret: str) -> bytes:
+    # Derived from JWT_SECRET so click tokens and JWTs never share a key
+    return hmac.new(secret.encode(), b"click-token", hashlib.sha256).digest()
+
+
+def _click_signature(payload: bytes) -> bytes:
+    key = _click_key(settings.JWT_SECRET)
+    return hmac.new(key, payload, hashlib.sha256).digest()[:CLICK_TOKEN_SIG_BYTES]
+
+
+def create_click_token(user_id: str, ttl_seconds: Optional[int] = None) -> str:
+    if not settings.JWT_SECRET:
+        raise RuntimeError("JWT_SECRET is not set; can't sign click tokens")
+    if ttl_seconds is None:
+        ttl_seconds = settings.CLICK_TOKEN_TTL_SECONDS
+    try:
+        packed = _UUID_ID + UUID(user_id).bytes
+    except ValueError:
+        packed = _RAW_ID + user_id.encode()
+    payload = struct.pack(">I", int(time.time()) + ttl_seconds) + packed
+    return f"{_b64(payload)}.{_b64(_click_signature(payload))}"
+
+
+def verify_click_token(token: str) -> Optional[str]:
+    """Return the user id from a valid, unexpired click token, else None."""
+    if not settings.JWT_SECRET:
+        return None
+    try:
+        payload_part, sig_part = token.split(".", 1)
+        payload, sig = _unb64(payload_part), _unb64(sig_part)
+    except (ValueError, TypeError):
+        return None
+    if len(payload) < 6 or not hmac.compare_digest(sig, _click_signature(payload)):
+        return None
+    (expires,) = struct.unpack(">I", payload[:4])
+    if expires < time.time():
+        return None
+    kind, packed = payload[4:5], payload[5:]
+    if kind == _UUID_ID and len(packed) == 16:
+        return str(UUID(bytes=packed))
+    if kind == _RAW_ID:
+        return packed.decode(errors="replace")
+    return None
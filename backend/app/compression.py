@@ -0,0 +1,219 @@
+"""
+Response compression.
+
+This module handles:
+- Negotiating zstd, brotli or gzip from `Accept-Encoding` (q-values
+  respected, ties broken by COMPRESSION_ENCODINGS order). gzip is always
+  available; brotli and zstd need the `brotli` / `zstandard` packages
+- Compressing text and JSON responses of at least COMPRESSION_MIN_BYTES;
+  smaller bodies don't save enough to pay for the CPU
+- A cache of precompressed bodies for shared-cacheable responses
+  (`Cache-Control: public`, e.g. featured deals). They are compressed
+  once, at a high level, and every later hit is a dict lookup
+
+Responses are compressed whole; streamed bodies (`more_body`) and
+responses that already have a Content-Encoding or say `no-transform`
+are sent unchanged.
+"""
+
+import gzip
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .config import settings
+from .metrics import COMPRESSED_RESPONSES, COMPRESSION_SAVED_BYTES
+
+try:
+    import brotli
+except ImportError:  # optional; see requirements.txt
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional; see requirements.txt
+    zstandard = None
+
+COMPRESSIBLE_TYPES = {
+    b"application/json",
+    b"application/javascript",
+    b"application/xml",
+    b"image/svg+xml",
+}
+
+RawHeaders = List[Tuple[bytes, bytes]]
+
+
+class Encoder(NamedTuple):
+    compress: Callable[[bytes, int], bytes]
+    level: int  # per response, on the request path
+    cached_level: int  # once per cached body, so spend more CPU for a smaller body
+
+
+def _gzip(data: bytes, level: int) -> bytes:
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+ENCODERS: Dict[str, Encoder] = {"gzip": Encoder(_gzip, 6, 9)}
+if brotli is not None:
+    ENCODERS["br"] = Encoder(lambda data, quality: brotli.compress(data, quality=quality), 4, 11)
+if zstandard is not None:
+    ENCODERS["zstd"] = Encoder(lambda data, level: zstandard.ZstdCompressor(level=level).compress(data), 3, 19)
+
+
+def available_encodings(preference: str) -> Tuple[str, ...]:
+    """Encodings from a comma-separated preference list that are installed, in order."""
+    names = (name.strip().lower() for name in preference.split(","))
+    return tuple(name for name in names if name in ENCODERS)
+
+
+@lru_cache(maxsize=256)  # clients send a handful of distinct Accept-Encoding values
+def negotiate(accept_encoding: str, available: Tuple[str, ...]) -> Optional[str]:
+    """The best encoding the client accepts, in server preference order (None: send as-is)."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+    best, best_weight = None, 0.0
+    for name in available:
+        weight = weights.get(name, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+
+def compressible(status: int, headers: Dict[bytes, bytes]) -> bool:
+    """Whether a response (ASGI headers, lowercase names) may be compressed; size is checked separately."""
+    if status < 200 or status in (204, 206, 304):
+        return False
+    if b"content-encoding" in headers or b"no-transform" in headers.get(b"cache-control", b""):
+        return False
+    content_type = headers.get(b"content-type", b"").split(b";")[0].strip().lower()
+    return content_type.startswith(b"text/") or content_type in COMPRESSIBLE_TYPES or content_type.endswith(b"+json")
+
+
+def _with_headers(raw: RawHeaders, vary: bytes, encoding: Optional[str], length: int) -> RawHeaders:
+    """`raw` with Vary and, when compressed, Content-Encoding and Content-Length set."""
+    headers = [(k, v) for k, v in raw if k != b"vary" and not (encoding and k == b"content-length")]
+    headers.append((b"vary", vary))
+    if encoding:
+        headers.append((b"content-encoding", encoding.encode()))
+        headers.append((b"content-length", str(length).encode()))
+    return headers
+
+
+class PrecompressedCache:
+    """Compressed bodies of cacheable responses, keyed by (encoding, body); LRU."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        # Keying by the body itself is cheap for the common case of a route
+        # returning the same cached bytes object: its hash is computed once
+        # and equality short-circuits on identity
+        self._bodies: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, encoding: str, body: bytes) -> bytes:
+        key = (encoding, body)
+        compressed = self._bodies.get(key)
+        if compressed is not None:
+            self._bodies.move_to_end(key)
+            self.hits += 1
+            return compressed
+        self.misses += 1
+        encoder = ENCODERS[encoding]
+        compressed = encoder.compress(body, encoder.cached_level)
+        if self.max_entries > 0:
+            self._bodies[key] = compressed
+            if len(self._bodies) > self.max_entries:
+                self._bodies.popitem(last=False)
+        return compressed
+
+    def __len__(self) -> int:
+        return len(self._bodies)
+
+
+precompressed = PrecompressedCache(settings.COMPRESSION_CACHE_ENTRIES)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses the client can decode."""
+
+    def __init__(
+        self,
+        app,
+        minimum_size: Optional[int] = None,
+        encodings: Optional[Sequence[str]] = None,
+        cache: PrecompressedCache = precompressed,
+    ):
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MIN_BYTES if minimum_size is None else minimum_size
+        self.encodings = available_encodings(settings.COMPRESSION_ENCODINGS) if encodings is None else tuple(encodings)
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.encodings:
+            await self.app(scope, receive, send)
+            return
+
+        accept = b""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value
+                break
+        start: Optional[dict] = None
+        streaming = False
+
+        async def send_wrapper(message):
+            nonlocal start, streaming
+            if message["type"] == "http.response.start":
+                # Held until the body shows whether (and how) to compress
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None or streaming:
+                await send(message)
+                return
+            if message.get("more_body"):
+                streaming = True
+                await send(start)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            raw = start.get("headers", [])
+            headers = dict(raw) if len(body) >= self.minimum_size else None
+            if headers is not None and compressible(start["status"], headers):
+                vary = headers.get(b"vary", b"")
+                if b"accept-encoding" not in vary.lower():
+                    vary = vary + b", Accept-Encoding" if vary else b"Accept-Encoding"
+                encoding = negotiate(accept.decode("latin-1"), self.encodings)
+                if encoding is not None:
+                    cached = b"public" in headers.get(b"cache-control", b"")
+                    if cached:
+                        compressed = self.cache.get(encoding, body)
+                    else:
+                        encoder = ENCODERS[encoding]
+                        compressed = encoder.compress(body, encoder.level)
+                    if len(compressed) < len(body):
+                        COMPRESSED_RESPONSES.inc(encoding, "yes" if cached else "no")
+                        COMPRESSION_SAVED_BYTES.inc(encoding, amount=len(body) - len(compressed))
+                        body = compressed
+                    else:
+                        encoding = None
+                start = {**start, "headers": _with_headers(raw, vary, encoding, len(body))}
+                message = {**message, "body": body}
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
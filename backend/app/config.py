@@ -1,30 +1,81 @@
 import os
 from pathlib import Path
-from dotenv import load_dotenv
-from typing import List
+from typing import Dict, List, Optional
 
-# Load .env file from backend directory
+# Load .env file from backend directory (deployments set the environment directly,
+# so python-dotenv is only imported when there is a file to read)
 backend_dir = Path(__file__).parent.parent
 env_file = backend_dir / ".env"
-load_dotenv(dotenv_path=env_file)
+if env_file.exists():
+    from dotenv import load_dotenv
 
-print(f"[CONFIG] Looking for .env at: {env_file}")
-print(f"[CONFIG] .env exists: {env_file.exists()}")
+    load_dotenv(dotenv_path=env_file)
+
+
+def _optional_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
 
 
 class Settings:
     def __init__(self):
         self.MONGO_URI = os.getenv("MONGO_URI")
         self.MONGO_DB = os.getenv("MONGO_DB")
+        # Connection pool / driver tuning (unset values keep driver defaults)
+        self.MONGO_MAX_POOL_SIZE = _optional_int("MONGO_MAX_POOL_SIZE")
+        self.MONGO_MIN_POOL_SIZE = _optional_int("MONGO_MIN_POOL_SIZE")
+        self.MONGO_MAX_IDLE_TIME_MS = _optional_int("MONGO_MAX_IDLE_TIME_MS")
+        self.MONGO_WAIT_QUEUE_TIMEOUT_MS = _optional_int("MONGO_WAIT_QUEUE_TIMEOUT_MS")
+        self.MONGO_CONNECT_TIMEOUT_MS = _optional_int("MONGO_CONNECT_TIMEOUT_MS")
+        self.MONGO_SOCKET_TIMEOUT_MS = _optional_int("MONGO_SOCKET_TIMEOUT_MS")
+        self.MONGO_SERVER_SELECTION_TIMEOUT_MS = _optional_int("MONGO_SERVER_SELECTION_TIMEOUT_MS")
+        # e.g. "zstd,snappy,zlib" (zstd/snappy need the zstandard/python-snappy packages)
+        self.MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+        self.MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "")  # e.g. "secondaryPreferred"
         self.JWT_SECRET = os.getenv("JWT_SECRET")
         self.JWT_ALG = os.getenv("JWT_ALG", "HS256")
         self.JWT_EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES", "10080"))
+        # Click tokens sit in redirect URLs, so they're kept short-lived
+        self.CLICK_TOKEN_TTL_SECONDS = int(os.getenv("CLICK_TOKEN_TTL_SECONDS", "3600"))
         self.CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:5173")
         self.KLAVIYO_API_KEY = os.getenv("KLAVIYO_API_KEY", "")
-        
-        print(f"[CONFIG] MONGO_URI: {'set' if self.MONGO_URI else 'NOT SET'}")
-        print(f"[CONFIG] JWT_SECRET: {'set' if self.JWT_SECRET else 'NOT SET'}")
-        print(f"[CONFIG] CORS_ORIGINS: {self.CORS_ORIGINS}")
+        # Point at a local stand-in (benchmarks/fake_klaviyo.py) for offline development
+        self.KLAVIYO_BASE_URL = os.getenv("KLAVIYO_BASE_URL", "https://a.klaviyo.com").rstrip("/")
+        # Shared client pool; bursts of background calls wait up to the pool timeout for a connection
+        self.KLAVIYO_MAX_CONNECTIONS = int(os.getenv("KLAVIYO_MAX_CONNECTIONS", "100"))
+        self.KLAVIYO_POOL_TIMEOUT_SECONDS = float(os.getenv("KLAVIYO_POOL_TIMEOUT_SECONDS", "60"))
+        self.USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+        self.USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+        self.USER_CACHE_POLL_SECONDS = float(os.getenv("USER_CACHE_POLL_SECONDS", "2"))
+        self.RECOMMENDATION_RULES_PATH = os.getenv("RECOMMENDATION_RULES_PATH", "")
+        self.EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "100000"))
+        self.EVENT_FLUSH_BATCH = int(os.getenv("EVENT_FLUSH_BATCH", "1000"))
+        self.EVENT_FLUSH_SECONDS = float(os.getenv("EVENT_FLUSH_SECONDS", "1"))
+        # Response compression: preferred encodings (those installed are used; empty disables),
+        # minimum body size, and how many precompressed cacheable bodies to keep
+        self.COMPRESSION_ENCODINGS = os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip")
+        self.COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+        self.COMPRESSION_CACHE_ENTRIES = int(os.getenv("COMPRESSION_CACHE_ENTRIES", "256"))
+        self.LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+        self.LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" lines, or "text" for local development
+        # Tracing is off unless a file and/or OTLP/HTTP endpoint is set
+        self.TRACE_FILE = os.getenv("TRACE_FILE", "")
+        self.TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "")  # e.g. http://127.0.0.1:4318/v1/traces
+        self.TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1"))
+        self.TRACE_EXPORT_SECONDS = float(os.getenv("TRACE_EXPORT_SECONDS", "2"))
+        # Operator endpoints (/debug) are disabled unless ADMIN_TOKEN is set
+        self.ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+        self.PROFILE_DIR = os.getenv("PROFILE_DIR", "")  # SIGUSR2 profiles; default: system temp dir
+        self.PROFILE_SIGNAL_SECONDS = float(os.getenv("PROFILE_SIGNAL_SECONDS", "10"))
+
+    def summary(self) -> Dict[str, str]:
+        """What was configured, without secret values (logged at startup)."""
+        return {
+            "env_file": str(env_file) if env_file.exists() else "none",
+            "MONGO_URI": "set" if self.MONGO_URI else "NOT SET",
+            "JWT_SECRET": "set" if self.JWT_SECRET else "NOT SET",
+            "CORS_ORIGINS": self.CORS_ORIGINS,
+        }
 
     def cors_origins_list(self) -> List[str]:
         return [o.strip() for o in self.CORS_ORIGINS.split(",") if o.strip()]
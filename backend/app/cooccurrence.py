@@ -0,0 +1,144 @@
+"""
+Item-item collaborative filtering for BirdieDeals.
+
+This module handles:
+- Recording deal views/clicks into a sparse deal x deal co-occurrence matrix
+  (updated incrementally, one row pair per event)
+- A precomputed top-k nearest-neighbor table per deal, so online lookups
+  are O(k)
+- Rebuilding the model at startup from the local event store
+  (`app.deal_events`)
+
+Two deals co-occur when the same user interacted with both within their
+recent history window. Similarity is cosine-normalized co-occurrence.
+"""
+
+import heapq
+import logging
+import math
+from collections import OrderedDict, defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from .deal_events import load_events, record_event
+
+logger = logging.getLogger(__name__)
+
+EVENT_WEIGHTS = {"view": 1.0, "click": 3.0}
+HISTORY_SIZE = 20  # recent deals per user that new events co-occur with
+NEIGHBORS_K = 10
+MAX_TRACKED_USERS = 100_000  # LRU bound on in-memory user histories
+LOAD_WINDOW_DAYS = 90
+
+
+class CooccurrenceModel:
+    """Incrementally updated item-item co-occurrence model."""
+
+    def __init__(
+        self,
+        history_size: int = HISTORY_SIZE,
+        k: int = NEIGHBORS_K,
+        max_users: int = MAX_TRACKED_USERS,
+    ):
+        self.history_size = history_size
+        self.k = k
+        self.max_users = max_users
+        # Sparse symmetric matrix: deal_id -> {other_deal_id: weight}
+        self._matrix: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._item_weight: Dict[str, float] = defaultdict(float)
+        self._histories: "OrderedDict[str, Deque[Tuple[str, float]]]" = OrderedDict()
+        self._neighbors: Dict[str, List[Tuple[str, float]]] = {}
+        self._dirty: set = set()
+
+    def record(self, user_id: str, deal_id: str, kind: str = "view") -> None:
+        """Fold one view/click into the matrix."""
+        weight = EVENT_WEIGHTS.get(kind, 1.0)
+        history = self._histories.get(user_id)
+        if history is None:
+            history = deque(maxlen=self.history_size)
+            self._histories[user_id] = history
+            if len(self._histories) > self.max_users:
+                self._histories.popitem(last=False)
+        else:
+            self._histories.move_to_end(user_id)
+
+        self._item_weight[deal_id] += weight
+        self._dirty.add(deal_id)
+        row = self._matrix[deal_id]
+        for other_id, other_weight in history:
+            if other_id == deal_id:
+                continue
+            pair = min(weight, other_weight)
+            row[other_id] = row.get(other_id, 0.0) + pair
+            other_row = self._matrix[other_id]
+            other_row[deal_id] = other_row.get(deal_id, 0.0) + pair
+            self._dirty.add(other_id)
+        history.append((deal_id, weight))
+
+    def _rebuild_row(self, deal_id: str) -> None:
+        norm = self._item_weight.get(deal_id, 0.0)
+        row = self._matrix.get(deal_id)
+        if not row or not norm:
+            self._neighbors[deal_id] = []
+            return
+        scored = (
+            (other_id, count / math.sqrt(norm * self._item_weight[other_id]))
+            for other_id, count in row.items()
+        )
+        self._neighbors[deal_id] = heapq.nlargest(self.k, scored, key=lambda x: x[1])
+
+    def neighbors(self, deal_id: str) -> List[Tuple[str, float]]:
+        """Top-k (deal_id, similarity) for a deal, rebuilding the row only if stale."""
+        if deal_id in self._dirty:
+            self._rebuild_row(deal_id)
+            self._dirty.discard(deal_id)
+        return self._neighbors.get(deal_id, [])
+
+    def rebuild_neighbors(self) -> None:
+        """Refresh every stale row of the neighbor table."""
+        for deal_id in list(self._dirty):
+            self._rebuild_row(deal_id)
+        self._dirty.clear()
+
+    def history(self, user_id: str) -> List[str]:
+        """Most recent deal ids the user interacted with (newest last)."""
+        return [deal_id for deal_id, _ in self._histories.get(user_id, ())]
+
+    def score(self, seed_ids: Iterable[str]) -> Dict[str, float]:
+        """
+        Aggregate neighbor similarities for a set of seed deals.
+
+        Scores are normalized to 0-1; seeds themselves are excluded.
+        """
+        seeds = set(seed_ids)
+        scores: Dict[str, float] = defaultdict(float)
+        for seed in seeds:
+            for other_id, sim in self.neighbors(seed):
+                if other_id not in seeds:
+                    scores[other_id] += sim
+        if not scores:
+            return {}
+        top = max(scores.values())
+        return {deal_id: s / top for deal_id, s in scores.items()}
+
+
+model = CooccurrenceModel()
+
+
+def record_interaction(user_id: str, deal_id: str, kind: str, ts: Optional[datetime] = None) -> None:
+    """Update the in-process model and queue the event for the event store (non-blocking)."""
+    model.record(user_id, deal_id, kind)
+    record_event(user_id, deal_id, kind, ts)
+
+
+async def load_recent_interactions(db, days: int = LOAD_WINDOW_DAYS) -> int:
+    """Rebuild the model from stored events. Returns events loaded."""
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    count = 0
+    async for event in load_events(db, since):
+        if event["kind"] not in EVENT_WEIGHTS or event["user_id"] is None:
+            continue  # impressions and unattributed clicks aren't user interactions
+        model.record(event["user_id"], event["deal_id"], event["kind"])
+        count += 1
+    model.rebuild_neighbors()
+    return count
@@ -1,17 +1,188 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Tuple
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
 from .config import settings
+from .metrics import mongo_command_metrics
+from .tracing import mongo_command_tracer
 
+logger = logging.getLogger(__name__)
 
 _client: AsyncIOMotorClient | None = None
 
 
+class _PoolCounts:
+    """Counters for one server's connection pool."""
+
+    __slots__ = ("max_size", "open", "checked_out", "waiting")
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.open = 0  # connections currently open
+        self.checked_out = 0  # connections in use
+        self.waiting = 0  # checkouts started but not yet completed/failed
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "maxPoolSize": self.max_size,
+            "open": self.open,
+            "checkedOut": self.checked_out,
+            "waitQueue": self.waiting,
+            "utilization": round(self.checked_out / self.max_size, 3) if self.max_size else None,
+        }
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Tracks pool utilization and wait-queue depth from driver pool events.
+
+    The driver keeps one pool per server (`event.address`), each bounded by
+    maxPoolSize, so counts are kept per pool. Events arrive on driver
+    threads, hence the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: Dict[Tuple[str, int], _PoolCounts] = {}
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.max_size = settings.MONGO_MAX_POOL_SIZE or 100  # driver default
+
+    def _pool(self, address) -> _PoolCounts:
+        # Caller holds the lock
+        pool = self._pools.get(address)
+        if pool is None:
+            pool = self._pools[address] = _PoolCounts(self.max_size)
+        return pool
+
+    def _total(self, field: str) -> int:
+        with self._lock:
+            return sum(getattr(pool, field) for pool in self._pools.values())
+
+    @property
+    def open(self) -> int:
+        return self._total("open")
+
+    @property
+    def checked_out(self) -> int:
+        return self._total("checked_out")
+
+    @property
+    def waiting(self) -> int:
+        return self._total("waiting")
+
+    def pool_created(self, event):
+        max_size = event.options.get("maxPoolSize")
+        with self._lock:
+            if max_size:
+                self.max_size = max_size
+            self._pool(event.address).max_size = self.max_size
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass  # closed connections still report connection_closed
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(event.address, None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._pool(event.address).open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._pool(event.address).open -= 1
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self._pool(event.address).waiting += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._pool(event.address).waiting -= 1
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.waiting -= 1
+            pool.checked_out += 1
+            self.checkouts += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._pool(event.address).checked_out -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Totals across pools, with utilization of the busiest pool, plus per-pool counts."""
+        with self._lock:
+            pools = {f"{host}:{port}": pool.snapshot() for (host, port), pool in self._pools.items()}
+            checkouts, failures, max_size = self.checkouts, self.checkout_failures, self.max_size
+        utilizations = [p["utilization"] for p in pools.values() if p["utilization"] is not None]
+        return {
+            "maxPoolSize": max_size,
+            "open": sum(p["open"] for p in pools.values()),
+            "checkedOut": sum(p["checkedOut"] for p in pools.values()),
+            "waitQueue": sum(p["waitQueue"] for p in pools.values()),
+            "utilization": max(utilizations, default=0.0),
+            "checkouts": checkouts,
+            "checkoutFailures": failures,
+            "pools": pools,
+        }
+
+
+pool_stats = PoolStatsListener()
+
+
+def client_options() -> Dict[str, Any]:
+    """Driver options from settings; unset values are left to driver defaults."""
+    options = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": settings.MONGO_SOCKET_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "compressors": settings.MONGO_COMPRESSORS or None,
+        "readPreference": settings.MONGO_READ_PREFERENCE or None,
+    }
+    return {k: v for k, v in options.items() if v is not None}
+
+
 def get_client() -> AsyncIOMotorClient:
     global _client
     if _client is None:
-        _client = AsyncIOMotorClient(settings.MONGO_URI)
+        _client = AsyncIOMotorClient(
+            settings.MONGO_URI,
+            event_listeners=[pool_stats, mongo_command_metrics, mongo_command_tracer],
+            **client_options(),
+        )
     return _client
 
 
 def get_db():
     client = get_client()
     return client[settings.MONGO_DB]
+
+
+async def prewarm_pool() -> int:
+    """
+    Open up to minPoolSize connections before serving traffic.
+
+    Runs that many concurrent pings so the first requests don't pay for
+    connection setup. Returns the number of open connections afterwards.
+    """
+    db = get_db()
+    count = max(1, settings.MONGO_MIN_POOL_SIZE or 1)
+    await asyncio.gather(*(db.command("ping") for _ in range(count)))
+    return pool_stats.open
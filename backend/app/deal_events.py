@@ -0,0 +1,330 @@
+"""
+Local storage and aggregation of deal impression/view/click events.
+
+This module handles:
+- Accepting events into a bounded in-memory ring buffer, so recording an
+  event never waits on MongoDB (when full, the oldest events are dropped
+  and counted)
+- Flushing the buffer in batches to `deal_events`, a time-bucketed
+  collection holding up to BUCKET_MAX_EVENTS events per deal per hour
+- Maintaining pre-aggregated per-deal, per-hour counters in
+  `deal_event_counts` in the same flush, so CTR and ranking queries read
+  a handful of counter documents instead of scanning raw events
+- Retrying only the writes of a flush that weren't applied (a partly
+  failed bulk write, or counters failing after the buckets committed),
+  so a retry doesn't append or count the same events twice, with
+  exponential backoff while MongoDB keeps failing
+- Client-reported timestamps and client event ids (for batched ingestion)
+"""
+
+import asyncio
+import logging
+from collections import Counter, OrderedDict, defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+EVENTS_COLLECTION = "deal_events"
+COUNTS_COLLECTION = "deal_event_counts"
+EVENT_KINDS = ("impression", "view", "click")
+BUCKET_MAX_EVENTS = 1000  # raw events per bucket document
+CLIENT_CLOCK_SKEW = timedelta(minutes=5)  # client timestamps this far ahead are accepted
+CLIENT_MAX_AGE = timedelta(hours=24)  # older client timestamps fall back to receive time
+RECENT_EVENT_IDS = 100_000
+FLUSH_MAX_BACKOFF_SECONDS = 60.0
+FLUSH_MAX_ATTEMPTS = 5  # per unwritten op; server-rejected ops rarely succeed later
+
+
+def hour_bucket(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+class EventBuffer:
+    """Bounded FIFO of pending events; appends are O(1) and never block."""
+
+    def __init__(self, capacity: int = 100_000):
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=capacity)
+        self.capacity = capacity
+        self.appended = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.flush_failures = 0
+        self.ready = asyncio.Event()  # set once a full batch is waiting
+        # Ops of a partly failed flush (collection -> ops), retried before
+        # anything new is drained
+        self.unwritten: Dict[str, List[UpdateOne]] = {}
+        self.unwritten_events = 0
+        self.unwritten_attempts = 0
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def append(self, event: Dict[str, Any], batch_size: int = 0) -> None:
+        if len(self._events) == self.capacity:
+            self.dropped += 1
+        self._events.append(event)
+        self.appended += 1
+        if batch_size and len(self._events) >= batch_size:
+            self.ready.set()
+
+    def drain(self, max_events: int) -> List[Dict[str, Any]]:
+        """Remove and return up to `max_events` of the oldest events."""
+        count = min(max_events, len(self._events))
+        batch = [self._events.popleft() for _ in range(count)]
+        if not self._events:
+            self.ready.clear()
+        return batch
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._events),
+            "capacity": self.capacity,
+            "appended": self.appended,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "flushFailures": self.flush_failures,
+            "unwrittenOps": sum(len(ops) for ops in self.unwritten.values()),
+        }
+
+
+event_buffer = EventBuffer(settings.EVENT_BUFFER_SIZE)
+
+
+def client_time(ts: Optional[datetime], now: datetime) -> datetime:
+    """A client-reported event time in UTC, or `now` if missing or implausible."""
+    if ts is None:
+        return now
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    if ts > now + CLIENT_CLOCK_SKEW or ts < now - CLIENT_MAX_AGE:
+        return now
+    # Hour buckets and counter ids assume UTC; an offset would shift both
+    return ts.astimezone(timezone.utc)
+
+
+class RecentKeys:
+    """Bounded set of recently seen keys, used to drop retried client events."""
+
+    def __init__(self, capacity: int = RECENT_EVENT_IDS):
+        self.capacity = capacity
+        self._keys: "OrderedDict[str, None]" = OrderedDict()
+
+    def add(self, key: str) -> bool:
+        """Remember `key`; returns False if it was already seen."""
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return False
+        self._keys[key] = None
+        if len(self._keys) > self.capacity:
+            self._keys.popitem(last=False)
+        return True
+
+
+recent_event_ids = RecentKeys()
+
+
+def record_event(
+    user_id: Optional[str],
+    deal_id: str,
+    kind: str,
+    ts: Optional[datetime] = None,
+    buffer: EventBuffer = event_buffer,
+) -> None:
+    """Queue one event for the next flush (`user_id` is None for unattributed events)."""
+    buffer.append(
+        {"user_id": user_id, "deal_id": deal_id, "kind": kind, "ts": ts or datetime.now(timezone.utc)},
+        batch_size=settings.EVENT_FLUSH_BATCH,
+    )
+
+
+def build_writes(events: Iterable[Dict[str, Any]]) -> Tuple[List[UpdateOne], List[UpdateOne]]:
+    """
+    Group a batch into one bucket update and one counter update per deal-hour.
+
+    Returns (bucket_ops, counter_ops).
+    """
+    buckets: Dict[Tuple[str, datetime], List[Dict[str, Any]]] = defaultdict(list)
+    counts: Dict[Tuple[str, datetime], Counter] = defaultdict(Counter)
+    for event in events:
+        key = (event["deal_id"], hour_bucket(event["ts"]))
+        buckets[key].append({"u": event["user_id"], "k": event["kind"], "t": event["ts"]})
+        counts[key][event["kind"]] += 1
+
+    bucket_ops = []
+    for (deal_id, hour), items in buckets.items():
+        for start in range(0, len(items), BUCKET_MAX_EVENTS):
+            chunk = items[start:start + BUCKET_MAX_EVENTS]
+            # Bucket pattern: append to this hour's open bucket, or start a new one.
+            # A chunk may take a bucket slightly past the cap; it's never split.
+            bucket_ops.append(UpdateOne(
+                {"deal_id": deal_id, "hour": hour, "n": {"$lt": BUCKET_MAX_EVENTS}},
+                {"$push": {"events": {"$each": chunk}}, "$inc": {"n": len(chunk)}},
+                upsert=True,
+            ))
+
+    counter_ops = [
+        UpdateOne(
+            {"_id": f"{deal_id}:{hour.isoformat()}"},
+            {
+                "$setOnInsert": {"deal_id": deal_id, "hour": hour},
+                "$inc": {kind: n for kind, n in kind_counts.items()},
+            },
+            upsert=True,
+        )
+        for (deal_id, hour), kind_counts in counts.items()
+    ]
+    return bucket_ops, counter_ops
+
+
+async def _bulk_write(db, collection: str, ops: List[UpdateOne]) -> Tuple[List[UpdateOne], Optional[Exception]]:
+    """Run `ops` unordered; returns the ops that weren't applied and the error."""
+    try:
+        await db[collection].bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # Unordered: everything but the reported write errors was applied
+        failed = {error["index"] for error in e.details.get("writeErrors", [])}
+        return [op for i, op in enumerate(ops) if i in failed], e
+    except PyMongoError as e:
+        # Outcome unknown (the driver already retried retryable writes once);
+        # retrying may double-count ops the server did apply
+        return ops, e
+    return [], None
+
+
+async def flush_events(db, buffer: EventBuffer = event_buffer, max_events: Optional[int] = None) -> int:
+    """
+    Write up to `max_events` buffered events. Returns the number written.
+
+    If some of the writes fail, only those are kept (in `buffer.unwritten`)
+    and retried by the next call, before any new events are drained.
+    """
+    if buffer.unwritten:
+        ops, count = buffer.unwritten, buffer.unwritten_events
+    else:
+        batch = buffer.drain(max_events or settings.EVENT_FLUSH_BATCH)
+        if not batch:
+            return 0
+        bucket_ops, counter_ops = build_writes(batch)
+        ops, count = {EVENTS_COLLECTION: bucket_ops, COUNTS_COLLECTION: counter_ops}, len(batch)
+
+    unwritten: Dict[str, List[UpdateOne]] = {}
+    errors = []
+    for collection, collection_ops in ops.items():
+        failed, error = await _bulk_write(db, collection, collection_ops)
+        if failed:
+            unwritten[collection] = failed
+        if error is not None:
+            errors.append(error)
+
+    if not unwritten:
+        buffer.unwritten, buffer.unwritten_attempts = {}, 0
+        buffer.flushed += count
+        return count
+
+    buffer.flush_failures += 1
+    buffer.unwritten_attempts += 1
+    failed_ops = sum(len(o) for o in unwritten.values())
+    if buffer.unwritten_attempts >= FLUSH_MAX_ATTEMPTS:
+        logger.error("Dropping %d deal event writes after %d attempts: %s", failed_ops, FLUSH_MAX_ATTEMPTS, errors[0])
+        buffer.unwritten, buffer.unwritten_attempts = {}, 0
+        buffer.dropped += count
+    else:
+        logger.error("Failed to write %d of the ops for %d deal events: %s", failed_ops, count, errors[0])
+        buffer.unwritten, buffer.unwritten_events = unwritten, count
+    return 0
+
+
+async def run_event_flusher(db, buffer: EventBuffer = event_buffer) -> None:
+    """Flush every EVENT_FLUSH_SECONDS, or sooner when a full batch is waiting."""
+    backoff = settings.EVENT_FLUSH_SECONDS
+    while True:
+        if buffer.unwritten:
+            # MongoDB is failing: wait out the backoff even if a batch is ready
+            await asyncio.sleep(backoff)
+        else:
+            try:
+                await asyncio.wait_for(buffer.ready.wait(), timeout=settings.EVENT_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+        while (len(buffer) or buffer.unwritten) and await flush_events(db, buffer):
+            pass
+        if buffer.unwritten:
+            buffer.ready.clear()
+            backoff = min(backoff * 2, FLUSH_MAX_BACKOFF_SECONDS)
+        else:
+            backoff = settings.EVENT_FLUSH_SECONDS
+
+
+async def drain_events(db, buffer: EventBuffer = event_buffer) -> int:
+    """Flush everything pending (shutdown). Returns the number written."""
+    total = 0
+    while len(buffer) or buffer.unwritten:
+        written = await flush_events(db, buffer)
+        if not written:
+            break
+        total += written
+    return total
+
+
+async def load_events(db, since: datetime):
+    """Yield raw events since `since` in time order (hour buckets sorted per hour)."""
+    cursor = db[EVENTS_COLLECTION].find(
+        {"hour": {"$gte": hour_bucket(since)}},
+        {"_id": 0, "deal_id": 1, "hour": 1, "events": 1},
+    ).sort("hour", 1)
+    hour = None
+    pending: List[Dict[str, Any]] = []
+    async for bucket in cursor:
+        if bucket["hour"] != hour:
+            pending.sort(key=lambda e: e["ts"])
+            for event in pending:
+                yield event
+            hour, pending = bucket["hour"], []
+        for e in bucket["events"]:
+            pending.append({"user_id": e["u"], "deal_id": bucket["deal_id"], "kind": e["k"], "ts": e["t"]})
+    pending.sort(key=lambda e: e["ts"])
+    for event in pending:
+        yield event
+
+
+async def deal_counts(
+    db,
+    since: datetime,
+    until: Optional[datetime] = None,
+    deal_ids: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Views, clicks and CTR per deal from the hourly counters.
+
+    Returns {deal_id: {"view": int, "click": int, "ctr": float | None}}.
+    """
+    match: Dict[str, Any] = {"hour": {"$gte": hour_bucket(since)}}
+    if until is not None:
+        match["hour"]["$lt"] = until
+    if deal_ids is not None:
+        match["deal_id"] = {"$in": deal_ids}
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": "$deal_id", **{kind: {"$sum": f"${kind}"} for kind in EVENT_KINDS}}},
+    ]
+    result = {}
+    async for row in db[COUNTS_COLLECTION].aggregate(pipeline):
+        views, clicks = row.get("view", 0), row.get("click", 0)
+        result[row["_id"]] = {"view": views, "click": clicks, "ctr": round(clicks / views, 4) if views else None}
+    return result
+
+
+async def hourly_counts(db, deal_id: str, hours: int = 24) -> List[Dict[str, Any]]:
+    """Per-hour counters for one deal over the last `hours` hours, oldest first."""
+    since = hour_bucket(datetime.now(timezone.utc) - timedelta(hours=hours - 1))
+    cursor = db[COUNTS_COLLECTION].find(
+        {"deal_id": deal_id, "hour": {"$gte": since}},
+        {"_id": 0, "deal_id": 0},
+    ).sort("hour", 1)
+    return [row async for row in cursor]
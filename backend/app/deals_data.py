@@ -1,9 +1,20 @@
-from typing import Optional
+"""
+Static deal catalog.
+
+The catalog is kept as plain records and validated into `Deal` models on
+first use (`load_catalog()`, also run from the app's lifespan), so
+importing this module stays cheap. FEATURED_DEALS and the DEALS_BY_*
+indexes are filled in place: modules that imported them see the loaded
+catalog, but should call `load_catalog()` (or an accessor below) before
+reading them.
+"""
+
+from typing import Any, Dict, List, Optional
 from .models import Deal
 
-FEATURED_DEALS = [
+_CATALOG: List[Dict[str, Any]] = [
     # Wedges
-    Deal(
+    dict(
         id="d1",
         title="Cleveland RTX ZipCore Wedge (Last Gen)",
         brand="Cleveland",
@@ -16,7 +27,7 @@ FEATURED_DEALS = [
         tags=["value", "last-gen", "spin"],
         expiresAt=None,
     ),
-    Deal(
+    dict(
         id="d10",
         title="Titleist Vokey SM9 Wedge",
         brand="Titleist",
@@ -31,7 +42,7 @@ FEATURED_DEALS = [
     ),
     
     # Drivers
-    Deal(
+    dict(
         id="d2",
         title="Callaway Mavrik Driver (Used - Very Good)",
         brand="Callaway",
@@ -44,7 +55,7 @@ FEATURED_DEALS = [
         tags=["used", "forgiving", "value"],
         expiresAt=None,
     ),
-    Deal(
+    dict(
         id="d11",
         title="TaylorMade Stealth 2 Driver",
         brand="TaylorMade",
@@ -59,7 +70,7 @@ FEATURED_DEALS = [
     ),
     
     # Balls
-    Deal(
+    dict(
         id="d3",
         title="Titleist Pro V1 Practice Balls (Dozen)",
         brand="Titleist",
@@ -72,7 +83,7 @@ FEATURED_DEALS = [
         tags=["practice", "value"],
         expiresAt=None,
     ),
-    Deal(
+    dict(
         id="d12",
         title="Kirkland Signature Golf Balls (2 Dozen)",
         brand="Kirkland",
@@ -87,7 +98,7 @@ FEATURED_DEALS = [
     ),
     
     # Hybrids
-    Deal(
+    dict(
         id="d4",
         title="Ping G430 Hybrid",
         brand="Ping",
@@ -100,7 +111,7 @@ FEATURED_DEALS = [
         tags=["forgiving", "versatile"],
         expiresAt=None,
     ),
-    Deal(
+    dict(
         id="d13",
         title="Callaway Paradym Hybrid (Used)",
         brand="Callaway",
@@ -115,7 +126,7 @@ FEATURED_DEALS = [
     ),
     
     # Fairway Woods
-    Deal(
+    dict(
         id="d5",
         title="Cobra LTDx 3 Wood",
         brand="Cobra",
@@ -130,7 +141,7 @@ FEATURED_DEALS = [
     ),
     
     # Irons
-    Deal(
+    dict(
         id="d6",
         title="Callaway Rogue ST Max Irons (5-PW)",
         brand="Callaway",
@@ -143,7 +154,7 @@ FEATURED_DEALS = [
         tags=["game-improvement", "forgiving", "distance"],
         expiresAt=None,
     ),
-    Deal(
+    dict(
         id="d14",
         title="TaylorMade P790 Irons (Used)",
         brand="TaylorMade",
@@ -158,7 +169,7 @@ FEATURED_DEALS = [
     ),
     
     # Putters
-    Deal(
+    dict(
         id="d7",
         title="Odyssey White Hot OG #1 Putter",
         brand="Odyssey",
@@ -171,7 +182,7 @@ FEATURED_DEALS = [
         tags=["blade", "feel", "classic"],
         expiresAt=None,
     ),
-    Deal(
+    dict(
         id="d15",
         title="Cleveland Huntington Beach Putter",
         brand="Cleveland",
@@ -186,7 +197,7 @@ FEATURED_DEALS = [
     ),
     
     # Apparel
-    Deal(
+    dict(
         id="d8",
         title="FootJoy Pro SL Golf Shoes",
         brand="FootJoy",
@@ -199,7 +210,7 @@ FEATURED_DEALS = [
         tags=["shoes", "comfort", "spikeless"],
         expiresAt=None,
     ),
-    Deal(
+    dict(
         id="d16",
         title="Under Armour Golf Polo (3-Pack)",
         brand="Under Armour",
@@ -214,7 +225,7 @@ FEATURED_DEALS = [
     ),
     
     # Accessories
-    Deal(
+    dict(
         id="d9",
         title="Bushnell Tour V5 Rangefinder",
         brand="Bushnell",
@@ -227,7 +238,7 @@ FEATURED_DEALS = [
         tags=["rangefinder", "tech", "accuracy"],
         expiresAt=None,
     ),
-    Deal(
+    dict(
         id="d17",
         title="Sun Mountain 2.5+ Stand Bag",
         brand="Sun Mountain",
@@ -243,19 +254,48 @@ FEATURED_DEALS = [
 ]
 
 
+# Catalog indexes (built once; the catalog is static). Lists keep catalog order.
+FEATURED_DEALS: List[Deal] = []
+DEALS_BY_ID: Dict[str, Deal] = {}
+DEALS_BY_CATEGORY: Dict[str, List[Deal]] = {}
+DEALS_BY_TAG: Dict[str, List[Deal]] = {}
+_loaded = False
+
+
+def load_catalog() -> List[Deal]:
+    """Validate the catalog and build its indexes, once. Returns FEATURED_DEALS."""
+    global _loaded
+    if _loaded:
+        return FEATURED_DEALS
+    deals = [Deal(**record) for record in _CATALOG]
+    FEATURED_DEALS[:] = deals
+    for deal in deals:
+        DEALS_BY_ID[deal.id] = deal
+        DEALS_BY_CATEGORY.setdefault(deal.category, []).append(deal)
+        for tag in deal.tags or []:
+            DEALS_BY_TAG.setdefault(tag, []).append(deal)
+    _loaded = True
+    return FEATURED_DEALS
+
+
+def get_featured_deals() -> List[Deal]:
+    """All deals, in catalog order."""
+    return load_catalog()
+
+
 def get_deal_by_id(deal_id: str) -> Optional[Deal]:
     """Look up a deal by ID."""
-    for deal in FEATURED_DEALS:
-        if deal.id == deal_id:
-            return deal
-    return None
+    load_catalog()
+    return DEALS_BY_ID.get(deal_id)
 
 
 def get_deals_by_category(category: str) -> list[Deal]:
     """Get all deals in a category."""
-    return [d for d in FEATURED_DEALS if d.category == category]
+    load_catalog()
+    return list(DEALS_BY_CATEGORY.get(category, []))
 
 
 def get_deals_by_tag(tag: str) -> list[Deal]:
     """Get all deals with a specific tag."""
-    return [d for d in FEATURED_DEALS if tag in (d.tags or [])]
+    load_catalog()
+    return list(DEALS_BY_TAG.get(tag, []))
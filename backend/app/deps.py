@@ -1,15 +1,18 @@
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from .db import get_db
-from .auth import decode_token
+from .auth import check_admin_token, decode_token
+from .config import settings
+from . import users_repo
+from .user_cache import user_cache
 
 bearer = HTTPBearer(auto_error=False)
 
 
-async def get_current_user(
-    creds: HTTPAuthorizationCredentials = Depends(bearer),
-):
+def _user_id_from_token(creds: HTTPAuthorizationCredentials) -> str:
     if not creds or not creds.credentials:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing token")
 
@@ -18,10 +21,42 @@ async def get_current_user(
     if not payload or "sub" not in payload:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    user_id = payload["sub"]
-    db = get_db()
-    user = await db.users.find_one({"_id": user_id})
+    return payload["sub"]
+
+
+async def _load_user(user_id: str, projection):
+    # Cached entries hold the public fields, a superset of every auth projection
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    mark = user_cache.mark()
+    user = await users_repo.find_by_id(get_db(), user_id, projection)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-
+    if projection is users_repo.PUBLIC_PROJECTION:
+        # Skipped if an invalidation for this user arrived during the read
+        user_cache.put(user, read_since=mark)
     return user
+
+
+async def get_current_user(
+    creds: HTTPAuthorizationCredentials = Depends(bearer),
+):
+    """Current user's public fields (`_id`, username, email, profile). Read-through cached."""
+    return await _load_user(_user_id_from_token(creds), users_repo.PUBLIC_PROJECTION)
+
+
+async def get_current_user_ref(
+    creds: HTTPAuthorizationCredentials = Depends(bearer),
+):
+    """Current user's `_id` and email, for endpoints that don't need the profile."""
+    return await _load_user(_user_id_from_token(creds), users_repo.REF_PROJECTION)
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """Operator endpoints: need the X-Admin-Token header; hidden when ADMIN_TOKEN is unset."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not check_admin_token(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
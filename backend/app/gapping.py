@@ -0,0 +1,207 @@
+"""
+Bag gapping analysis for BirdieDeals.
+
+This module handles:
+- Estimating carry distances for clubs that don't have `carryYards`, using
+  the club's loft (or its name) and the golfer's `driverCarry` /
+  `sevenIronCarry` anchors
+- Reporting every yardage gap and every overlap in the bag
+
+The analysis is a single sort plus one linear scan over the clubs, so it is
+cheap enough to run on every profile save and in batch jobs over all users.
+"""
+
+import re
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+GAP_THRESHOLD_YARDS = 20  # consecutive clubs further apart than this are a gap
+OVERLAP_THRESHOLD_YARDS = 5  # consecutive clubs this close or closer overlap
+
+# Reference loft (degrees) -> carry (yards) curve for a golfer who carries a
+# 10.5° driver 230 yards and a 7 iron 150 yards. Player carries are estimated
+# by rescaling this curve onto the golfer's own anchors.
+REFERENCE_DRIVER_LOFT = 10.5
+REFERENCE_SEVEN_IRON_LOFT = 31.0
+REFERENCE_DRIVER_CARRY = 230.0
+REFERENCE_SEVEN_IRON_CARRY = 150.0
+_REFERENCE_CURVE: List[Tuple[float, float]] = [
+    (9.0, 235.0),
+    (10.5, 230.0),
+    (15.0, 215.0),
+    (18.0, 205.0),
+    (21.0, 192.0),
+    (24.0, 180.0),
+    (27.0, 168.0),
+    (31.0, 150.0),
+    (35.0, 140.0),
+    (40.0, 130.0),
+    (45.0, 120.0),
+    (50.0, 105.0),
+    (56.0, 90.0),
+    (60.0, 75.0),
+    (64.0, 65.0),
+]
+_CURVE_LOFTS = [loft for loft, _ in _REFERENCE_CURVE]
+
+# Typical lofts for clubs identified only by name
+_NAMED_LOFTS: Dict[str, float] = {
+    "driver": 10.5,
+    "pw": 45.0,
+    "pitching wedge": 45.0,
+    "gw": 50.0,
+    "aw": 50.0,
+    "gap wedge": 50.0,
+    "approach wedge": 50.0,
+    "sw": 56.0,
+    "sand wedge": 56.0,
+    "lw": 60.0,
+    "lob wedge": 60.0,
+}
+_NUMBERED_LOFTS: Dict[str, Dict[int, float]] = {
+    "wood": {2: 13.0, 3: 15.0, 4: 16.5, 5: 18.0, 7: 21.0, 9: 24.0},
+    "hybrid": {2: 17.0, 3: 19.0, 4: 22.0, 5: 25.0, 6: 28.0},
+    "iron": {2: 18.0, 3: 20.0, 4: 22.0, 5: 25.0, 6: 28.0, 7: 31.0, 8: 35.0, 9: 40.0},
+}
+_DEGREES_RE = re.compile(r"(\d{2}(?:\.\d)?)\s*(?:°|deg)")
+_NUMBERED_RE = re.compile(r"(\d)\s*-?\s*(wood|w|hybrid|h|iron|i)\b")
+_NUMBERED_KINDS = {"w": "wood", "h": "hybrid", "i": "iron"}
+
+
+def _loft_from_name(name: str) -> Optional[float]:
+    """Infer a typical loft from a club name like '7 Iron', '4H' or '56° Wedge'."""
+    lowered = name.strip().lower()
+    match = _DEGREES_RE.search(lowered)
+    if match:
+        return float(match.group(1))
+    if lowered in _NAMED_LOFTS:
+        return _NAMED_LOFTS[lowered]
+    match = _NUMBERED_RE.search(lowered)
+    if match:
+        kind = _NUMBERED_KINDS.get(match.group(2), match.group(2))
+        return _NUMBERED_LOFTS[kind].get(int(match.group(1)))
+    return None
+
+
+def _reference_carry(loft: float) -> float:
+    """Piecewise-linear lookup on the reference curve (clamped at the ends)."""
+    i = bisect_left(_CURVE_LOFTS, loft)
+    if i <= 0:
+        return _REFERENCE_CURVE[0][1]
+    if i >= len(_REFERENCE_CURVE):
+        return _REFERENCE_CURVE[-1][1]
+    lo_loft, lo_carry = _REFERENCE_CURVE[i - 1]
+    hi_loft, hi_carry = _REFERENCE_CURVE[i]
+    t = (loft - lo_loft) / (hi_loft - lo_loft)
+    return lo_carry + t * (hi_carry - lo_carry)
+
+
+def estimate_carry(
+    loft: float,
+    driver_carry: Optional[float],
+    seven_iron_carry: Optional[float],
+) -> Optional[int]:
+    """
+    Estimate a carry distance from loft and the golfer's anchor carries.
+
+    Lofts stronger than a 7 iron are mapped linearly between the driver and
+    7 iron anchors; weaker lofts scale with the 7 iron carry. With a single
+    anchor the whole curve is scaled by that anchor. Returns None when
+    neither anchor is known.
+    """
+    if not driver_carry and not seven_iron_carry:
+        return None
+
+    reference = _reference_carry(loft)
+    if driver_carry and seven_iron_carry and loft < REFERENCE_SEVEN_IRON_LOFT:
+        t = (reference - REFERENCE_SEVEN_IRON_CARRY) / (REFERENCE_DRIVER_CARRY - REFERENCE_SEVEN_IRON_CARRY)
+        return round(seven_iron_carry + t * (driver_carry - seven_iron_carry))
+    if seven_iron_carry:
+        return round(reference * seven_iron_carry / REFERENCE_SEVEN_IRON_CARRY)
+    return round(reference * driver_carry / REFERENCE_DRIVER_CARRY)
+
+
+def _classify_gap(upper_carry: float) -> str:
+    if upper_carry >= 200:
+        return "top-of-bag"
+    if upper_carry >= 150:
+        return "mid-bag"
+    return "wedge-gap"
+
+
+def analyze_bag_gapping(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Find every yardage gap and overlap in the golfer's bag.
+
+    Clubs with `carryYards` use it directly. Otherwise the carry is
+    estimated from `loft` (or a loft inferred from the club name) and the
+    profile's `driverCarry` / `sevenIronCarry` anchors. Putters and clubs
+    whose carry can't be determined are left out. Expects a normalized
+    profile (see `app.profile_schema`).
+
+    Returns:
+        {
+            "hasGap": bool,
+            "gapType": "top-of-bag" | "mid-bag" | "wedge-gap" | None,  # first gap from the top
+            "gapDetails": str or None,
+            "gaps": [{"upper", "lower", "upperCarry", "lowerCarry", "yards", "gapType"}, ...],
+            "hasOverlap": bool,
+            "overlaps": [{"upper", "lower", "upperCarry", "lowerCarry", "yards"}, ...],
+            "estimatedClubs": [club names whose carry was estimated],
+        }
+    """
+    driver_carry = profile.get("driverCarry")
+    seven_iron_carry = profile.get("sevenIronCarry")
+
+    carries: List[Tuple[float, str]] = []
+    estimated: List[str] = []
+    for club in profile.get("clubs", []):
+        name = club["name"]
+        if "putter" in name.lower():
+            continue
+        carry = club.get("carryYards")
+        if carry is None:
+            loft = club.get("loft")
+            if loft is None:
+                loft = _loft_from_name(name)
+            if loft is None:
+                continue
+            carry = estimate_carry(loft, driver_carry, seven_iron_carry)
+            if carry is None:
+                continue
+            estimated.append(name)
+        carries.append((carry, name))
+
+    carries.sort(key=lambda c: c[0], reverse=True)
+
+    gaps: List[Dict[str, Any]] = []
+    overlaps: List[Dict[str, Any]] = []
+    for (upper_carry, upper), (lower_carry, lower) in zip(carries, carries[1:]):
+        yards = upper_carry - lower_carry
+        entry = {
+            "upper": upper,
+            "lower": lower,
+            "upperCarry": upper_carry,
+            "lowerCarry": lower_carry,
+            "yards": yards,
+        }
+        if yards > GAP_THRESHOLD_YARDS:
+            entry["gapType"] = _classify_gap(upper_carry)
+            gaps.append(entry)
+        elif yards <= OVERLAP_THRESHOLD_YARDS:
+            overlaps.append(entry)
+
+    first = gaps[0] if gaps else None
+    return {
+        "hasGap": first is not None,
+        "gapType": first["gapType"] if first else None,
+        "gapDetails": (
+            f"{first['yards']} yard gap between {first['upper']} ({first['upperCarry']}y) "
+            f"and {first['lower']} ({first['lowerCarry']}y)"
+            if first else None
+        ),
+        "gaps": gaps,
+        "hasOverlap": bool(overlaps),
+        "overlaps": overlaps,
+        "estimatedClubs": estimated,
+    }
@@ -0,0 +1,131 @@
+"""
+MongoDB index management for BirdieDeals.
+
+Creates the indexes the app and analytics queries rely on:
+- users.email (unique) for register/login lookups
+- users.profile.handicap, profile.preferredBrands, profile.clubs.brand for
+  cohort/analytics queries
+- users.updated_at for the user cache's polling fallback
+- deal_events (deal_id, hour) for appending to hour buckets, and hour for
+  reloading recent events
+- deal_event_counts (hour, deal_id) for CTR/ranking queries
+
+Runs at app startup (creating the indexes, then re-checking them
+periodically; /health reports the result, or "unknown" while MongoDB
+can't be reached) and as a CLI:
+    python -m app.indexes [--check]
+"""
+
+import argparse
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+INDEX_CHECK_SECONDS = 600.0  # re-check after success (e.g. indexes created or dropped by hand)
+INDEX_RETRY_SECONDS = 5.0  # first retry after a failed check; doubles up to INDEX_CHECK_SECONDS
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("profile.handicap", ASCENDING)], name="profile_handicap"),
+        IndexModel([("profile.preferredBrands", ASCENDING)], name="profile_preferred_brands"),
+        IndexModel([("profile.clubs.brand", ASCENDING)], name="profile_clubs_brand"),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ],
+    "deal_events": [
+        IndexModel([("deal_id", ASCENDING), ("hour", ASCENDING)], name="deal_hour"),
+        IndexModel([("hour", ASCENDING)], name="hour"),
+    ],
+    "deal_event_counts": [
+        IndexModel([("hour", ASCENDING), ("deal_id", ASCENDING)], name="hour_deal"),
+        IndexModel([("deal_id", ASCENDING), ("hour", ASCENDING)], name="deal_hour"),
+    ],
+}
+
+# Result of the last check, reported on /health. None until a check has
+# succeeded, and again after one fails (unknown).
+_missing: Optional[List[str]] = None
+
+
+def missing_indexes_snapshot() -> Optional[List[str]]:
+    """Missing indexes found by the last check, None if unknown (no database round trip)."""
+    return _missing
+
+
+async def find_missing_indexes(db) -> List[str]:
+    """Return "collection.index_name" for every expected index that doesn't exist."""
+    global _missing
+    missing = []
+    for collection, models in INDEXES.items():
+        existing = await db[collection].index_information()
+        for model in models:
+            name = model.document["name"]
+            if name not in existing:
+                missing.append(f"{collection}.{name}")
+    _missing = missing
+    return missing
+
+
+async def ensure_indexes(db) -> List[str]:
+    """
+    Create all expected indexes (no-op for ones that already exist).
+
+    Failures are logged per collection (e.g. duplicate emails blocking the
+    unique index) and reflected in the returned list of missing indexes.
+    """
+    for collection, models in INDEXES.items():
+        try:
+            await db[collection].create_indexes(models)
+        except PyMongoError as e:
+            logger.error(f"Failed to create indexes on {collection}: {e}")
+    missing = await find_missing_indexes(db)
+    if missing:
+        logger.warning(f"Missing MongoDB indexes: {missing}")
+    return missing
+
+
+async def run_index_checks(db) -> None:
+    """Create the indexes, then keep `missing_indexes_snapshot` current until cancelled."""
+    global _missing
+    created = False
+    retry = INDEX_RETRY_SECONDS
+    while True:
+        try:
+            if created:
+                await find_missing_indexes(db)
+            else:
+                await ensure_indexes(db)
+                created = True
+            delay, retry = INDEX_CHECK_SECONDS, INDEX_RETRY_SECONDS
+        except PyMongoError as e:
+            _missing = None
+            logger.error(f"Index check failed, retrying in {retry:.0f}s: {e}")
+            delay, retry = retry, min(retry * 2, INDEX_CHECK_SECONDS)
+        await asyncio.sleep(delay)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Create or check MongoDB indexes.")
+    parser.add_argument("--check", action="store_true", help="only report missing indexes")
+    args = parser.parse_args(argv)
+
+    from .db import get_db
+
+    logging.basicConfig(level=logging.INFO)
+    db = get_db()
+    missing = asyncio.run(find_missing_indexes(db) if args.check else ensure_indexes(db))
+    if missing:
+        print("Missing indexes:")
+        for name in missing:
+            print(f"  {name}")
+        raise SystemExit(1)
+    print("All indexes present.")
+
+
+if __name__ == "__main__":
+    main()
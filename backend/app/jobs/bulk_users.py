@@ -0,0 +1,296 @@
+"""
+Bulk import and export of users as JSONL.
+
+Import streams records (one JSON object per line) from a file or stdin:
+- validates each against `RegisterRequest` and the profile against
+  `GolferProfile`; records may carry an existing argon2 `password_hash`
+  instead of a plaintext `password`
+- hashes plaintext passwords in a process pool
+- writes each batch with an unordered `insert_many`, counting duplicate
+  emails instead of failing the batch
+- sends the new users to Klaviyo as bulk profile import jobs
+
+Hashing the next batch overlaps with inserting the previous one, so at most
+two batches are held in memory.
+
+Export streams users with a projected cursor back out in the same format.
+
+Usage:
+    python -m app.jobs.bulk_users import users.jsonl [--batch-size 1000] [--workers 4]
+        [--no-klaviyo] [--errors rejected.jsonl]
+    python -m app.jobs.bulk_users export users.jsonl [--include-password-hash]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from uuid import uuid4
+
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from ..auth import hash_password, pwd_context
+from ..klaviyo import build_klaviyo_profile_properties, bulk_import_profiles
+from ..models import RegisterRequest
+from ..profile_schema import ensure_current, normalize_profile
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+EXPORT_PROJECTION = {"_id": 0, "username": 1, "email": 1, "profile": 1}
+
+
+class InvalidRecord(ValueError):
+    """Raised for import records that fail validation."""
+
+
+def validate_record(record: Any) -> Dict[str, Any]:
+    """
+    Validate one import record and return its normalized fields.
+
+    Returns {"username", "email", "profile", "password"?, "password_hash"?};
+    exactly one of password / password_hash is set.
+    """
+    if not isinstance(record, dict):
+        raise InvalidRecord("Record must be a JSON object")
+
+    password_hash = record.get("password_hash")
+    if password_hash is not None:
+        if not isinstance(password_hash, str) or pwd_context.identify(password_hash) is None:
+            raise InvalidRecord("password_hash is not a supported hash")
+        # Satisfy RegisterRequest's password rules without a plaintext password
+        record = {**record, "password": "x" * 8}
+
+    try:
+        body = RegisterRequest.model_validate(record)
+        profile = normalize_profile(body.profile)
+    except ValidationError as e:
+        raise InvalidRecord(str(e)) from e
+
+    fields = {"username": body.username, "email": body.email.lower(), "profile": profile}
+    if password_hash is not None:
+        fields["password_hash"] = password_hash
+    else:
+        fields["password"] = body.password
+    return fields
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hash a chunk of passwords; runs inside a worker process."""
+    return [hash_password(p) for p in passwords]
+
+
+def iter_records(lines: Iterable[str]) -> Iterator[Tuple[int, Any]]:
+    """Yield (line_number, parsed JSON or the raw line on a parse error)."""
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError:
+            yield line_no, line
+
+
+def export_line(doc: Dict[str, Any]) -> str:
+    """Serialize one exported user as a JSONL line."""
+    return json.dumps(doc, default=str, separators=(",", ":")) + "\n"
+
+
+async def _hash_batch(loop, pool, batch: List[Dict[str, Any]], workers: int) -> None:
+    """Replace plaintext passwords in `batch` with hashes, in parallel."""
+    todo = [fields for fields in batch if "password" in fields]
+    if not todo:
+        return
+    chunk = max(1, -(-len(todo) // workers))
+    chunks = [todo[i:i + chunk] for i in range(0, len(todo), chunk)]
+    hashed = await asyncio.gather(*(
+        loop.run_in_executor(pool, hash_passwords, [f["password"] for f in c]) for c in chunks
+    ))
+    for c, hashes in zip(chunks, hashed):
+        for fields, password_hash in zip(c, hashes):
+            fields["password_hash"] = password_hash
+            del fields["password"]
+
+
+async def _insert_batch(db, batch: List[Dict[str, Any]], stats: Dict[str, int]) -> List[Dict[str, Any]]:
+    """Insert a hashed batch; returns the documents that were written."""
+    now = datetime.now(timezone.utc)
+    docs = [
+        {
+            "_id": str(uuid4()),
+            "username": fields["username"],
+            "email": fields["email"],
+            "password_hash": fields["password_hash"],
+            "profile": fields["profile"],
+            "created_at": now,
+            "updated_at": now,
+        }
+        for fields in batch
+    ]
+    failed = set()
+    try:
+        await db.users.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for err in e.details.get("writeErrors", []):
+            failed.add(err["index"])
+            if err.get("code") == DUPLICATE_KEY:
+                stats["duplicates"] += 1
+            else:
+                stats["failed"] += 1
+                logger.error(f"Insert failed for {docs[err['index']]['email']}: {err.get('errmsg')}")
+    inserted = [doc for i, doc in enumerate(docs) if i not in failed]
+    stats["inserted"] += len(inserted)
+    return inserted
+
+
+async def run_import(
+    db,
+    lines: Iterable[str],
+    batch_size: int = 1000,
+    workers: Optional[int] = None,
+    sync_klaviyo: bool = True,
+    errors: Optional[TextIO] = None,
+) -> Dict[str, int]:
+    """
+    Import users from JSONL lines and return counts.
+
+    Invalid records are skipped (and written to `errors` with the reason
+    when given); duplicate emails are counted, not raised.
+    """
+    loop = asyncio.get_running_loop()
+    stats = {"read": 0, "invalid": 0, "inserted": 0, "duplicates": 0, "failed": 0}
+    workers = workers or os.cpu_count() or 1
+    # spawn keeps workers independent of the parent's MongoDB client threads
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    pending_insert: Optional[asyncio.Task] = None
+
+    async def finish(inserted: List[Dict[str, Any]]) -> None:
+        if sync_klaviyo and inserted:
+            await bulk_import_profiles([
+                {
+                    "user_id": doc["_id"],
+                    "email": doc["email"],
+                    "username": doc["username"],
+                    "properties": build_klaviyo_profile_properties(doc["profile"]),
+                }
+                for doc in inserted
+            ])
+
+    async def flush(batch: List[Dict[str, Any]]) -> None:
+        nonlocal pending_insert
+        await _hash_batch(loop, pool, batch, workers)
+        if pending_insert is not None:
+            await finish(await pending_insert)
+        pending_insert = asyncio.create_task(_insert_batch(db, batch, stats))
+
+    try:
+        batch: List[Dict[str, Any]] = []
+        for line_no, record in iter_records(lines):
+            stats["read"] += 1
+            try:
+                batch.append(validate_record(record))
+            except InvalidRecord as e:
+                stats["invalid"] += 1
+                if errors is not None:
+                    errors.write(json.dumps({"line": line_no, "error": str(e), "record": record}, default=str) + "\n")
+                continue
+            if len(batch) >= batch_size:
+                await flush(batch)
+                batch = []
+        if batch:
+            await flush(batch)
+        if pending_insert is not None:
+            await finish(await pending_insert)
+    finally:
+        pool.shutdown(wait=True)
+
+    logger.info(f"Bulk import complete: {stats}")
+    return stats
+
+
+async def run_export(
+    db,
+    out: TextIO,
+    batch_size: int = 1000,
+    include_password_hash: bool = False,
+) -> int:
+    """Stream all users to `out` as JSONL; returns the number written."""
+    projection = dict(EXPORT_PROJECTION)
+    if include_password_hash:
+        projection["password_hash"] = 1
+    count = 0
+    cursor = db.users.find({}, projection, batch_size=batch_size)
+    async for doc in cursor:
+        doc["profile"] = ensure_current(doc.get("profile"))
+        out.write(export_line(doc))
+        count += 1
+    logger.info(f"Bulk export complete: {count} users")
+    return count
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Bulk import or export users as JSONL.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import", help="import users from JSONL ('-' for stdin)")
+    imp.add_argument("path")
+    imp.add_argument("--batch-size", type=int, default=1000)
+    imp.add_argument("--workers", type=int, default=None)
+    imp.add_argument("--no-klaviyo", action="store_true", help="skip Klaviyo profile imports")
+    imp.add_argument("--errors", help="write rejected records to this JSONL file")
+
+    exp = sub.add_parser("export", help="export users to JSONL ('-' for stdout)")
+    exp.add_argument("path")
+    exp.add_argument("--batch-size", type=int, default=1000)
+    exp.add_argument("--include-password-hash", action="store_true")
+
+    args = parser.parse_args(argv)
+
+    from ..db import get_db
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    db = get_db()
+
+    if args.command == "import":
+        src = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8")
+        errors = open(args.errors, "w", encoding="utf-8") if args.errors else None
+        try:
+            stats = asyncio.run(run_import(
+                db,
+                src,
+                batch_size=args.batch_size,
+                workers=args.workers,
+                sync_klaviyo=not args.no_klaviyo,
+                errors=errors,
+            ))
+        finally:
+            if src is not sys.stdin:
+                src.close()
+            if errors is not None:
+                errors.close()
+        print(json.dumps(stats, indent=2), file=sys.stderr)
+    else:
+        out = sys.stdout if args.path == "-" else open(args.path, "w", encoding="utf-8")
+        try:
+            count = asyncio.run(run_export(
+                db,
+                out,
+                batch_size=args.batch_size,
+                include_password_hash=args.include_password_hash,
+            ))
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        print(f"Exported {count} users", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Offline cohort analysis over the users collection.
+
+Streams every user profile with a projected cursor, runs the bag/risk
+computations from `app.klaviyo` in a process pool, and writes:
+- per-user flags to `users.analytics` (unordered bulk writes)
+- aggregated cohort counts to the `cohort_stats` collection
+
+Memory stays bounded: at most `max_in_flight` batches are held at once.
+
+Usage:
+    python -m app.jobs.cohort_analysis [--batch-size 1000] [--workers 4] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from ..klaviyo import compute_gapping_risk, compute_wedge_wear_risk
+from ..profile_schema import ensure_current
+
+logger = logging.getLogger(__name__)
+
+USER_PROJECTION = {"profile": 1}
+COHORT_STATS_COLLECTION = "cohort_stats"
+
+
+def compute_user_flags(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Derive the per-user analytics flags stored on `users.analytics`."""
+    gapping = compute_gapping_risk(profile)
+    return {
+        "wedgeWearRisk": compute_wedge_wear_risk(profile),
+        "hasGap": gapping["hasGap"],
+        "gapTypes": sorted({g["gapType"] for g in gapping["gaps"]}),
+        "gapCount": len(gapping["gaps"]),
+        "hasOverlap": gapping["hasOverlap"],
+        "overlapCount": len(gapping["overlaps"]),
+    }
+
+
+def analyze_batch(
+    batch: List[Tuple[str, Dict[str, Any]]],
+) -> Tuple[List[Tuple[str, Dict[str, Any]]], Counter]:
+    """
+    Compute flags for a batch of (user_id, profile) pairs.
+
+    Runs inside a worker process, so cohort counts for the batch are
+    aggregated here and only the small Counter crosses back.
+    """
+    results = []
+    counts: Counter = Counter()
+    for user_id, profile in batch:
+        flags = compute_user_flags(ensure_current(profile))
+        results.append((user_id, flags))
+
+        counts["users"] += 1
+        if flags["wedgeWearRisk"]:
+            counts[f"wedgeWearRisk:{flags['wedgeWearRisk']}"] += 1
+        if flags["hasGap"]:
+            counts["hasGap"] += 1
+        for gap_type in flags["gapTypes"]:
+            counts[f"gapType:{gap_type}"] += 1
+        if flags["hasOverlap"]:
+            counts["hasOverlap"] += 1
+    return results, counts
+
+
+async def _write_flags(db, results: List[Tuple[str, Dict[str, Any]]], now: datetime) -> None:
+    if not results:
+        return
+    ops = [
+        UpdateOne({"_id": user_id}, {"$set": {"analytics": flags, "analytics_updated_at": now}})
+        for user_id, flags in results
+    ]
+    await db.users.bulk_write(ops, ordered=False)
+
+
+async def run_cohort_analysis(
+    db,
+    batch_size: int = 1000,
+    workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    write_flags: bool = True,
+) -> Dict[str, int]:
+    """
+    Stream all users through the analysis and return aggregated cohort counts.
+
+    The counts are also stored in `cohort_stats` unless `write_flags` is False.
+    """
+    loop = asyncio.get_running_loop()
+    now = datetime.now(timezone.utc)
+    counts: Counter = Counter()
+    # spawn keeps workers independent of the parent's MongoDB client threads
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    pending = set()
+
+    async def drain(return_when: str) -> None:
+        nonlocal pending
+        done, pending = await asyncio.wait(pending, return_when=return_when)
+        for fut in done:
+            results, batch_counts = fut.result()
+            counts.update(batch_counts)
+            if write_flags:
+                await _write_flags(db, results, now)
+
+    try:
+        batch: List[Tuple[str, Dict[str, Any]]] = []
+        cursor = db.users.find({}, USER_PROJECTION, batch_size=batch_size)
+        async for doc in cursor:
+            batch.append((doc["_id"], doc.get("profile") or {}))
+            if len(batch) < batch_size:
+                continue
+            pending.add(loop.run_in_executor(pool, analyze_batch, batch))
+            batch = []
+            if len(pending) >= max_in_flight:
+                await drain(asyncio.FIRST_COMPLETED)
+
+        if batch:
+            pending.add(loop.run_in_executor(pool, analyze_batch, batch))
+        if pending:
+            await drain(asyncio.ALL_COMPLETED)
+    finally:
+        pool.shutdown(wait=True)
+
+    result = dict(counts)
+    if write_flags:
+        await db[COHORT_STATS_COLLECTION].insert_one({"created_at": now, "counts": result})
+    logger.info("Cohort analysis complete: %d users", result.get("users", 0))
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run cohort bag analysis over all users.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true", help="compute counts without writing")
+    args = parser.parse_args(argv)
+
+    from ..db import get_db
+
+    logging.basicConfig(level=logging.INFO)
+    counts = asyncio.run(
+        run_cohort_analysis(
+            get_db(),
+            batch_size=args.batch_size,
+            workers=args.workers,
+            write_flags=not args.dry_run,
+        )
+    )
+    print(json.dumps(counts, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
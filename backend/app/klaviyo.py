@@ -4,21 +4,64 @@ Klaviyo integration service for BirdieDeals.
 This module handles:
 - Creating/updating customer profiles with golf-specific properties
 - Tracking events (Account Created, Bag Updated, Gap Detected, etc.)
+- One shared HTTP client per worker, created on first use (building a
+  client loads the CA bundle, which takes tens of milliseconds) and
+  closed at shutdown
 
 Klaviyo API docs: https://developers.klaviyo.com/en/reference/api-overview
 """
 
-import httpx
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set
 from datetime import datetime, timezone
 import logging
+import time
 
 from .config import settings
+from .gapping import analyze_bag_gapping
+from .metrics import KLAVIYO_REQUEST_DURATION, background_task
+from .tracing import span
+
+if TYPE_CHECKING:
+    import httpx
 
 logger = logging.getLogger(__name__)
 
-KLAVIYO_BASE_URL = "https://a.klaviyo.com"
 KLAVIYO_REVISION = "2025-01-15"  # API revision header
+KLAVIYO_TIMEOUT_SECONDS = 10.0
+KLAVIYO_BULK_TIMEOUT_SECONDS = 30.0
+
+_client: Optional["httpx.AsyncClient"] = None
+
+
+def _timeout(seconds: float) -> "httpx.Timeout":
+    import httpx
+
+    # Calls are background work, so waiting for a pooled connection during a
+    # burst is better than failing after the request timeout
+    return httpx.Timeout(seconds, pool=settings.KLAVIYO_POOL_TIMEOUT_SECONDS)
+
+
+def get_client() -> "httpx.AsyncClient":
+    """The shared Klaviyo HTTP client (httpx is imported on first use, not at startup)."""
+    global _client
+    if _client is None:
+        import httpx
+
+        # Keep every pooled connection alive; reconnecting means a new TLS handshake
+        limits = httpx.Limits(
+            max_connections=settings.KLAVIYO_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.KLAVIYO_MAX_CONNECTIONS,
+        )
+        _client = httpx.AsyncClient(timeout=_timeout(KLAVIYO_TIMEOUT_SECONDS), limits=limits)
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared client (app shutdown)."""
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
 
 
 def _headers() -> Dict[str, str]:
@@ -31,6 +74,23 @@ def _headers() -> Dict[str, str]:
     }
 
 
+async def _post(path: str, payload: Dict[str, Any], timeout: float = KLAVIYO_TIMEOUT_SECONDS) -> "httpx.Response":
+    """POST to the Klaviyo API, recording latency per endpoint and a trace span."""
+    start = time.perf_counter()
+    status = "error"
+    with span(f"klaviyo POST {path}", "client", **{"http.method": "POST", "http.route": path}) as s:
+        try:
+            resp = await get_client().post(
+                f"{settings.KLAVIYO_BASE_URL}{path}", headers=_headers(), json=payload, timeout=_timeout(timeout),
+            )
+            status = str(resp.status_code)
+            return resp
+        finally:
+            KLAVIYO_REQUEST_DURATION.observe(time.perf_counter() - start, path, status)
+            if s is not None:
+                s.attributes["http.status_code"] = status
+
+
 # -----------------------------------------------------------------------------
 # Profile property computation (golf-specific derived scores)
 # -----------------------------------------------------------------------------
@@ -61,61 +121,62 @@ def compute_wedge_wear_risk(profile: Dict[str, Any]) -> Optional[str]:
 
 def compute_gapping_risk(profile: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Detect gaps in the bag based on club yardages.
+    Detect gaps and overlaps in the bag based on club yardages.
     
-    Only analyzes clubs that have carryYards data (e.g., drivers, woods).
-    Clubs without carry distance (irons, putters) are skipped.
+    Clubs without carryYards have their carry estimated from loft and the
+    driverCarry/sevenIronCarry anchors (see `app.gapping`).
     
     Returns:
         {
             "hasGap": bool,
             "gapType": "top-of-bag" | "mid-bag" | "wedge-gap" | None,
-            "gapDetails": str or None
+            "gapDetails": str or None,
+            "gaps": [...],
+            "hasOverlap": bool,
+            "overlaps": [...],
+            "estimatedClubs": [...]
         }
     """
-    clubs = profile.get("clubs", [])
-    if not clubs:
-        return {"hasGap": False, "gapType": None, "gapDetails": None}
-    
-    # Only analyze clubs with carryYards data
-    clubs_with_carry = [c for c in clubs if c.get("carryYards") is not None]
-    if len(clubs_with_carry) < 2:
-        # Not enough data to detect gaps
-        return {"hasGap": False, "gapType": None, "gapDetails": None}
-    
-    sorted_clubs = sorted(clubs_with_carry, key=lambda c: c["carryYards"], reverse=True)
-    
-    # Check for gaps > 20 yards between consecutive clubs
-    for i in range(len(sorted_clubs) - 1):
-        upper = sorted_clubs[i]
-        lower = sorted_clubs[i + 1]
-        gap = upper["carryYards"] - lower["carryYards"]
-        
-        if gap > 20:
-            upper_carry = upper["carryYards"]
-            # Determine gap type based on yardage
-            if upper_carry >= 200:
-                gap_type = "top-of-bag"
-            elif upper_carry >= 150:
-                gap_type = "mid-bag"
-            else:
-                gap_type = "wedge-gap"
-            
-            return {
-                "hasGap": True,
-                "gapType": gap_type,
-                "gapDetails": f"{gap} yard gap between {upper.get('name', 'club')} ({upper_carry}y) and {lower.get('name', 'club')} ({lower['carryYards']}y)"
-            }
-    
-    return {"hasGap": False, "gapType": None, "gapDetails": None}
-
-
-def build_klaviyo_profile_properties(profile: Dict[str, Any]) -> Dict[str, Any]:
+    return analyze_bag_gapping(profile)
+
+
+# Profile fields each derived property depends on
+GAPPING_FIELDS = {"clubs", "driverCarry", "sevenIronCarry"}
+WEDGE_WEAR_FIELDS = {"roundsPerMonth"}
+
+# Klaviyo property -> profile field it is copied from
+_PROPERTY_SOURCES = {
+    "handicap": "handicap",
+    "driver_carry": "driverCarry",
+    "seven_iron_carry": "sevenIronCarry",
+    "rounds_per_month": "roundsPerMonth",
+    "months_per_year": "monthsPlayedPerYear",
+    "region": "region",
+    "age_range": "ageRange",
+    "dominant_hand": "dominantHand",
+    "years_playing": "yearsPlaying",
+    "budget_preference": "budgetSensitivity",
+    "buy_used_preference": "willingToBuyUsed",
+    "preferred_brands": "preferredBrands",
+}
+
+
+def build_klaviyo_profile_properties(
+    profile: Dict[str, Any],
+    changed_fields: Optional[Set[str]] = None,
+) -> Dict[str, Any]:
     """
     Extract and compute Klaviyo profile properties from the golfer profile.
     
     Only includes fields that are actually present in the profile (not None).
+    If `changed_fields` is given, only properties derived from those profile
+    fields are built (Klaviyo merges partial property updates), and ones
+    whose source is now empty (unset, or no clubs left) are sent as None so
+    Klaviyo clears the old value.
     """
+    def changed(fields: Set[str]) -> bool:
+        return changed_fields is None or not changed_fields.isdisjoint(fields)
+    
     props = {}
     
     # Core golf profile fields - only if present and not None
@@ -148,26 +209,42 @@ def build_klaviyo_profile_properties(profile: Dict[str, Any]) -> Dict[str, Any]:
     if profile.get("preferredBrands"):
         props["preferred_brands"] = profile["preferredBrands"]
     
-    # Computed risk scores (only if we have data)
-    wedge_risk = compute_wedge_wear_risk(profile)
-    if wedge_risk:
-        props["wedge_wear_risk"] = wedge_risk
+    if changed_fields is not None:
+        props = {
+            prop: props.get(prop)  # None clears a property whose field was removed
+            for prop, field in _PROPERTY_SOURCES.items()
+            if field in changed_fields
+        }
     
-    gapping = compute_gapping_risk(profile)
-    if gapping["hasGap"]:
-        props["has_gapping_issue"] = True
-        props["gap_type"] = gapping["gapType"]
-    else:
-        props["has_gapping_issue"] = False
+    # Computed risk scores (only if we have data)
+    if changed(WEDGE_WEAR_FIELDS):
+        wedge_risk = compute_wedge_wear_risk(profile)
+        if wedge_risk:
+            props["wedge_wear_risk"] = wedge_risk
+        elif changed_fields is not None:
+            props["wedge_wear_risk"] = None
+    
+    if changed(GAPPING_FIELDS):
+        gapping = compute_gapping_risk(profile)
+        if gapping["hasGap"]:
+            props["has_gapping_issue"] = True
+            props["gap_type"] = gapping["gapType"]
+        else:
+            props["has_gapping_issue"] = False
+            if changed_fields is not None:
+                props["gap_type"] = None
+        props["gap_count"] = len(gapping["gaps"])
+        props["overlap_count"] = len(gapping["overlaps"])
     
     # Club count
     clubs = profile.get("clubs", [])
-    if clubs:
+    if clubs and changed({"clubs"}):
         props["club_count"] = len(clubs)
         # List club types
-        club_names = [c.get("name") for c in clubs if c.get("name")]
-        if club_names:
-            props["club_types"] = club_names
+        props["club_types"] = [c["name"] for c in clubs]
+    elif changed_fields is not None and "clubs" in changed_fields:
+        props["club_count"] = None
+        props["club_types"] = None
     
     return props
 
@@ -190,7 +267,7 @@ async def upsert_profile(
     Returns the Klaviyo profile ID on success, None on failure.
     """
     if not settings.KLAVIYO_API_KEY:
-        logger.warning("KLAVIYO_API_KEY not set, skipping profile upsert")
+        logger.warning("KLAVIYO_API_KEY not set, skipping Klaviyo calls", extra={"sample": 1000})
         return None
     
     properties = profile_properties or {}
@@ -212,30 +289,72 @@ async def upsert_profile(
         payload["data"]["attributes"]["first_name"] = username
     
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.post(
-                f"{KLAVIYO_BASE_URL}/api/profile-import",
-                headers=_headers(),
-                json=payload,
-            )
-            
-            if resp.status_code in (200, 201, 202):
-                data = resp.json()
-                profile_id = data.get("data", {}).get("id")
-                logger.info(f"Klaviyo profile upserted: {profile_id}")
-                return profile_id
-            else:
-                logger.error(f"Klaviyo profile upsert failed: {resp.status_code} {resp.text}")
-                return None
+        resp = await _post("/api/profile-import", payload)
+        
+        if resp.status_code in (200, 201, 202):
+            data = resp.json()
+            profile_id = data.get("data", {}).get("id")
+            logger.debug("Klaviyo profile upserted: %s", profile_id)
+            return profile_id
+        else:
+            logger.error("Klaviyo profile upsert failed: %s %s", resp.status_code, resp.text)
+            return None
     except Exception as e:
-        logger.error(f"Klaviyo profile upsert error: {e}")
+        logger.error("Klaviyo profile upsert error: %s", e)
         return None
 
 
+KLAVIYO_BULK_IMPORT_MAX_PROFILES = 10_000  # per job, per Klaviyo limits
+
+
+async def bulk_import_profiles(profiles: List[Dict[str, Any]]) -> List[str]:
+    """
+    Create or update many Klaviyo profiles with bulk import jobs.
+    
+    Each item is {"user_id", "email", "username"?, "properties"?}. Profiles
+    are sent in jobs of up to KLAVIYO_BULK_IMPORT_MAX_PROFILES.
+    Returns the IDs of the jobs that were accepted.
+    """
+    if not settings.KLAVIYO_API_KEY:
+        logger.warning("KLAVIYO_API_KEY not set, skipping Klaviyo calls", extra={"sample": 1000})
+        return []
+    
+    job_ids = []
+    for start in range(0, len(profiles), KLAVIYO_BULK_IMPORT_MAX_PROFILES):
+        chunk = profiles[start:start + KLAVIYO_BULK_IMPORT_MAX_PROFILES]
+        data = []
+        for p in chunk:
+            attributes = {
+                "email": p["email"],
+                "external_id": p["user_id"],
+                "properties": {**(p.get("properties") or {}), "birdiedeals_user_id": p["user_id"]},
+            }
+            if p.get("username"):
+                attributes["first_name"] = p["username"]
+            data.append({"type": "profile", "attributes": attributes})
+        payload = {
+            "data": {
+                "type": "profile-bulk-import-job",
+                "attributes": {"profiles": {"data": data}},
+            }
+        }
+        try:
+            resp = await _post("/api/profile-bulk-import-jobs", payload, timeout=KLAVIYO_BULK_TIMEOUT_SECONDS)
+            if resp.status_code in (200, 201, 202):
+                job_id = resp.json().get("data", {}).get("id")
+                logger.info("Klaviyo bulk import job created: %s (%d profiles)", job_id, len(chunk))
+                job_ids.append(job_id)
+            else:
+                logger.error("Klaviyo bulk import failed: %s %s", resp.status_code, resp.text)
+        except Exception as e:
+            logger.error("Klaviyo bulk import error: %s", e)
+    return job_ids
+
+
 async def track_event(
     event_name: str,
     user_id: str,
-    email: str,
+    email: Optional[str],
     properties: Optional[Dict[str, Any]] = None,
     value: Optional[float] = None,
 ) -> bool:
@@ -253,10 +372,14 @@ async def track_event(
     Returns True on success, False on failure.
     """
     if not settings.KLAVIYO_API_KEY:
-        logger.warning("KLAVIYO_API_KEY not set, skipping event tracking")
+        logger.warning("KLAVIYO_API_KEY not set, skipping Klaviyo calls", extra={"sample": 1000})
         return False
     
     event_props = properties or {}
+    # Without an email (e.g. redirect clicks) Klaviyo matches the profile by external_id
+    profile_attributes = {"external_id": user_id}
+    if email:
+        profile_attributes["email"] = email
     
     payload = {
         "data": {
@@ -273,10 +396,7 @@ async def track_event(
                 "profile": {
                     "data": {
                         "type": "profile",
-                        "attributes": {
-                            "email": email,
-                            "external_id": user_id,
-                        }
+                        "attributes": profile_attributes,
                     }
                 },
                 "properties": event_props,
@@ -289,21 +409,80 @@ async def track_event(
         payload["data"]["attributes"]["value"] = value
     
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.post(
-                f"{KLAVIYO_BASE_URL}/api/events",
-                headers=_headers(),
-                json=payload,
-            )
-            
-            if resp.status_code in (200, 201, 202):
-                logger.info(f"Klaviyo event tracked: {event_name} for {email}")
-                return True
-            else:
-                logger.error(f"Klaviyo event tracking failed: {resp.status_code} {resp.text}")
-                return False
+        resp = await _post("/api/events", payload)
+        
+        if resp.status_code in (200, 201, 202):
+            logger.debug("Klaviyo event tracked: %s", event_name, extra={"user_id": user_id})
+            return True
+        else:
+            logger.error("Klaviyo event tracking failed: %s %s", resp.status_code, resp.text)
+            return False
+    except Exception as e:
+        logger.error("Klaviyo event tracking error: %s", e)
+        return False
+
+
+async def track_events_bulk(
+    user_id: str,
+    email: str,
+    events: List[Dict[str, Any]],
+) -> bool:
+    """
+    Track several events for one profile with a single bulk create job.
+    
+    Each event is {"name", "properties", "time", "value"?, "unique_id"?}.
+    Returns True on success, False on failure.
+    """
+    if not settings.KLAVIYO_API_KEY:
+        logger.warning("KLAVIYO_API_KEY not set, skipping Klaviyo calls", extra={"sample": 1000})
+        return False
+    if not events:
+        return True
+    
+    event_data = []
+    for event in events:
+        attributes = {
+            "metric": {"data": {"type": "metric", "attributes": {"name": event["name"]}}},
+            "properties": event.get("properties") or {},
+            "time": event["time"],
+        }
+        if event.get("value") is not None:
+            attributes["value"] = event["value"]
+        if event.get("unique_id"):
+            attributes["unique_id"] = event["unique_id"]
+        event_data.append({"type": "event", "attributes": attributes})
+    
+    payload = {
+        "data": {
+            "type": "event-bulk-create-job",
+            "attributes": {
+                "events-bulk-create": {
+                    "data": [{
+                        "type": "event-bulk-create",
+                        "attributes": {
+                            "profile": {
+                                "data": {
+                                    "type": "profile",
+                                    "attributes": {"email": email, "external_id": user_id},
+                                }
+                            },
+                            "events": {"data": event_data},
+                        },
+                    }]
+                }
+            },
+        }
+    }
+    
+    try:
+        resp = await _post("/api/event-bulk-create-jobs", payload)
+        if resp.status_code in (200, 201, 202):
+            logger.debug("Klaviyo bulk events tracked: %d", len(events), extra={"user_id": user_id})
+            return True
+        logger.error("Klaviyo bulk event tracking failed: %s %s", resp.status_code, resp.text)
+        return False
     except Exception as e:
-        logger.error(f"Klaviyo event tracking error: {e}")
+        logger.error("Klaviyo bulk event tracking error: %s", e)
         return False
 
 
@@ -312,6 +491,7 @@ async def track_event(
 # -----------------------------------------------------------------------------
 
 
+@background_task
 async def on_account_created(
     user_id: str,
     email: str,
@@ -324,12 +504,11 @@ async def on_account_created(
     1. Upserts Klaviyo profile with golf properties
     2. Tracks 'Account Created' event
     """
-    logger.info(f"[KLAVIYO] on_account_created called for: {email} (user_id={user_id})")
     props = build_klaviyo_profile_properties(profile)
-    logger.info(f"[KLAVIYO] Built profile properties: {props}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[KLAVIYO] Profile properties: %s", sorted(props), extra={"user_id": user_id})
     
     profile_id = await upsert_profile(user_id, email, username, props)
-    logger.info(f"[KLAVIYO] Profile upserted: {profile_id}")
     
     event_result = await track_event(
         event_name="Account Created",
@@ -340,13 +519,18 @@ async def on_account_created(
             "has_profile": bool(profile),
         },
     )
-    logger.info(f"[KLAVIYO] Account Created event tracked: {event_result}")
+    logger.info(
+        "[KLAVIYO] Account synced",
+        extra={"user_id": user_id, "profile_id": profile_id, "event_tracked": event_result},
+    )
 
 
+@background_task
 async def on_bag_updated(
     user_id: str,
     email: str,
     profile: Dict[str, Any],
+    changed_fields: Optional[Set[str]] = None,
 ) -> None:
     """
     Called after a user updates their bag/profile.
@@ -354,22 +538,32 @@ async def on_bag_updated(
     1. Updates Klaviyo profile properties
     2. Tracks 'Bag Updated' event
     3. If gap detected, also tracks 'Gap Detected' event
+    
+    With `changed_fields` (from a partial update), only the affected
+    properties are sent and gap detection is skipped unless a field it
+    depends on changed.
     """
-    props = build_klaviyo_profile_properties(profile)
+    props = build_klaviyo_profile_properties(profile, changed_fields)
     await upsert_profile(user_id, email, profile_properties=props)
     
     # Track bag update
+    event_props = {
+        "club_count": len(profile.get("clubs", [])),
+        "handicap": profile.get("handicap"),
+        "budget_preference": profile.get("budgetSensitivity"),
+    }
+    if changed_fields is not None:
+        event_props["changed_fields"] = sorted(changed_fields)
     await track_event(
         event_name="Bag Updated",
         user_id=user_id,
         email=email,
-        properties={
-            "club_count": len(profile.get("clubs", [])),
-            "handicap": profile.get("handicap"),
-            "budget_preference": profile.get("budgetSensitivity"),
-        },
+        properties=event_props,
     )
     
+    if changed_fields is not None and changed_fields.isdisjoint(GAPPING_FIELDS):
+        return
+    
     # Check for gaps and track if found
     gapping = compute_gapping_risk(profile)
     if gapping["hasGap"]:
@@ -380,10 +574,12 @@ async def on_bag_updated(
             properties={
                 "gap_type": gapping["gapType"],
                 "gap_details": gapping["gapDetails"],
+                "gap_count": len(gapping["gaps"]),
             },
         )
 
 
+@background_task
 async def on_recommendation_generated(
     user_id: str,
     email: str,
@@ -406,6 +602,7 @@ async def on_recommendation_generated(
     )
 
 
+@background_task
 async def on_deal_viewed(
     user_id: str,
     email: str,
@@ -431,9 +628,10 @@ async def on_deal_viewed(
     )
 
 
+@background_task
 async def on_deal_clicked(
     user_id: str,
-    email: str,
+    email: Optional[str],
     deal_id: str,
     deal_title: str,
     deal_category: str,
@@ -456,3 +654,42 @@ async def on_deal_clicked(
         },
         value=deal_price,
     )
+
+
+# Client event type -> Klaviyo metric (impressions aren't sent)
+DEAL_EVENT_METRICS = {"view": "Deal Viewed", "click": "Deal Clicked"}
+
+
+@background_task
+async def on_deal_events(
+    user_id: str,
+    email: str,
+    events: List[Dict[str, Any]],
+) -> None:
+    """
+    Called with a batch of client deal events ({"kind", "deal", "ts", "event_id"?}).
+    
+    Views and clicks go to Klaviyo as Deal Viewed / Deal Clicked in one request.
+    """
+    tracked = []
+    for event in events:
+        name = DEAL_EVENT_METRICS.get(event["kind"])
+        if name is None:
+            continue
+        deal = event["deal"]
+        properties = {
+            "deal_id": deal.id,
+            "deal_title": deal.title,
+            "deal_category": deal.category,
+            "deal_price": deal.price,
+        }
+        if event["kind"] == "click":
+            properties["retailer"] = deal.retailer
+        tracked.append({
+            "name": name,
+            "properties": properties,
+            "time": event["ts"].isoformat(),
+            "value": deal.price,
+            "unique_id": event.get("event_id"),
+        })
+    await track_events_bulk(user_id, email, tracked)
@@ -0,0 +1,116 @@
+"""
+Logging configuration (called once at the start of the app's lifespan).
+
+This module handles:
+- JSON-lines output: one object per record with ts, level, logger, msg
+  and any `extra={...}` fields (LOG_FORMAT=text for local development)
+- A non-blocking queue handler: request code only enqueues the record; a
+  listener thread formats and writes it. Records are not formatted when
+  enqueued, so `logger.info("x %s", value)` costs no string formatting on
+  the request path
+- The current request id (see `app.tracing`) on every record logged
+  while handling a request
+- Sampling for high-frequency messages: `extra={"sample": 100}` keeps one
+  record in 100 per logger and message template, tagged `"sampled": 100`
+
+Use %-style arguments rather than f-strings so disabled levels skip
+formatting entirely, and guard expensive arguments with
+`logger.isEnabledFor(...)`.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from .config import settings
+from .tracing import TraceContextFilter
+
+# Attributes every LogRecord has; anything else came from `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key != "sample":
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SampleFilter(logging.Filter):
+    """Keeps every Nth record that sets `extra={"sample": N}`, per logger and template."""
+
+    def __init__(self):
+        super().__init__()
+        self._counts: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample", None)
+        if not rate or rate <= 1:
+            return True
+        key = (record.name, str(record.msg))
+        count = self._counts[key]
+        self._counts[key] = count + 1
+        if count % rate:
+            return False
+        record.sampled = rate
+        return True
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records as-is; the listener thread does the formatting.
+
+    Arguments are rendered late, on the listener thread, so a mutable
+    argument (a dict or list changed after the call) is logged as it is
+    then, not as it was when logged. Pass a copy or a pre-formatted value
+    when that matters.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # QueueHandler.prepare would format the message here (for pickling to
+        # other processes); an in-process queue doesn't need that
+        return record
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None) -> logging.handlers.QueueListener:
+    """Route all logging through a queue to a JSON (or text) stdout handler. Idempotent."""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler(sys.stdout)
+    if (fmt or settings.LOG_FORMAT) == "text":
+        output.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    else:
+        output.setFormatter(JsonFormatter())
+
+    handler = LazyQueueHandler(queue.SimpleQueue())
+    handler.addFilter(SampleFilter())
+    handler.addFilter(TraceContextFilter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel((level or settings.LOG_LEVEL).upper())
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)  # flush what's queued on exit
+    return _listener
@@ -1,42 +1,186 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+import asyncio
 import logging
 
 from .config import settings
+from .compression import CompressionMiddleware
+from .logging_setup import configure_logging
+from .db import get_db, pool_stats, prewarm_pool
+from .cooccurrence import load_recent_interactions
+from .deal_events import drain_events, event_buffer, run_event_flusher
+from .deals_data import load_catalog
+from .klaviyo import close_client as close_klaviyo_client
+from .similarity import load_profile_index, refresh_profile
+from .indexes import missing_indexes_snapshot, run_index_checks
+from .user_cache import run_invalidation_listener, user_cache
+from .metrics import MetricsMiddleware, monitor_event_loop_lag, registry
+from .profiling import RequestProfilerMiddleware, install_signal_handler
+from .responses import FastJSONResponse
+from .tracing import TracingMiddleware, exporter as span_exporter, run_span_exporter
 from .routers.auth_routes import router as auth_router
 from .routers.user_routes import router as user_router
 from .routers.deals_routes import router as deals_router
+from .routers.redirect_routes import router as redirect_router
+from .routers.debug_routes import router as debug_router
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="BirdieDeals API", version="0.1.0")
 
-# Add CORS middleware with origins from config
-cors_origins = settings.cors_origins_list()
-logger.info(f"[STARTUP] CORS origins from settings: {cors_origins}")
+async def _prewarm_pool():
+    try:
+        count = await prewarm_pool()
+        logger.info("[STARTUP] MongoDB pool pre-warmed: %s connections open", count)
+    except Exception as e:
+        logger.error("[STARTUP] MongoDB pool pre-warm failed: %s", e)
+
+
+async def _bootstrap_indexes():
+    try:
+        await run_index_checks(get_db())
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error("[STARTUP] Index checks stopped: %s", e)
+
+
+async def _warm_cooccurrence_model():
+    try:
+        count = await load_recent_interactions(get_db())
+        logger.info("[STARTUP] Loaded %s deal interactions into co-occurrence model", count)
+    except Exception as e:
+        logger.error("[STARTUP] Failed to load deal interactions: %s", e)
+
+
+async def _warm_profile_index():
+    try:
+        count = await load_profile_index(get_db())
+        logger.info("[STARTUP] Indexed %s golfer profiles for similarity lookup", count)
+    except Exception as e:
+        logger.error("[STARTUP] Failed to build profile index: %s", e)
+
+
+async def _listen_for_user_changes():
+    try:
+        # Also keeps this worker's similar-golfer index in step with other workers' writes
+        await run_invalidation_listener(get_db(), on_change=refresh_profile)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error("[STARTUP] User cache invalidation listener stopped: %s", e)
+        # Without invalidations the cache could serve stale users to this worker
+        user_cache.ttl_seconds = 0
+
+
+async def _flush_deal_events():
+    try:
+        await run_event_flusher(get_db())
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error("[STARTUP] Deal event flusher stopped: %s", e)
+
+
+registry.gauge("deal_event_buffer_pending", "Deal events waiting to be flushed.", callback=lambda: len(event_buffer))
+registry.gauge("deal_events_dropped", "Deal events dropped because the buffer was full or their writes kept failing.", callback=lambda: event_buffer.dropped)
+registry.gauge("user_cache_entries", "Users in this worker's cache.", callback=lambda: len(user_cache))
+registry.gauge("mongodb_pool_checked_out", "MongoDB connections in use.", callback=lambda: pool_stats.checked_out)
+registry.gauge("mongodb_pool_wait_queue", "Operations waiting for a MongoDB connection.", callback=lambda: pool_stats.waiting)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup work kept out of module import
+    configure_logging()
+    logger.info("[STARTUP] Config: %s", settings.summary())
+    load_catalog()
+    if install_signal_handler():
+        logger.info("[STARTUP] SIGUSR2 writes a sampled profile of this worker")
+    # Warm in the background so startup doesn't wait on MongoDB
+    warm_tasks = [
+        asyncio.create_task(_prewarm_pool()),
+        asyncio.create_task(_bootstrap_indexes()),
+        asyncio.create_task(_warm_cooccurrence_model()),
+        asyncio.create_task(_warm_profile_index()),
+        asyncio.create_task(_listen_for_user_changes()),
+        asyncio.create_task(_flush_deal_events()),
+        asyncio.create_task(monitor_event_loop_lag()),
+    ]
+    if span_exporter.enabled:
+        warm_tasks.append(asyncio.create_task(run_span_exporter()))
+    yield
+    for task in warm_tasks:
+        task.cancel()
+    # Let the span exporter flush what it has buffered
+    await asyncio.gather(*warm_tasks, return_exceptions=True)
+    try:
+        count = await drain_events(get_db())
+        logger.info("[SHUTDOWN] Flushed %s pending deal events", count)
+    except Exception as e:
+        logger.error("[SHUTDOWN] Failed to flush deal events: %s", e)
+    await close_klaviyo_client()
+
+
+app = FastAPI(
+    title="BirdieDeals API", version="0.1.0", lifespan=lifespan, default_response_class=FastJSONResponse,
+)
+
+# Add CORS middleware with origins from config
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=cors_origins,
+    allow_origins=settings.cors_origins_list(),
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
 )
+# Compresses what the routes (and CORS) return
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RequestProfilerMiddleware)
+# Recorded latency includes CORS handling
+app.add_middleware(MetricsMiddleware)
+# Outermost, so every span (and log line) of a request shares its request id
+app.add_middleware(TracingMiddleware)
 
-logger.info(f"[STARTUP] Registering routers")
-logger.info(f"[STARTUP] CORS origins: {settings.cors_origins_list()}")
 app.include_router(auth_router)
 app.include_router(user_router)
 app.include_router(deals_router)
-logger.info(f"[STARTUP] All routers registered")
+app.include_router(redirect_router)
+app.include_router(debug_router)
 
 
 @app.get("/health")
 async def health():
-    logger.info("[HEALTH] Health check")
-    return {"ok": True}
+    result = {"ok": True}
+    missing = missing_indexes_snapshot()
+    if missing is None:
+        # Not checked yet, or MongoDB unreachable at the last check (retried)
+        result["indexes"] = "unknown"
+    elif missing:
+        result["missingIndexes"] = missing
+    return result
+
+
+@app.get("/health/pool")
+async def pool_health():
+    """MongoDB connection pool utilization and wait-queue depth for this worker."""
+    return pool_stats.snapshot()
+
+
+@app.get("/health/cache")
+async def cache_health():
+    """User cache size and hit/miss/invalidation counts for this worker."""
+    return user_cache.stats()
+
+
+@app.get("/health/events")
+async def events_health():
+    """Deal event buffer depth and flush counts for this worker."""
+    return event_buffer.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text-format metrics for this worker."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
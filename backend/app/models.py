@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 from typing import Any, Optional, List, Dict, Literal
+from datetime import datetime
 
 
 # -----------------------------------------------------------------------------
@@ -22,8 +23,11 @@ class GolferProfile(BaseModel):
     """
     Complete golfer profile for bag setup and personalization.
     
-    This is stored in MongoDB and synced to Klaviyo.
+    This is stored in MongoDB (normalized, see `app.profile_schema`) and
+    synced to Klaviyo.
     """
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
     # Player info
     handicap: Optional[float] = None
     driverCarry: Optional[int] = None  # yards
@@ -34,6 +38,11 @@ class GolferProfile(BaseModel):
     monthsPlayedPerYear: Optional[int] = None
     region: Optional[str] = None  # e.g., "Northeast", "Southwest"
     
+    # Demographics
+    ageRange: Optional[str] = None
+    dominantHand: Optional[str] = None  # "RH" / "LH"
+    yearsPlaying: Optional[str] = None
+    
     # Preferences
     budgetSensitivity: Optional[Literal["Value-First", "Balanced", "Performance-First"]] = "Balanced"
     willingToBuyUsed: Optional[bool] = False
@@ -45,6 +54,9 @@ class GolferProfile(BaseModel):
     # Optional extras
     playStyle: Optional[str] = None  # e.g., "aggressive", "conservative"
     goals: Optional[List[str]] = None  # e.g., ["lower handicap", "more distance"]
+    
+    # Set when the profile is stored; see `app.profile_schema`
+    schemaVersion: Optional[int] = None
 
 
 # -----------------------------------------------------------------------------
@@ -80,7 +92,7 @@ class RegisterRequest(BaseModel):
     username: str = Field(min_length=2, max_length=32)
     email: EmailStr
     password: str = Field(min_length=8, max_length=128)
-    profile: Dict[str, Any] = Field(default_factory=dict)
+    profile: GolferProfile = Field(default_factory=GolferProfile)
 
 
 class LoginRequest(BaseModel):
@@ -89,7 +101,20 @@ class LoginRequest(BaseModel):
 
 
 class ProfileUpdateRequest(BaseModel):
-    profile: Dict[str, Any] = Field(default_factory=dict)
+    profile: GolferProfile = Field(default_factory=GolferProfile)
+
+
+class ProfileOperation(BaseModel):
+    """A single field-level profile change for PATCH /api/profile."""
+    op: Literal["set", "unset", "push_club", "update_club", "remove_club"]
+    path: Optional[str] = None  # top-level profile field for set/unset, e.g. "handicap"
+    value: Any = None  # new value (set), club (push_club) or club fields (update_club)
+    index: Optional[int] = None  # club position for update_club/remove_club
+    name: Optional[str] = None  # club name for update_club/remove_club
+
+
+class ProfilePatchRequest(BaseModel):
+    ops: List[ProfileOperation] = Field(min_length=1, max_length=50)
 
 
 class UserPublic(BaseModel):
@@ -118,6 +143,12 @@ class SuggestedDealsResponse(BaseModel):
     profileSummary: Optional[Dict[str, Any]] = None
     gappingAnalysis: Optional[Dict[str, Any]] = None  # gap detection results
     riskScores: Optional[Dict[str, Any]] = None  # wedge wear, etc.
+    clickToken: Optional[str] = None  # for /r/{deal_id}?t=... redirects
+
+
+class SimilarGolferDealsResponse(BaseModel):
+    deals: List[Deal]
+    similarGolfers: int = 0  # how many nearby profiles contributed
 
 
 # -----------------------------------------------------------------------------
@@ -131,3 +162,21 @@ class DealViewRequest(BaseModel):
 
 class DealClickRequest(BaseModel):
     dealId: str
+
+
+class DealEvent(BaseModel):
+    """A client-side deal interaction for POST /api/deals/events."""
+    type: Literal["impression", "view", "click"]
+    dealId: str
+    ts: Optional[datetime] = None  # when it happened on the client
+    eventId: Optional[str] = Field(default=None, max_length=64)  # client-generated, dedupes retries
+
+
+class DealEventsRequest(BaseModel):
+    events: List[DealEvent] = Field(min_length=1, max_length=200)
+
+
+class DealEventsResponse(BaseModel):
+    accepted: int
+    duplicates: int = 0  # repeated within the batch or already received
+    unknownDeals: int = 0
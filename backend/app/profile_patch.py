@@ -0,0 +1,266 @@
+"""
+Field-level profile updates.
+
+Translates PATCH operations on the golfer profile into targeted MongoDB
+updates (`$set` / `$unset` / `$push` / `$pull`) instead of rewriting the
+whole `profile` document, and reports which top-level profile fields
+changed so derived computations can skip the rest.
+
+Operations are applied in order. Consecutive operations are merged into a
+single update document unless their paths would conflict, in which case a
+new update step is started.
+
+Values are validated and coerced against `GolferProfile` / `Club` and the
+clubs array is kept sorted by carry, so a patched profile stays in the
+normalized form described in `app.profile_schema`.
+"""
+
+import re
+from typing import Any, Dict, List, Set, Tuple, Union
+
+from pydantic import ValidationError
+
+from .models import Club, GolferProfile, ProfileOperation
+from .profile_schema import CLUB_SORT, normalize_profile
+
+Update = Union[Dict[str, Any], List[Dict[str, Any]]]  # update document or pipeline
+
+_FIELD_RE = re.compile(r"^[A-Za-z][A-Za-z0-9_]*$")
+_PROFILE_FIELDS = set(GolferProfile.model_fields) - {"schemaVersion"}
+
+
+class ProfilePatchError(ValueError):
+    """Raised for operations that can't be translated into an update."""
+
+
+class ClubNotFoundError(ProfilePatchError):
+    """Raised when an update targets a club index the profile doesn't have."""
+
+
+def _check_field(path: str) -> str:
+    if not path or not _FIELD_RE.match(path):
+        raise ProfilePatchError(f"Invalid profile field: {path!r}")
+    return path
+
+
+def _check_profile_field(path: str) -> str:
+    field = _check_field(path)
+    if field not in _PROFILE_FIELDS:
+        raise ProfilePatchError(f"Unknown profile field: {path!r}")
+    return field
+
+
+def _error_message(e: ValidationError) -> str:
+    err = e.errors()[0]
+    return f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}"
+
+
+def _profile_value(field: str, value: Any) -> Any:
+    """Validated, normalized value for a profile field (None if it normalizes away)."""
+    try:
+        profile = GolferProfile.model_validate({field: value})
+    except ValidationError as e:
+        raise ProfilePatchError(f"Invalid profile value: {_error_message(e)}") from e
+    return normalize_profile(profile).get(field)
+
+
+def _club_values(value: Any) -> Dict[str, Any]:
+    if not isinstance(value, dict) or not value:
+        raise ProfilePatchError("Club operations need a non-empty object value")
+    for field in value:
+        _check_field(field)
+    return value
+
+
+def _new_club(value: Any) -> Dict[str, Any]:
+    try:
+        return Club.model_validate(_club_values(value)).model_dump(exclude_none=True)
+    except ValidationError as e:
+        raise ProfilePatchError(f"Invalid club: {_error_message(e)}") from e
+
+
+def _club_updates(value: Any) -> Dict[str, Any]:
+    """Validated club fields for update_club; None means remove the field."""
+    values = _club_values(value)
+    for field in values:
+        if field not in Club.model_fields:
+            raise ProfilePatchError(f"Unknown club field: {field!r}")
+    try:
+        club = Club.model_validate({"name": "", **values})
+    except ValidationError as e:
+        raise ProfilePatchError(f"Invalid club: {_error_message(e)}") from e
+    return {field: getattr(club, field) for field in values}
+
+
+def _conflicts(paths: Set[str], path: str) -> bool:
+    return any(p == path or p.startswith(path + ".") or path.startswith(p + ".") for p in paths)
+
+
+def _remove_club_at(index: int) -> List[Dict[str, Any]]:
+    """Pipeline that drops the club at `index` atomically."""
+    clubs = {"$ifNull": ["$profile.clubs", []]}
+    return [{
+        "$set": {
+            "profile.clubs": {
+                "$concatArrays": [
+                    {"$slice": [clubs, index]},
+                    {"$slice": [clubs, index + 1, {"$max": [{"$size": clubs}, 1]}]},
+                ]
+            }
+        }
+    }]
+
+
+def missing_clubs_message(conditions: List[Dict[str, Any]]) -> str:
+    """Error message for club existence conditions (see `build_profile_updates`) that failed."""
+    clubs = []
+    for condition in conditions:
+        path, value = next(iter(condition.items()))
+        clubs.append(f"named {value!r}" if path.endswith(".name") else f"at index {path.rsplit('.', 1)[-1]}")
+    return f"No club {' or '.join(clubs)}"
+
+
+def build_profile_updates(
+    ops: List[ProfileOperation],
+) -> Tuple[List[Tuple[Update, Dict[str, Any]]], Set[str]]:
+    """
+    Translate operations into ordered update steps.
+
+    Returns:
+        ([(update, options), ...], changed_fields) where options holds
+        extra driver arguments such as `array_filters`, and `filter`: a
+        list of conditions the document must meet for the step to apply
+        (clubs addressed by index or name must exist; see
+        `users_repo.apply_profile_updates`).
+
+    The first step's `filter` holds every condition in the patch, so a
+    patch naming a missing club writes nothing. That's only exact if no
+    earlier operation in the same patch could change whether the club
+    exists, so addressing a club after such an operation (e.g. by index
+    after adding or removing clubs) is rejected.
+    """
+    steps: List[Tuple[Update, Dict[str, Any]]] = []
+    changed: Set[str] = set()
+    current: Dict[str, Dict[str, Any]] = {}
+    filters: List[Dict[str, Any]] = []
+    required: List[Dict[str, Any]] = []
+    paths: Set[str] = set()
+    all_required: List[Dict[str, Any]] = []
+    # What earlier ops in this patch changed about which clubs exist
+    indexes_moved = False
+    names_touched: Set[str] = set()
+    all_names_touched = False
+
+    def flush() -> None:
+        nonlocal current, filters, required, paths
+        if current:
+            options: Dict[str, Any] = {}
+            if filters:
+                options["array_filters"] = filters
+            if required:
+                options["filter"] = required
+            steps.append((current, options))
+        current, filters, required, paths = {}, [], [], set()
+
+    def add(operator: str, path: str, value: Any) -> None:
+        pending = current.get(operator, {})
+        if operator == "$push" and path in pending and not _conflicts(paths - {path}, path):
+            # Several pushes to the same array share one $each
+            pending[path]["$each"].extend(value["$each"])
+            return
+        if _conflicts(paths, path):
+            flush()
+        current.setdefault(operator, {})[path] = value
+        paths.add(path)
+
+    def require_club(op: ProfileOperation) -> Dict[str, Any]:
+        if op.index is not None:
+            if indexes_moved:
+                raise ProfilePatchError("Clubs can't be addressed by index after adding or removing clubs")
+            # Without this, an index past the end pads the array with nulls
+            # and a missing clubs array becomes an object
+            condition = {f"profile.clubs.{op.index}": {"$exists": True}}
+        else:
+            if all_names_touched or op.name in names_touched:
+                raise ProfilePatchError(f"Club {op.name!r} is added, removed or renamed earlier in this patch")
+            condition = {"profile.clubs.name": op.name}
+        if condition not in all_required:
+            all_required.append(condition)
+        return condition
+
+    needs_sort = False  # a club's carry changed since the array was last sorted
+
+    for op in ops:
+        if op.op in ("set", "unset"):
+            field = _check_profile_field(op.path or "")
+            value = _profile_value(field, op.value) if op.op == "set" else None
+            if value is None:
+                # Fields with a default (e.g. budgetSensitivity) reset to it
+                value = GolferProfile.model_fields[field].default
+            if value is not None:
+                add("$set", f"profile.{field}", value)
+            else:
+                add("$unset", f"profile.{field}", "")
+            changed.add(field)
+            if field == "clubs":
+                needs_sort = False
+                indexes_moved = all_names_touched = True
+            continue
+
+        changed.add("clubs")
+        if op.op == "push_club":
+            club = _new_club(op.value)
+            # $sort re-sorts the whole array, including the new club
+            add("$push", "profile.clubs", {"$each": [club], "$sort": CLUB_SORT})
+            needs_sort = False
+            indexes_moved = True
+            names_touched.add(club["name"])
+        elif op.op == "update_club":
+            values = _club_updates(op.value)
+            if op.index is not None:
+                if op.index < 0:
+                    raise ProfilePatchError("Club index must be >= 0")
+                prefix = f"profile.clubs.{op.index}"
+            elif op.name:
+                if _conflicts(paths, "profile.clubs"):
+                    flush()
+                prefix = "profile.clubs.$[club]"
+            else:
+                raise ProfilePatchError("update_club needs an index or name")
+            condition = require_club(op)
+            for field, v in values.items():
+                if v is None:
+                    add("$unset", f"{prefix}.{field}", "")
+                else:
+                    add("$set", f"{prefix}.{field}", v)
+            if op.index is None:
+                filters.append({"club.name": op.name})
+                paths.add("profile.clubs")
+            required.append(condition)
+            needs_sort = needs_sort or "carryYards" in values
+            if "name" in values:
+                all_names_touched = True
+        elif op.op == "remove_club":
+            if op.name:
+                condition = require_club(op)
+                add("$pull", "profile.clubs", {"name": op.name})
+                required.append(condition)
+                names_touched.add(op.name)
+            elif op.index is not None:
+                if op.index < 0:
+                    raise ProfilePatchError("Club index must be >= 0")
+                condition = require_club(op)
+                flush()
+                steps.append((_remove_club_at(op.index), {"filter": [condition]}))
+                all_names_touched = True
+            else:
+                raise ProfilePatchError("remove_club needs an index or name")
+            indexes_moved = True
+
+    if needs_sort:
+        add("$push", "profile.clubs", {"$each": [], "$sort": CLUB_SORT})
+    flush()
+    if all_required:
+        first, options = steps[0]
+        steps[0] = (first, {**options, "filter": all_required})
+    return steps, changed
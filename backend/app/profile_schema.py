@@ -0,0 +1,102 @@
+"""
+Normalized storage form of the golfer profile.
+
+Profiles are validated into `GolferProfile` once, when they are written,
+and stored normalized:
+- numeric fields coerced to their declared types, unknown fields dropped
+- unset (None) fields omitted; fields with defaults always present
+- clubs sorted by carry, longest first (clubs without a carry last)
+- `schemaVersion` set to PROFILE_SCHEMA_VERSION
+
+Read paths can then trust the shape of any profile carrying the current
+version. Profiles stored before versioning are normalized on read by
+`ensure_current` (invalid fields are dropped rather than failing the read).
+"""
+
+import copy
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import ValidationError
+
+from .models import GolferProfile
+
+PROFILE_SCHEMA_VERSION = 1
+
+# MongoDB $sort spec matching `sort_clubs` (missing carry sorts last descending)
+CLUB_SORT = {"carryYards": -1}
+
+_MAX_REPAIR_PASSES = 5
+
+
+def sort_clubs(clubs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Clubs ordered longest carry first; clubs without a carry keep their order at the end."""
+    return sorted(clubs, key=lambda c: (c.get("carryYards") is None, -(c.get("carryYards") or 0)))
+
+
+def normalize_profile(profile: Union[GolferProfile, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Return the normalized storage form of a profile.
+
+    Raises pydantic.ValidationError if a raw dict doesn't validate.
+    """
+    if not isinstance(profile, GolferProfile):
+        profile = GolferProfile.model_validate(profile)
+    data = profile.model_dump(exclude_none=True)
+    if "clubs" in data:
+        data["clubs"] = sort_clubs(data["clubs"])
+    data["schemaVersion"] = PROFILE_SCHEMA_VERSION
+    return data
+
+
+def is_current(profile: Optional[Dict[str, Any]]) -> bool:
+    return bool(profile) and profile.get("schemaVersion") == PROFILE_SCHEMA_VERSION
+
+
+def _drop(data: Any, loc: tuple) -> bool:
+    """Remove the value at `loc` (a pydantic error location). Returns False if not found."""
+    *parents, last = loc
+    for key in parents:
+        try:
+            data = data[key]
+        except (KeyError, IndexError, TypeError):
+            return False
+    try:
+        del data[last]
+    except (KeyError, IndexError, TypeError):
+        return False
+    return True
+
+
+def _repair_loc(loc: tuple) -> tuple:
+    # A club without a valid name is dropped as a whole
+    if loc[0] == "clubs" and len(loc) == 3 and loc[2] == "name":
+        return loc[:2]
+    return loc
+
+
+def _loc_key(loc: tuple) -> tuple:
+    return tuple((0, part, "") if isinstance(part, int) else (1, 0, str(part)) for part in loc)
+
+
+def ensure_current(profile: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Return a profile in the current normalized form.
+
+    Current profiles are returned as-is (no copy, no validation). Older
+    ones are normalized; fields (or clubs) that don't validate are dropped.
+    """
+    if is_current(profile):
+        return profile
+    data = copy.deepcopy(profile or {})
+    for _ in range(_MAX_REPAIR_PASSES):
+        try:
+            return normalize_profile(data)
+        except ValidationError as e:
+            locs = {_repair_loc(err["loc"]) for err in e.errors() if err["loc"]}
+            dropped = False
+            # Last locations first so list indexes stay valid
+            for loc in sorted(locs, key=_loc_key, reverse=True):
+                dropped = _drop(data, loc) or dropped
+            if not dropped:
+                break
+    return normalize_profile({})
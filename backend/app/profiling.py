@@ -0,0 +1,207 @@
+"""
+On-demand profiling inside a running worker.
+
+This module handles:
+- A sampling profiler: a background thread snapshots the Python stacks
+  of the other threads every few milliseconds (`sys._current_frames`)
+  and counts them as collapsed stacks ("a;b;c 42"), the input format of
+  flamegraph.pl / speedscope
+- A SIGUSR2 handler that samples for PROFILE_SIGNAL_SECONDS and writes
+  the collapsed stacks to a file in PROFILE_DIR
+- Per-request cProfile capture for selected routes, triggered by the
+  `X-Profile: 1` header with a valid admin token; the pstats report is
+  kept in memory and its id returned in `X-Profile-Id`
+
+Samples only show code that is running on a thread: coroutines suspended
+on I/O don't appear, so the profiles show where CPU (and event loop) time
+goes. cProfile captures also include any other tasks the event loop runs
+while the profiled request is awaiting.
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import signal
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Optional
+from uuid import uuid4
+
+from .auth import check_admin_token
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL_SECONDS = 0.005
+MAX_SAMPLE_SECONDS = 60
+MAX_STACK_DEPTH = 128
+PROFILED_PATHS = {"/api/deals/suggested"}
+MAX_REQUEST_PROFILES = 20
+REQUEST_PROFILE_LINES = 60
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Counts collapsed stacks of every other thread, sampled on an interval."""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL_SECONDS, ignore_thread: Optional[int] = None):
+        self.interval = interval
+        self.ignore_thread = ignore_thread
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        skip = {threading.get_ident(), self.ignore_thread}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id in skip:
+                continue
+            labels = []
+            while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.reverse()
+            self.stacks[";".join(labels)] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        """Stacks in collapsed format, most sampled first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# One sampling run per worker at a time
+_sampling_lock = threading.Lock()
+
+
+def sample_blocking(seconds: float, interval: float = DEFAULT_INTERVAL_SECONDS) -> Optional[SamplingProfiler]:
+    """Sample for `seconds` from the calling thread; None if a run is already active."""
+    if not _sampling_lock.acquire(blocking=False):
+        return None
+    try:
+        profiler = SamplingProfiler(interval, ignore_thread=threading.get_ident())
+        profiler.start()
+        time.sleep(seconds)
+        profiler.stop()
+        return profiler
+    finally:
+        _sampling_lock.release()
+
+
+def _write_signal_profile(seconds: float) -> None:
+    profiler = sample_blocking(seconds)
+    if profiler is None:
+        logger.warning("[PROFILE] Sampling already running, ignoring signal")
+        return
+    path = os.path.join(settings.PROFILE_DIR or tempfile.gettempdir(), f"profile-{os.getpid()}-{int(time.time())}.folded")
+    with open(path, "w") as f:
+        f.write(profiler.collapsed())
+    logger.info("[PROFILE] Wrote %d samples to %s", profiler.samples, path)
+
+
+def install_signal_handler() -> bool:
+    """Sample for PROFILE_SIGNAL_SECONDS on SIGUSR2 (`kill -USR2 <worker pid>`)."""
+    if not hasattr(signal, "SIGUSR2") or threading.current_thread() is not threading.main_thread():
+        return False
+
+    def handler(signum, frame):
+        # Sample from a thread so the worker keeps serving while it's profiled
+        threading.Thread(
+            target=_write_signal_profile, args=(settings.PROFILE_SIGNAL_SECONDS,), daemon=True,
+        ).start()
+
+    signal.signal(signal.SIGUSR2, handler)
+    return True
+
+
+class RequestProfiles:
+    """The most recent per-request cProfile reports, by id."""
+
+    def __init__(self, max_entries: int = MAX_REQUEST_PROFILES):
+        self.max_entries = max_entries
+        self._reports: "OrderedDict[str, str]" = OrderedDict()
+        self.active = False  # cProfile can't nest; one capture at a time
+
+    def add(self, report: str) -> str:
+        profile_id = uuid4().hex[:12]
+        self._reports[profile_id] = report
+        if len(self._reports) > self.max_entries:
+            self._reports.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[str]:
+        return self._reports.get(profile_id)
+
+
+request_profiles = RequestProfiles()
+
+
+def _report(profiler: cProfile.Profile, label: str) -> str:
+    out = io.StringIO()
+    out.write(f"{label}\n\n")
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(REQUEST_PROFILE_LINES)
+    return out.getvalue()
+
+
+class RequestProfilerMiddleware:
+    """ASGI middleware running cProfile around requests that ask for it."""
+
+    def __init__(self, app, paths=PROFILED_PATHS, profiles: RequestProfiles = request_profiles):
+        self.app = app
+        self.paths = paths
+        self.profiles = profiles
+
+    def _requested(self, scope) -> bool:
+        if scope["type"] != "http" or scope["path"] not in self.paths or self.profiles.active:
+            return False
+        headers: Dict[bytes, bytes] = dict(scope["headers"])
+        if headers.get(b"x-profile") != b"1":
+            return False
+        return check_admin_token(headers.get(b"x-admin-token", b"").decode("latin-1"))
+
+    async def __call__(self, scope, receive, send):
+        if not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = cProfile.Profile()
+        report_id = None
+
+        async def send_wrapper(message):
+            nonlocal report_id
+            if message["type"] == "http.response.start":
+                # The response is ready; stop before it goes out so the id can be attached
+                profiler.disable()
+                report_id = self.profiles.add(_report(profiler, f"{scope['method']} {scope['path']}"))
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", report_id.encode())]}
+            await send(message)
+
+        self.profiles.active = True
+        try:
+            profiler.enable()
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            self.profiles.active = False
@@ -0,0 +1,45 @@
+"""
+Fast JSON responses (the app's default response class).
+
+This module handles:
+- Encoding plain payloads (dicts, lists) with orjson, falling back to
+  the standard library when orjson isn't installed
+- Encoding Pydantic models with pydantic-core's serializer directly
+- Sending pre-encoded bytes as-is, so cached payloads are encoded once
+
+Routes whose `response_model` is a model the server builds itself can
+return `FastJSONResponse(model)`. FastAPI then sends the response as
+returned instead of dumping the model, validating it against the
+response_model again and re-encoding it. Keep `response_model` on the
+route for the OpenAPI schema.
+"""
+
+import json
+from typing import Any
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional; see requirements.txt
+    orjson = None
+
+
+def encode(content: Any) -> bytes:
+    """JSON-encode a model, bytes (returned as-is) or a JSON-compatible value."""
+    if isinstance(content, bytes):
+        return content
+    if isinstance(content, BaseModel):
+        # Same output as model_dump_json(), without the str round trip
+        return content.__pydantic_serializer__.to_json(content)
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return encode(content)
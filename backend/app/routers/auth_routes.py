@@ -2,11 +2,16 @@ from fastapi import APIRouter, HTTPException, status, BackgroundTasks
 from uuid import uuid4
 from datetime import datetime, timezone
 import logging
+from pymongo.errors import DuplicateKeyError
 
 from ..db import get_db
-from ..models import RegisterRequest, LoginRequest, AuthResponse, UserPublic
+from ..models import RegisterRequest, LoginRequest, AuthResponse
+from .. import users_repo
 from ..auth import hash_password, verify_password, create_access_token
 from ..klaviyo import on_account_created
+from ..profile_schema import normalize_profile
+from ..responses import FastJSONResponse
+from ..similarity import index_profile
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/auth", tags=["auth"])
@@ -14,17 +19,11 @@ router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 @router.post("/register", response_model=AuthResponse)
 async def register(body: RegisterRequest, background_tasks: BackgroundTasks):
-    logger.info(f"[REGISTER] Received registration request: username={body.username}, email={body.email}")
-    logger.info(f"[REGISTER] Profile data: {body.profile}")
-    
     db = get_db()
-    logger.info("[REGISTER] Checking for existing email")
-    existing = await db.users.find_one({"email": body.email.lower()})
-    if existing:
-        logger.warning(f"[REGISTER] Email already exists: {body.email}")
+    if await users_repo.email_exists(db, body.email):
+        logger.info("[REGISTER] Email already registered")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
-    logger.info("[REGISTER] Creating new user document")
     now = datetime.now(timezone.utc)
     user_id = str(uuid4())
     doc = {
@@ -32,23 +31,21 @@ async def register(body: RegisterRequest, background_tasks: BackgroundTasks):
         "username": body.username,
         "email": body.email.lower(),
         "password_hash": hash_password(body.password),
-        "profile": body.profile or {},
+        "profile": normalize_profile(body.profile),
         "created_at": now,
         "updated_at": now,
     }
-    logger.info(f"[REGISTER] Inserting user to MongoDB: {user_id}")
-    await db.users.insert_one(doc)
-    logger.info(f"[REGISTER] User inserted successfully: {user_id}")
+    try:
+        await users_repo.insert_user(db, doc)
+    except DuplicateKeyError:
+        # Lost a race with a concurrent registration (unique email index)
+        logger.info("[REGISTER] Email already registered")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+    index_profile(user_id, doc["profile"])
 
     token = create_access_token(subject=user_id)
-    user_public = UserPublic(
-        id=user_id,
-        username=doc["username"],
-        email=doc["email"],
-        profile=doc["profile"],
-    )
+    user_public = users_repo.to_public(doc)
     
-    logger.info(f"[REGISTER] Queueing Klaviyo sync task for user: {user_id}")
     # Sync to Klaviyo in background (non-blocking)
     background_tasks.add_task(
         on_account_created,
@@ -58,29 +55,23 @@ async def register(body: RegisterRequest, background_tasks: BackgroundTasks):
         profile=doc["profile"],
     )
     
-    logger.info(f"[REGISTER] Registration complete for user: {user_id}")
-    return AuthResponse(token=token, user=user_public)
+    logger.info("[REGISTER] User registered", extra={"user_id": user_id})
+    return FastJSONResponse(AuthResponse(token=token, user=user_public))
 
 
 @router.post("/login", response_model=AuthResponse)
 async def login(body: LoginRequest):
-    logger.info(f"[LOGIN] Login attempt for: {body.email}")
     db = get_db()
-    user = await db.users.find_one({"email": body.email.lower()})
+    user = await users_repo.find_by_email(db, body.email, users_repo.LOGIN_PROJECTION)
     if not user:
-        logger.warning(f"[LOGIN] User not found: {body.email}")
+        logger.warning("[LOGIN] Failed login: unknown email")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
     if not verify_password(body.password, user.get("password_hash", "")):
-        logger.warning(f"[LOGIN] Invalid password for user: {body.email}")
+        logger.warning("[LOGIN] Failed login: wrong password", extra={"user_id": user["_id"]})
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
     token = create_access_token(subject=user["_id"])
-    user_public = UserPublic(
-        id=user["_id"],
-        username=user["username"],
-        email=user["email"],
-        profile=user.get("profile", {}),
-    )
-    logger.info(f"[LOGIN] Login successful for user: {user['_id']}")
-    return AuthResponse(token=token, user=user_public)
+    user_public = users_repo.to_public(user)
+    logger.debug("[LOGIN] Login successful", extra={"user_id": user["_id"]})
+    return FastJSONResponse(AuthResponse(token=token, user=user_public))
@@ -1,30 +1,58 @@
 from fastapi import APIRouter, Depends, BackgroundTasks
-from typing import List, Dict, Any, Tuple
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Tuple
 
 from ..models import (
     FeaturedDealsResponse,
     SuggestedDealsResponse,
+    SimilarGolferDealsResponse,
     Deal,
     DealViewRequest,
     DealClickRequest,
+    DealEventsRequest,
+    DealEventsResponse,
 )
-from ..deps import get_current_user
-from ..deals_data import FEATURED_DEALS, get_deal_by_id
+from ..auth import create_click_token
+from ..deps import get_current_user, get_current_user_ref
+from ..deals_data import get_deal_by_id, get_featured_deals
+from ..cooccurrence import model as cooccurrence_model, record_interaction
+from ..deal_events import client_time, recent_event_ids, record_event
+from ..similarity import embed_profile, profile_index
+from ..metrics import RECOMMENDATION_DURATION
+from ..responses import FastJSONResponse, encode
+from ..rules import get_rule_engine
+from ..user_cache import user_cache
 from ..klaviyo import (
     on_recommendation_generated,
     on_deal_viewed,
     on_deal_clicked,
+    on_deal_events,
     compute_wedge_wear_risk,
     compute_gapping_risk,
 )
 
 router = APIRouter(prefix="/api/deals", tags=["deals"])
 
+CF_BLEND_WEIGHT = 0.3  # share of the match score taken from co-occurrence
+CF_MAX_EXTRA_DEALS = 3  # deals added purely from co-occurrence
+CF_BASE_SCORE = 0.5  # rule score assumed for deals no rule picked
+SIMILAR_GOLFERS_K = 50
+SIMILAR_GOLFER_DEALS = 6
+
+# The catalog is static, so the featured response is encoded once (and,
+# being cacheable, compressed once per encoding by CompressionMiddleware)
+_featured_body: Optional[bytes] = None
+FEATURED_CACHE_CONTROL = {"Cache-Control": "public, max-age=300"}
+
 
 @router.get("/featured", response_model=FeaturedDealsResponse)
 async def featured_deals():
     """Public endpoint - returns generic deals for browsing."""
-    return FeaturedDealsResponse(deals=FEATURED_DEALS)
+    global _featured_body
+    if _featured_body is None:
+        _featured_body = encode(FeaturedDealsResponse(deals=get_featured_deals()))
+    return FastJSONResponse(_featured_body, headers=FEATURED_CACHE_CONTROL)
 
 
 def _profile_summary(profile: Dict[str, Any]) -> Dict[str, Any]:
@@ -41,122 +69,60 @@ def _profile_summary(profile: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def _suggest_deals(profile: Dict[str, Any]) -> Tuple[List[Deal], str, List[str]]:
+def _blend_cooccurrence(picks: List[Deal], recent_deal_ids: List[str]) -> List[Deal]:
     """
-    Generate personalized deal recommendations based on golfer profile.
+    Blend item-item co-occurrence scores into the rule-based picks.
     
-    Returns:
-        (deals, reasoning, categories)
+    Picks keep their rule score weighted by (1 - CF_BLEND_WEIGHT); deals
+    similar golfers engaged with alongside the user's recent deals are
+    added with CF_BASE_SCORE as their rule score.
     """
-    budget = (profile.get("budgetSensitivity") or "Balanced").lower()
-    wants_used = bool(profile.get("willingToBuyUsed", False))
-    handicap = profile.get("handicap")
-    rounds_per_month = profile.get("roundsPerMonth") or 0
-    driver_carry = profile.get("driverCarry")
-    
-    picks: List[Deal] = []
-    reasons: List[str] = []
-    categories: List[str] = []
+    cf_scores = cooccurrence_model.score(recent_deal_ids)
+    if not cf_scores:
+        return picks
     
-    # Compute risk scores
-    wedge_risk = compute_wedge_wear_risk(profile)
-    gapping = compute_gapping_risk(profile)
-    
-    # --- Wedge recommendations based on wear risk ---
-    if wedge_risk == "high":
-        wedges = [d for d in FEATURED_DEALS if d.category == "wedges"]
-        if wedges:
-            # Prefer value options for value-first players
-            if "value" in budget:
-                wedge = next((w for w in wedges if "value" in (w.tags or [])), wedges[0])
-            else:
-                wedge = wedges[0]
-            wedge_copy = wedge.model_copy()
-            wedge_copy.matchScore = 0.9
-            wedge_copy.matchReason = "High wedge wear risk - you play frequently"
-            picks.append(wedge_copy)
-            categories.append("wedges")
-            reasons.append("frequent play means wedge grooves wear faster")
-    
-    # --- Gap-based recommendations ---
-    if gapping["hasGap"]:
-        gap_type = gapping["gapType"]
-        
-        if gap_type == "top-of-bag":
-            # Recommend hybrids or fairway woods
-            hybrids = [d for d in FEATURED_DEALS if d.category in ("hybrids", "fairway")]
-            if hybrids:
-                pick = hybrids[0].model_copy()
-                pick.matchScore = 0.85
-                pick.matchReason = f"Detected {gapping['gapDetails']}"
-                picks.append(pick)
-                categories.append(pick.category)
-                reasons.append("gap at the top of your bag")
-        
-        elif gap_type == "mid-bag":
-            # Recommend irons or utility clubs
-            irons = [d for d in FEATURED_DEALS if d.category == "irons"]
-            if irons:
-                pick = irons[0].model_copy()
-                pick.matchScore = 0.8
-                pick.matchReason = f"Detected {gapping['gapDetails']}"
-                picks.append(pick)
-                categories.append("irons")
-                reasons.append("mid-bag yardage gap")
-    
-    # --- Budget and used preferences ---
-    if "value" in budget or wants_used:
-        # Include used driver deal if they want value
-        drivers = [d for d in FEATURED_DEALS if d.category == "driver" and "used" in (d.tags or [])]
-        if drivers and "driver" not in categories:
-            driver = drivers[0].model_copy()
-            driver.matchScore = 0.75
-            driver.matchReason = "Great value on a quality used driver"
-            picks.append(driver)
-            categories.append("driver")
-            reasons.append("value-first preference")
-    
-    # --- Distance seekers ---
-    if driver_carry and driver_carry < 220:
-        # They might benefit from a more forgiving driver
-        forgiving = [d for d in FEATURED_DEALS if d.category == "driver" and "forgiving" in (d.tags or [])]
-        if forgiving and not any(p.category == "driver" for p in picks):
-            driver = forgiving[0].model_copy()
-            driver.matchScore = 0.7
-            driver.matchReason = "Forgiving driver could help with distance"
-            picks.append(driver)
-            categories.append("driver")
-            reasons.append("potential distance gains")
+    blended = []
+    picked = set()
+    for d in picks:
+        d.matchScore = round(
+            (1 - CF_BLEND_WEIGHT) * (d.matchScore or 0) + CF_BLEND_WEIGHT * cf_scores.get(d.id, 0.0), 3
+        )
+        blended.append(d)
+        picked.add(d.id)
     
-    # --- Everyone gets a ball deal for demo purposes ---
-    ball_deals = [d for d in FEATURED_DEALS if d.category == "balls"]
-    if ball_deals and "balls" not in categories:
-        ball = ball_deals[0].model_copy()
-        ball.matchScore = 0.6
-        ball.matchReason = "Great value on premium balls"
-        picks.append(ball)
-        categories.append("balls")
+    extra = sorted(
+        ((deal_id, s) for deal_id, s in cf_scores.items() if deal_id not in picked),
+        key=lambda x: x[1],
+        reverse=True,
+    )[:CF_MAX_EXTRA_DEALS]
+    for deal_id, cf in extra:
+        deal = get_deal_by_id(deal_id)
+        if deal is None:
+            continue
+        pick = deal.model_copy()
+        pick.matchScore = round((1 - CF_BLEND_WEIGHT) * CF_BASE_SCORE + CF_BLEND_WEIGHT * cf, 3)
+        pick.matchReason = "Golfers with similar interests also checked this out"
+        blended.append(pick)
+    return blended
+
+
+@RECOMMENDATION_DURATION.timed
+def _suggest_deals(
+    profile: Dict[str, Any],
+    recent_deal_ids: Optional[List[str]] = None,
+) -> Tuple[List[Deal], str, List[str]]:
+    """
+    Generate personalized deal recommendations based on golfer profile.
     
-    # --- High handicappers might want game improvement irons ---
-    if handicap is not None and handicap >= 15:
-        gi_irons = [d for d in FEATURED_DEALS if d.category == "irons" and "game-improvement" in (d.tags or [])]
-        if gi_irons and not any(p.category == "irons" for p in picks):
-            iron = gi_irons[0].model_copy()
-            iron.matchScore = 0.65
-            iron.matchReason = "Game improvement irons for your handicap level"
-            picks.append(iron)
-            categories.append("irons")
-            reasons.append("handicap-appropriate equipment")
+    Picks come from the declarative rules in `app.rules`. If
+    `recent_deal_ids` (the user's recent views/clicks) is given, scores
+    are blended with item-item co-occurrence from other golfers.
     
-    # --- Frequent players might want apparel deals ---
-    if rounds_per_month >= 6:
-        apparel = [d for d in FEATURED_DEALS if d.category == "apparel"]
-        if apparel:
-            pick = apparel[0].model_copy()
-            pick.matchScore = 0.5
-            pick.matchReason = "You play often - quality gear matters"
-            picks.append(pick)
-            categories.append("apparel")
+    Returns:
+        (deals, reasoning, categories)
+    """
+    picks, reasons, categories, ctx = get_rule_engine().evaluate(profile)
+    handicap = ctx.get("handicap")
     
     # Build reasoning string
     if reasons:
@@ -167,6 +133,10 @@ def _suggest_deals(profile: Dict[str, Any]) -> Tuple[List[Deal], str, List[str]]
     if handicap is not None:
         reasoning = f"Handicap {handicap} golfer. {reasoning}"
     
+    if recent_deal_ids:
+        picks = _blend_cooccurrence(picks, recent_deal_ids)
+        categories.extend(d.category for d in picks)
+    
     # De-dupe by id and sort by match score
     unique = []
     seen = set()
@@ -191,11 +161,14 @@ async def suggested_deals(
     Also computes risk scores and gap analysis for the response.
     """
     profile = user.get("profile", {}) or {}
-    deals, reasoning, categories = _suggest_deals(profile)
+    deals, reasoning, categories = _suggest_deals(profile, cooccurrence_model.history(user["_id"]))
     
-    # Compute analysis for response
-    gapping = compute_gapping_risk(profile)
-    wedge_risk = compute_wedge_wear_risk(profile)
+    # Profile-derived analysis is cached with the user until their document changes
+    gapping, wedge_risk = user_cache.get_derived(
+        user["_id"],
+        "risk",
+        lambda: (compute_gapping_risk(profile), compute_wedge_wear_risk(profile)),
+    )
     
     risk_scores = {
         "wedgeWearRisk": wedge_risk,
@@ -212,13 +185,46 @@ async def suggested_deals(
             confidence="high" if any(d.matchScore and d.matchScore >= 0.8 for d in deals) else "medium",
         )
     
-    return SuggestedDealsResponse(
+    return FastJSONResponse(SuggestedDealsResponse(
         deals=deals,
         reasoning=reasoning,
         profileSummary=_profile_summary(profile),
         gappingAnalysis=gapping if gapping["hasGap"] else None,
         riskScores=risk_scores,
-    )
+        clickToken=create_click_token(user["_id"]),
+    ))
+
+
+@router.get("/similar-golfers", response_model=SimilarGolferDealsResponse)
+async def similar_golfer_deals(user=Depends(get_current_user)):
+    """
+    Deals that golfers with similar profiles engaged with.
+    
+    Nearest profiles come from the in-process LSH index; their recent
+    views/clicks are weighted by profile similarity.
+    """
+    profile = user.get("profile", {}) or {}
+    neighbors = profile_index.query(embed_profile(profile), k=SIMILAR_GOLFERS_K, exclude=user["_id"])
+    
+    scores: Counter = Counter()
+    for neighbor_id, similarity in neighbors:
+        if similarity <= 0:
+            continue
+        for deal_id in set(cooccurrence_model.history(neighbor_id)):
+            scores[deal_id] += similarity
+    
+    deals = []
+    top = max(scores.values(), default=0)
+    for deal_id, score in scores.most_common(SIMILAR_GOLFER_DEALS):
+        deal = get_deal_by_id(deal_id)
+        if deal is None:
+            continue
+        pick = deal.model_copy()
+        pick.matchScore = round(score / top, 3)
+        pick.matchReason = "Popular with golfers like you"
+        deals.append(pick)
+    
+    return FastJSONResponse(SimilarGolferDealsResponse(deals=deals, similarGolfers=len(neighbors)))
 
 
 # -----------------------------------------------------------------------------
@@ -230,11 +236,12 @@ async def suggested_deals(
 async def track_deal_view(
     body: DealViewRequest,
     background_tasks: BackgroundTasks,
-    user=Depends(get_current_user),
+    user=Depends(get_current_user_ref),
 ):
     """Track when a user views a deal."""
     deal = get_deal_by_id(body.dealId)
     if deal:
+        record_interaction(user["_id"], deal.id, "view")
         background_tasks.add_task(
             on_deal_viewed,
             user_id=user["_id"],
@@ -251,11 +258,12 @@ async def track_deal_view(
 async def track_deal_click(
     body: DealClickRequest,
     background_tasks: BackgroundTasks,
-    user=Depends(get_current_user),
+    user=Depends(get_current_user_ref),
 ):
     """Track when a user clicks through to a deal (affiliate link)."""
     deal = get_deal_by_id(body.dealId)
     if deal:
+        record_interaction(user["_id"], deal.id, "click")
         background_tasks.add_task(
             on_deal_clicked,
             user_id=user["_id"],
@@ -267,3 +275,46 @@ async def track_deal_click(
             retailer=deal.retailer,
         )
     return {"ok": True, "url": deal.url if deal else None}
+
+
+@router.post("/events", response_model=DealEventsResponse)
+async def track_deal_events(
+    body: DealEventsRequest,
+    background_tasks: BackgroundTasks,
+    user=Depends(get_current_user_ref),
+):
+    """
+    Track a batch of impressions/views/clicks (e.g. every deal card on a page)
+    with one authenticated request.
+    
+    Events with a client `eventId` are deduped across retries; events without
+    one are deduped by type and deal within the batch. Client timestamps are
+    kept unless missing or implausible.
+    """
+    user_id = user["_id"]
+    now = datetime.now(timezone.utc)
+    seen = set()
+    accepted = []
+    duplicates = unknown = 0
+    for event in body.events:
+        key = event.eventId or f"{event.type}:{event.dealId}"
+        if key in seen or (event.eventId and not recent_event_ids.add(f"{user_id}:{event.eventId}")):
+            duplicates += 1
+            continue
+        seen.add(key)
+        deal = get_deal_by_id(event.dealId)
+        if deal is None:
+            unknown += 1
+            continue
+        ts = client_time(event.ts, now)
+        if event.type == "impression":
+            record_event(user_id, deal.id, "impression", ts)
+        else:
+            record_interaction(user_id, deal.id, event.type, ts)
+        accepted.append({"kind": event.type, "deal": deal, "ts": ts, "event_id": event.eventId})
+
+    if any(e["kind"] != "impression" for e in accepted):
+        background_tasks.add_task(on_deal_events, user_id=user_id, email=user["email"], events=accepted)
+    return FastJSONResponse(
+        DealEventsResponse(accepted=len(accepted), duplicates=duplicates, unknownDeals=unknown)
+    )
@@ -0,0 +1,43 @@
+"""
+Operator endpoints for profiling a live worker (admin token required).
+
+GET /debug/profile samples this worker's stacks for a few seconds and
+returns collapsed stacks for flame graphs, e.g.:
+
+    curl -H "X-Admin-Token: $ADMIN_TOKEN" "http://host/debug/profile?seconds=10" > out.folded
+    flamegraph.pl out.folded > out.svg
+
+Per-request cProfile reports (see `app.profiling.RequestProfilerMiddleware`)
+are read back from GET /debug/profile/requests/{profile_id}.
+"""
+
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from ..deps import require_admin
+from ..profiling import MAX_SAMPLE_SECONDS, request_profiles, sample_blocking
+
+router = APIRouter(prefix="/debug", tags=["debug"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def sample_profile(
+    seconds: float = Query(10, gt=0, le=MAX_SAMPLE_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=1000),
+):
+    """Collapsed stacks ("frame;frame;frame count") sampled over `seconds`."""
+    profiler = await asyncio.to_thread(sample_blocking, seconds, interval_ms / 1000)
+    if profiler is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile is already running")
+    return PlainTextResponse(profiler.collapsed(), headers={"X-Profile-Samples": str(profiler.samples)})
+
+
+@router.get("/profile/requests/{profile_id}", response_class=PlainTextResponse)
+async def request_profile(profile_id: str):
+    """cProfile report of a request sent with `X-Profile: 1`."""
+    report = request_profiles.get(profile_id)
+    if report is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return PlainTextResponse(report)
@@ -0,0 +1,55 @@
+"""
+Affiliate redirect: GET /r/{deal_id}?t=<click token>
+
+Sends the user straight to the retailer with a 302. The deal URL comes
+from the in-memory catalog index and the user from a signed click token
+(see `app.auth.create_click_token`), so there is no auth dependency or
+database round trip before the redirect. The click is queued in the event
+buffer and sent to Klaviyo after the response.
+
+A click token is a bearer credential in a URL, so repeat clicks by the same
+user on the same deal within CLICK_DEDUPE_SECONDS (e.g. a leaked link being
+replayed) are recorded once per worker; later ones only redirect.
+"""
+
+import time
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, HTTPException, status
+from fastapi.responses import RedirectResponse
+
+from ..auth import verify_click_token
+from ..cooccurrence import record_interaction
+from ..deal_events import recent_event_ids, record_event
+from ..deals_data import get_deal_by_id
+from ..klaviyo import on_deal_clicked
+
+router = APIRouter(tags=["redirect"])
+
+_NO_STORE = {"Cache-Control": "no-store"}
+CLICK_DEDUPE_SECONDS = 300
+
+
+@router.get("/r/{deal_id}", response_class=RedirectResponse, status_code=status.HTTP_302_FOUND)
+async def redirect_to_deal(deal_id: str, background_tasks: BackgroundTasks, t: Optional[str] = None):
+    deal = get_deal_by_id(deal_id)
+    if deal is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Deal not found")
+
+    user_id = verify_click_token(t) if t else None
+    if user_id is None:
+        # Still counted toward the deal's clicks, just not attributed
+        record_event(None, deal.id, "click")
+    elif recent_event_ids.add(f"{user_id}:click:{deal.id}:{int(time.time() // CLICK_DEDUPE_SECONDS)}"):
+        record_interaction(user_id, deal.id, "click")
+        background_tasks.add_task(
+            on_deal_clicked,
+            user_id=user_id,
+            email=None,
+            deal_id=deal.id,
+            deal_title=deal.title,
+            deal_category=deal.category,
+            deal_price=deal.price,
+            retailer=deal.retailer,
+        )
+    return RedirectResponse(deal.url, status_code=status.HTTP_302_FOUND, headers=_NO_STORE)
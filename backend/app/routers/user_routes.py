@@ -1,47 +1,41 @@
-from fastapi import APIRouter, Depends, BackgroundTasks
+from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, status
 from datetime import datetime, timezone
 
-from ..deps import get_current_user
-from ..models import MeResponse, UserPublic, ProfileUpdateRequest
+from ..deps import get_current_user, get_current_user_ref
+from ..models import MeResponse, ProfileUpdateRequest, ProfilePatchRequest
+from ..profile_patch import ClubNotFoundError, ProfilePatchError, build_profile_updates
+from ..profile_schema import normalize_profile
+from ..responses import FastJSONResponse
 from ..db import get_db
+from .. import users_repo
 from ..klaviyo import on_bag_updated
+from ..similarity import index_profile
+from ..user_cache import user_cache
 
 router = APIRouter(prefix="/api", tags=["user"])
 
 
 @router.get("/me", response_model=MeResponse)
 async def me(user=Depends(get_current_user)):
-    user_public = UserPublic(
-        id=user["_id"],
-        username=user["username"],
-        email=user["email"],
-        profile=user.get("profile", {}),
-    )
-    return MeResponse(user=user_public)
+    return FastJSONResponse(MeResponse(user=users_repo.to_public(user)))
 
 
 @router.post("/profile", response_model=MeResponse)
 async def update_profile(
     body: ProfileUpdateRequest,
     background_tasks: BackgroundTasks,
-    user=Depends(get_current_user),
+    user=Depends(get_current_user_ref),
 ):
     db = get_db()
-    new_profile = body.profile or {}
+    new_profile = normalize_profile(body.profile)
     now = datetime.now(timezone.utc)
 
-    await db.users.update_one(
-        {"_id": user["_id"]},
-        {"$set": {"profile": new_profile, "updated_at": now}},
-    )
-
-    updated = await db.users.find_one({"_id": user["_id"]})
-    user_public = UserPublic(
-        id=updated["_id"],
-        username=updated["username"],
-        email=updated["email"],
-        profile=updated.get("profile", {}),
-    )
+    updated = await users_repo.update_profile(db, user["_id"], new_profile, now)
+    if not updated:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    user_cache.put(updated)
+    index_profile(updated["_id"], new_profile)
+    user_public = users_repo.to_public(updated)
     
     # Sync to Klaviyo in background
     background_tasks.add_task(
@@ -51,4 +45,45 @@ async def update_profile(
         profile=new_profile,
     )
     
-    return MeResponse(user=user_public)
+    return FastJSONResponse(MeResponse(user=user_public))
+
+
+@router.patch("/profile", response_model=MeResponse)
+async def patch_profile(
+    body: ProfilePatchRequest,
+    background_tasks: BackgroundTasks,
+    user=Depends(get_current_user_ref),
+):
+    """
+    Apply field-level profile operations (set/unset a field, push/update/remove
+    a club) as targeted MongoDB updates instead of rewriting the profile.
+    """
+    try:
+        steps, changed_fields = build_profile_updates(body.ops)
+    except ProfilePatchError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    db = get_db()
+    now = datetime.now(timezone.utc)
+    try:
+        updated = await users_repo.apply_profile_updates(db, user["_id"], steps, now)
+    except ClubNotFoundError as e:
+        # Normally nothing was written; if a concurrent change let earlier
+        # steps land, don't keep serving the old profile from cache
+        user_cache.invalidate(user["_id"])
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    if not updated:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    user_cache.put(updated)
+    profile = updated.get("profile", {})
+    index_profile(updated["_id"], profile)
+
+    background_tasks.add_task(
+        on_bag_updated,
+        user_id=updated["_id"],
+        email=updated["email"],
+        profile=profile,
+        changed_fields=changed_fields,
+    )
+
+    return FastJSONResponse(MeResponse(user=users_repo.to_public(updated)))
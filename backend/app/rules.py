@@ -0,0 +1,234 @@
+"""
+Declarative recommendation rules for BirdieDeals.
+
+Rules live in a JSON file (`recommendation_rules.json` by default, or
+RECOMMENDATION_RULES_PATH). Each rule is:
+
+    {
+        "id": "top-of-bag-gap",
+        "when": {"field": "gapType", "op": "eq", "value": "top-of-bag"},
+        "select": {"categories": ["hybrids", "fairway"], "tags": [...],
+                   "prefer": {"when": {...}, "tags": ["value"]}},
+        "unlessPicked": "driver",           # skip if a pick already has this category
+        "score": 0.85,
+        "reason": "Detected {gapDetails}",  # formatted with the rule context
+        "explanation": "gap at the top of your bag"
+    }
+
+At load time conditions are compiled into predicate functions and each
+selector is resolved against the catalog indexes into a fixed candidate
+list, so evaluating a profile never scans the deals. The file is re-read
+when its mtime changes (checked at most every RELOAD_CHECK_SECONDS).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import settings
+from .deals_data import DEALS_BY_CATEGORY, DEALS_BY_TAG, FEATURED_DEALS, load_catalog
+from .klaviyo import compute_gapping_risk, compute_wedge_wear_risk
+from .models import Deal
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_PATH = Path(__file__).parent / "recommendation_rules.json"
+RELOAD_CHECK_SECONDS = 2.0
+
+Context = Dict[str, Any]
+Predicate = Callable[[Context], bool]
+
+
+class RuleError(ValueError):
+    """Raised when a rules file can't be compiled."""
+
+
+def _compare(op: str, value: Any) -> Callable[[Any], bool]:
+    if op == "eq":
+        return lambda x: x == value
+    if op == "ne":
+        return lambda x: x != value
+    if op == "in":
+        allowed = set(value)
+        return lambda x: x in allowed
+    if op == "contains":
+        return lambda x: x is not None and value in x
+    if op == "exists":
+        return lambda x: (x is not None) == bool(value)
+    comparisons = {
+        "lt": lambda x: x < value,
+        "lte": lambda x: x <= value,
+        "gt": lambda x: x > value,
+        "gte": lambda x: x >= value,
+    }
+    if op in comparisons:
+        compare = comparisons[op]
+        return lambda x: x is not None and compare(x)
+    raise RuleError(f"Unknown operator: {op}")
+
+
+def compile_condition(spec: Dict[str, Any]) -> Predicate:
+    """Compile a condition tree ({all|any|not|field/op/value}) into a predicate."""
+    if "all" in spec:
+        parts = [compile_condition(s) for s in spec["all"]]
+        return lambda ctx: all(p(ctx) for p in parts)
+    if "any" in spec:
+        parts = [compile_condition(s) for s in spec["any"]]
+        return lambda ctx: any(p(ctx) for p in parts)
+    if "not" in spec:
+        inner = compile_condition(spec["not"])
+        return lambda ctx: not inner(ctx)
+    if "field" not in spec or "op" not in spec:
+        raise RuleError(f"Invalid condition: {spec}")
+    field = spec["field"]
+    test = _compare(spec["op"], spec.get("value"))
+    return lambda ctx: test(ctx.get(field))
+
+
+def _candidates(categories: List[str], tags: List[str]) -> List[Deal]:
+    """Deals in any of `categories` carrying all `tags`, in catalog order."""
+    if categories:
+        pool = [d for c in categories for d in DEALS_BY_CATEGORY.get(c, [])]
+    else:
+        pool = list(FEATURED_DEALS)
+    for tag in tags:
+        tagged = {id(d) for d in DEALS_BY_TAG.get(tag, [])}
+        pool = [d for d in pool if id(d) in tagged]
+    position = {id(d): i for i, d in enumerate(FEATURED_DEALS)}
+    return sorted(pool, key=lambda d: position[id(d)])
+
+
+class _FormatContext(dict):
+    def __missing__(self, key: str) -> str:
+        return ""
+
+
+class CompiledRule:
+    """A rule with its predicate and candidate deals resolved."""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.id = spec.get("id", "")
+        self.predicate = compile_condition(spec.get("when", {"all": []}))
+        select = spec.get("select", {})
+        tags = select.get("tags", [])
+        categories = select.get("categories", [])
+        self.candidates = _candidates(categories, tags)
+        prefer = select.get("prefer")
+        if prefer:
+            self.prefer_predicate: Optional[Predicate] = compile_condition(prefer.get("when", {"all": []}))
+            self.preferred = _candidates(categories, tags + prefer.get("tags", []))
+        else:
+            self.prefer_predicate = None
+            self.preferred = []
+        self.unless_picked = spec.get("unlessPicked")
+        self.score = float(spec["score"])
+        self.reason = spec.get("reason", "")
+        self.explanation = spec.get("explanation")
+
+    def pick(self, ctx: Context) -> Optional[Deal]:
+        if self.prefer_predicate is not None and self.preferred and self.prefer_predicate(ctx):
+            return self.preferred[0]
+        return self.candidates[0] if self.candidates else None
+
+
+def compile_rules(data: Dict[str, Any]) -> List[CompiledRule]:
+    load_catalog()
+    try:
+        return [CompiledRule(spec) for spec in data.get("rules", [])]
+    except (KeyError, TypeError, ValueError) as e:
+        raise RuleError(f"Invalid rules file: {e}") from e
+
+
+def build_context(profile: Dict[str, Any]) -> Context:
+    """Profile fields plus the derived values rules can test."""
+    gapping = compute_gapping_risk(profile)
+    ctx = dict(profile)
+    ctx["budget"] = profile.get("budgetSensitivity", "Balanced").lower()
+    ctx["wedgeWearRisk"] = compute_wedge_wear_risk(profile)
+    ctx["gapType"] = gapping["gapType"]
+    ctx["gapDetails"] = gapping["gapDetails"]
+    ctx["hasOverlap"] = gapping["hasOverlap"]
+    return ctx
+
+
+class RuleEngine:
+    """Evaluates compiled rules; hot-reloads the rules file on change."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or settings.RECOMMENDATION_RULES_PATH or DEFAULT_RULES_PATH)
+        self.rules: List[CompiledRule] = []
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self) -> bool:
+        """Re-read and compile the rules file. Keeps the old rules on error."""
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime
+                with open(self.path) as f:
+                    rules = compile_rules(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to load recommendation rules from {self.path}: {e}")
+                return False
+            self.rules = rules
+            self._mtime = mtime
+            logger.info(f"Loaded {len(rules)} recommendation rules from {self.path}")
+            return True
+
+    def maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + RELOAD_CHECK_SECONDS
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+    def evaluate(self, profile: Dict[str, Any]) -> Tuple[List[Deal], List[str], List[str], Context]:
+        """
+        Run every rule against the profile.
+
+        Returns:
+            (picks, explanations, categories, context)
+        """
+        self.maybe_reload()
+        ctx = build_context(profile)
+        fmt = _FormatContext(ctx)
+        picks: List[Deal] = []
+        explanations: List[str] = []
+        categories: List[str] = []
+        for rule in self.rules:
+            if rule.unless_picked and rule.unless_picked in categories:
+                continue
+            if not rule.predicate(ctx):
+                continue
+            deal = rule.pick(ctx)
+            if deal is None:
+                continue
+            pick = deal.model_copy()
+            pick.matchScore = rule.score
+            pick.matchReason = rule.reason.format_map(fmt)
+            picks.append(pick)
+            categories.append(pick.category)
+            if rule.explanation:
+                explanations.append(rule.explanation)
+        return picks, explanations, categories, ctx
+
+
+_engine: Optional[RuleEngine] = None
+
+
+def get_rule_engine() -> RuleEngine:
+    global _engine
+    if _engine is None:
+        _engine = RuleEngine()
+    return _engine
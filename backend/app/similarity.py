@@ -0,0 +1,226 @@
+"""
+Similar-golfer lookup for BirdieDeals.
+
+This module handles:
+- Embedding a golfer profile into a fixed-length numeric vector
+  (distances, handicap, play frequency, budget, brands, bag composition)
+- An approximate nearest-neighbor index over those vectors using
+  random-projection LSH (several tables of random hyperplanes), updated
+  incrementally as profiles change: directly by the worker that handled
+  the write, and in every worker from the users change stream (see
+  `app.user_cache`)
+
+Queries only score the candidates that share a bucket with the query in at
+least one table, so lookup cost depends on bucket size, not user count.
+"""
+
+import asyncio
+import heapq
+import logging
+import math
+import random
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .profile_schema import ensure_current
+
+logger = logging.getLogger(__name__)
+
+BUDGET_LEVELS = ["Value-First", "Balanced", "Performance-First"]
+BRAND_BUCKETS = 8  # preferred/bag brands are hashed into this many slots
+CLUB_KINDS = ["driver", "wood", "hybrid", "iron", "wedge", "putter"]
+EMBEDDING_DIM = 6 + len(BUDGET_LEVELS) + BRAND_BUCKETS + len(CLUB_KINDS)
+
+LSH_TABLES = 8
+LSH_BITS = 16  # raise as the user count grows to keep buckets small
+LSH_SEED = 1729
+
+
+def _scaled(value: Optional[float], center: float, spread: float) -> float:
+    # Profiles are normalized at write time, so numeric fields are numbers or absent
+    if value is None:
+        return 0.0
+    return max(-2.0, min(2.0, (value - center) / spread))
+
+
+def _brand_slot(brand: str) -> int:
+    return zlib.crc32(brand.strip().lower().encode()) % BRAND_BUCKETS
+
+
+def _club_kind(name: str) -> Optional[str]:
+    lowered = name.lower()
+    if "driver" in lowered:
+        return "driver"
+    if "putter" in lowered:
+        return "putter"
+    if "wedge" in lowered or lowered in ("pw", "gw", "aw", "sw", "lw"):
+        return "wedge"
+    for kind in ("wood", "hybrid", "iron"):
+        if kind in lowered:
+            return kind
+    return None
+
+
+def embed_profile(profile: Dict[str, Any]) -> List[float]:
+    """
+    Map a golfer profile to a centered feature vector of EMBEDDING_DIM floats.
+
+    Expects a normalized profile (see `app.profile_schema`). Missing
+    numeric fields map to 0 (the population center), so sparse profiles
+    sit near the middle rather than at an extreme.
+    """
+    vec = [
+        _scaled(profile.get("handicap"), 15, 10),
+        _scaled(profile.get("driverCarry"), 230, 30),
+        _scaled(profile.get("sevenIronCarry"), 150, 20),
+        _scaled(profile.get("roundsPerMonth"), 4, 4),
+        _scaled(profile.get("monthsPlayedPerYear"), 8, 4),
+        1.0 if profile.get("willingToBuyUsed") else -1.0,
+    ]
+
+    budget = profile.get("budgetSensitivity", "Balanced")
+    vec.extend(1.0 if budget == level else 0.0 for level in BUDGET_LEVELS)
+
+    brands = [0.0] * BRAND_BUCKETS
+    for brand in profile.get("preferredBrands", []):
+        brands[_brand_slot(brand)] += 1.0
+    clubs = profile.get("clubs", [])
+    for club in clubs:
+        if club.get("brand"):
+            brands[_brand_slot(club["brand"])] += 0.25
+    vec.extend(min(b, 2.0) for b in brands)
+
+    kinds = dict.fromkeys(CLUB_KINDS, 0.0)
+    for club in clubs:
+        kind = _club_kind(club["name"])
+        if kind:
+            kinds[kind] += 1.0
+    vec.extend(kinds[kind] / 4.0 for kind in CLUB_KINDS)
+    return vec
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a) * sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class ProfileIndex:
+    """Random-projection LSH index keyed by user id."""
+
+    def __init__(
+        self,
+        dim: int = EMBEDDING_DIM,
+        tables: int = LSH_TABLES,
+        bits: int = LSH_BITS,
+        seed: int = LSH_SEED,
+    ):
+        rng = random.Random(seed)
+        self._planes = [
+            [[rng.gauss(0.0, 1.0) for _ in range(dim)] for _ in range(bits)]
+            for _ in range(tables)
+        ]
+        self._buckets: List[Dict[int, Set[str]]] = [defaultdict(set) for _ in range(tables)]
+        self._vectors: Dict[str, List[float]] = {}
+        self._signatures: Dict[str, Tuple[int, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def _signature(self, vec: List[float]) -> Tuple[int, ...]:
+        sig = []
+        for planes in self._planes:
+            key = 0
+            for plane in planes:
+                key = (key << 1) | (sum(p * v for p, v in zip(plane, vec)) >= 0)
+            sig.append(key)
+        return tuple(sig)
+
+    def upsert(self, user_id: str, vec: List[float], signature: Optional[Tuple[int, ...]] = None) -> None:
+        """Insert or move a user; only the buckets that changed are touched."""
+        new_sig = signature or self._signature(vec)
+        old_sig = self._signatures.get(user_id)
+        for table, (old_key, new_key) in enumerate(zip(old_sig or [None] * len(new_sig), new_sig)):
+            if old_key == new_key:
+                continue
+            if old_key is not None:
+                bucket = self._buckets[table][old_key]
+                bucket.discard(user_id)
+                if not bucket:
+                    del self._buckets[table][old_key]
+            self._buckets[table][new_key].add(user_id)
+        self._vectors[user_id] = vec
+        self._signatures[user_id] = new_sig
+
+    def remove(self, user_id: str) -> None:
+        sig = self._signatures.pop(user_id, None)
+        self._vectors.pop(user_id, None)
+        if sig is None:
+            return
+        for table, key in enumerate(sig):
+            bucket = self._buckets[table].get(key)
+            if bucket is not None:
+                bucket.discard(user_id)
+                if not bucket:
+                    del self._buckets[table][key]
+
+    def query(
+        self,
+        vec: List[float],
+        k: int = 10,
+        exclude: Optional[str] = None,
+    ) -> List[Tuple[str, float]]:
+        """Approximate top-k (user_id, cosine similarity) for a vector."""
+        candidates: Set[str] = set()
+        for table, key in enumerate(self._signature(vec)):
+            candidates |= self._buckets[table].get(key, set())
+        candidates.discard(exclude)
+        scored = ((user_id, _cosine(vec, self._vectors[user_id])) for user_id in candidates)
+        return heapq.nlargest(k, scored, key=lambda x: x[1])
+
+
+profile_index = ProfileIndex()
+
+
+def index_profile(user_id: str, profile: Dict[str, Any]) -> None:
+    """Add or refresh a user in the in-process similar-golfer index."""
+    profile_index.upsert(user_id, embed_profile(profile or {}))
+
+
+def refresh_profile(user_id: str, profile: Optional[Dict[str, Any]]) -> None:
+    """Apply a stored profile change from another worker (None: the user is gone)."""
+    if profile is None:
+        profile_index.remove(user_id)
+    else:
+        index_profile(user_id, ensure_current(profile))
+
+
+def _embed_batch(
+    index: ProfileIndex,
+    docs: List[Dict[str, Any]],
+) -> List[Tuple[str, List[float], Tuple[int, ...]]]:
+    # Only reads the index's hyperplanes, so it's safe off the event loop
+    result = []
+    for doc in docs:
+        vec = embed_profile(ensure_current(doc.get("profile")))
+        result.append((doc["_id"], vec, index._signature(vec)))
+    return result
+
+
+async def load_profile_index(db, batch_size: int = 1000) -> int:
+    """
+    Populate the index from the users collection. Returns users indexed.
+
+    Hashing is ~0.4 ms per user in pure Python, so each batch is embedded
+    in the default executor and only the bucket updates run on the event
+    loop; requests keep being served while a large collection loads.
+    """
+    loop = asyncio.get_running_loop()
+    count = 0
+    cursor = db.users.find({}, {"profile": 1}, batch_size=batch_size)
+    while docs := await cursor.to_list(batch_size):
+        for user_id, vec, signature in await loop.run_in_executor(None, _embed_batch, profile_index, docs):
+            profile_index.upsert(user_id, vec, signature)
+        count += len(docs)
+    return count
@@ -0,0 +1,308 @@
+"""
+Lightweight request tracing.
+
+This module handles:
+- Spans carried in a contextvar, so the current request's trace follows
+  the request into motor's executor threads (motor copies the context),
+  Klaviyo calls and background tasks started by the request
+- An ASGI middleware opening a root span per request. It continues an
+  incoming W3C `traceparent` and returns the trace id as `X-Request-Id`
+- A pymongo command listener recording a child span per MongoDB command
+- Exporting finished spans in batches from a background task, as JSON
+  lines to TRACE_FILE and/or as OTLP/HTTP JSON to TRACE_OTLP_ENDPOINT
+  (e.g. a local collector at http://127.0.0.1:4318/v1/traces)
+
+Tracing is off unless an exporter is configured; then `span()` is a
+no-op and only the request id is kept. TRACE_SAMPLE_RATE samples whole
+traces.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from .config import settings
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "birdiedeals-api"
+# OTLP SpanKind values
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, kind: str = "internal", **attributes):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = attributes
+        self.error: Optional[str] = None
+
+    def child(self, name: str, kind: str = "internal", **attributes) -> "Span":
+        return Span(self.trace_id, self.span_id, name, kind, **attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start_ns,
+            "durationMs": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class SpanExporter:
+    """Buffers finished spans (from any thread) and writes them out in batches."""
+
+    def __init__(self, path: str = "", otlp_endpoint: str = "", capacity: int = 10_000):
+        self.path = path
+        self.otlp_endpoint = otlp_endpoint
+        self._spans: Deque[Span] = deque(maxlen=capacity)
+        self.exported = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path or self.otlp_endpoint)
+
+    def add(self, span: Span) -> None:
+        self._spans.append(span)
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def drain(self, max_spans: int = 1000) -> List[Span]:
+        count = min(max_spans, len(self._spans))
+        return [self._spans.popleft() for _ in range(count)]
+
+    def _write_file(self, spans: List[Span]) -> None:
+        with open(self.path, "a") as f:
+            f.writelines(json.dumps(s.to_dict(), default=str) + "\n" for s in spans)
+
+    async def export(self, client: Optional["httpx.AsyncClient"] = None) -> int:
+        """Write out everything buffered. Returns the number of spans exported."""
+        import httpx  # only needed once tracing is on; keeps it off the import path
+
+        spans = self.drain(len(self._spans))
+        if not spans:
+            return 0
+        try:
+            if self.path:
+                await asyncio.to_thread(self._write_file, spans)
+            if self.otlp_endpoint and client is not None:
+                resp = await client.post(self.otlp_endpoint, json=otlp_payload(spans))
+                resp.raise_for_status()
+        except (OSError, httpx.HTTPError) as e:
+            self.failures += 1
+            logger.error("Failed to export %d spans: %s", len(spans), e)
+            return 0
+        self.exported += len(spans)
+        return len(spans)
+
+
+exporter = SpanExporter(settings.TRACE_FILE, settings.TRACE_OTLP_ENDPOINT)
+
+# (trace_id, span or None when the trace isn't sampled/recorded)
+_current: ContextVar[Tuple[Optional[str], Optional[Span]]] = ContextVar("trace", default=(None, None))
+
+
+def current_trace_id() -> Optional[str]:
+    return _current.get()[0]
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()[1]
+
+
+def _finish(span: Span) -> None:
+    if span.end_ns is None:
+        span.end_ns = time.time_ns()
+    exporter.add(span)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes) -> Iterator[Optional[Span]]:
+    """Child span of the current span for the duration of the block (None if not tracing)."""
+    trace_id, parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, kind, **attributes)
+    token = _current.set((trace_id, child))
+    try:
+        yield child
+    except BaseException as e:
+        child.error = repr(e)
+        raise
+    finally:
+        _current.reset(token)
+        _finish(child)
+
+
+def _parse_traceparent(value: bytes) -> Tuple[Optional[str], Optional[str]]:
+    """(trace_id, parent span id) from a W3C traceparent header, if valid."""
+    parts = value.decode("latin-1").split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None, None
+    return parts[1], parts[2]
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span of each request."""
+
+    def __init__(self, app, tracer: SpanExporter = exporter):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        trace_id, parent_id = _parse_traceparent(headers.get(b"traceparent", b""))
+        trace_id = trace_id or os.urandom(16).hex()
+        root = None
+        if self.tracer.enabled and random.random() < settings.TRACE_SAMPLE_RATE:
+            root = Span(trace_id, parent_id, scope["path"], "server", **{"http.method": scope["method"]})
+        token = _current.set((trace_id, root))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-request-id", trace_id.encode())]}
+                if root is not None:
+                    root.attributes["http.status_code"] = message["status"]
+            elif root is not None and message["type"] == "http.response.body" and not message.get("more_body"):
+                # The request span ends with the response; background tasks get their own spans
+                route = scope.get("route")
+                root.name = f"{scope['method']} {getattr(route, 'path', scope['path'])}"
+                _finish(root)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            if root is not None and root.end_ns is None:
+                root.error = repr(e)
+                _finish(root)
+            raise
+        finally:
+            _current.reset(token)
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """Records a span per MongoDB command under the current request's span."""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[int, Any], Span] = {}
+
+    def started(self, event):
+        parent = current_span()
+        if parent is None:
+            return
+        self._pending[(event.request_id, event.connection_id)] = parent.child(
+            f"mongodb {event.command_name}", "client",
+            **{"db.system": "mongodb", "db.name": event.database_name, "db.operation": event.command_name},
+        )
+
+    def _end(self, event, error: Optional[str] = None):
+        child = self._pending.pop((event.request_id, event.connection_id), None)
+        if child is None:
+            return
+        child.end_ns = child.start_ns + event.duration_micros * 1000
+        child.error = error
+        _finish(child)
+
+    def succeeded(self, event):
+        self._end(event)
+
+    def failed(self, event):
+        self._end(event, str(event.failure))
+
+
+mongo_command_tracer = MongoCommandTracer()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_payload(spans: List[Span]) -> Dict[str, Any]:
+    """An OTLP/HTTP JSON ExportTraceServiceRequest."""
+    otlp_spans = []
+    for s in spans:
+        item = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": SPAN_KINDS.get(s.kind, 1),
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            item["parentSpanId"] = s.parent_id
+        otlp_spans.append(item)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": otlp_spans}],
+        }]
+    }
+
+
+async def run_span_exporter(tracer: SpanExporter = exporter) -> None:
+    """Export buffered spans every TRACE_EXPORT_SECONDS; flushes what's left when cancelled."""
+    import httpx
+
+    async with httpx.AsyncClient(timeout=5.0) as client:
+        try:
+            while True:
+                await asyncio.sleep(settings.TRACE_EXPORT_SECONDS)
+                while len(tracer) and await tracer.export(client):
+                    pass
+        finally:
+            await tracer.export(client)
+
+
+class TraceContextFilter(logging.Filter):
+    """Adds the current request id to log records (as `request_id`)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace_id = current_trace_id()
+        if trace_id is not None:
+            record.request_id = trace_id
+        return True
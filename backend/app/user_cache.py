@@ -0,0 +1,237 @@
+"""
+Per-worker read-through cache of user documents and derived data.
+
+This module handles:
+- An LRU/TTL cache of users' public fields, plus per-user derived values
+  (e.g. gap analysis) that are dropped together with the document
+- Keeping every worker's cache coherent by listening to a MongoDB change
+  stream on `users` and invalidating the changed user ids. The stream
+  starts at the current time: a (re)started worker's cache is empty, and
+  the cache is cleared whenever the stream has to be reopened, so there
+  is nothing earlier to catch up on
+- A polling fallback on `updated_at` for standalone servers, where change
+  streams aren't available
+- Passing profile changes (user id and stored profile, None once deleted)
+  to an optional `on_change` callback, so other per-worker state derived
+  from profiles (the similar-golfer index) follows writes made by any
+  worker. Writes that don't touch the profile only invalidate
+
+The TTL is a safety net for anything the listener misses (e.g. deletes
+while polling).
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANGE_STREAMS_UNSUPPORTED = 40573  # "only supported on replica sets"
+
+# (user_id, stored profile or None if the user was deleted)
+ChangeCallback = Callable[[str, Optional[Dict[str, Any]]], None]
+
+
+class UserCache:
+    """LRU cache of user documents with TTL expiry and per-user derived data."""
+
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # user_id -> (expires_at, document, derived values)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any], Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Invalidation clock: user_id -> tick of its last invalidation, for
+        # the most recently invalidated users. A read-through `put` whose
+        # read started before a later invalidation is skipped.
+        self._clock = 0
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._forgotten = 0  # newest tick dropped from `_invalidated` (or of a clear)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def mark(self) -> int:
+        """Take before reading a user from MongoDB; pass to `put` as `read_since`."""
+        return self._clock
+
+    def _changed_since(self, user_id: str, tick: int) -> bool:
+        last = self._invalidated.get(user_id)
+        return (last if last is not None else self._forgotten) > tick
+
+    def put(self, user: Dict[str, Any], read_since: Optional[int] = None) -> None:
+        """
+        Cache a user document. With `read_since` (a `mark()` taken before the
+        read), the document is dropped if the user was invalidated meanwhile,
+        since the read may predate the change.
+        """
+        if read_since is not None and self._changed_since(user["_id"], read_since):
+            return
+        self._entries[user["_id"]] = (time.monotonic() + self.ttl_seconds, user, {})
+        self._entries.move_to_end(user["_id"])
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_derived(self, user_id: str, key: str, compute: Callable[[], Any]) -> Any:
+        """Return a cached derived value for a cached user, computing it once."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return compute()
+        derived = entry[2]
+        if key not in derived:
+            derived[key] = compute()
+        return derived[key]
+
+    def invalidate(self, user_id: str) -> None:
+        self._clock += 1
+        self._invalidated[user_id] = self._clock
+        self._invalidated.move_to_end(user_id)
+        if len(self._invalidated) > self.max_entries:
+            _, self._forgotten = self._invalidated.popitem(last=False)
+        if self._entries.pop(user_id, None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._clock += 1
+        self._invalidated.clear()
+        self._forgotten = self._clock
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+user_cache = UserCache(
+    max_entries=settings.USER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+)
+
+
+# Whether an update set or removed `profile` or anything under it
+_PROFILE_CHANGED = {"$gt": [{"$size": {"$filter": {
+    "input": {"$concatArrays": [
+        {"$map": {
+            "input": {"$objectToArray": {"$ifNull": ["$updateDescription.updatedFields", {}]}},
+            "in": "$$this.k",
+        }},
+        {"$ifNull": ["$updateDescription.removedFields", []]},
+    ]},
+    "cond": {"$regexMatch": {"input": "$$this", "regex": r"^profile(\.|$)"}},
+}}}, 0]}
+
+
+async def watch_invalidations(db, cache: UserCache, on_change: Optional[ChangeCallback] = None) -> None:
+    """Invalidate cached users from the `users` change stream until cancelled."""
+    pipeline: List[Dict[str, Any]] = [{"$project": {"documentKey": 1}}]
+    if on_change is not None:
+        # Every change still invalidates, but only inserts, replaces,
+        # deletes and updates touching the profile are passed on. Other
+        # writes (e.g. the cohort job's `analytics` fields) aren't looked
+        # up or re-embedded.
+        pipeline = [{"$project": {
+            "documentKey": 1,
+            "operationType": 1,
+            "fullDocument.profile": 1,  # present for inserts and replaces
+            "profileChanged": _PROFILE_CHANGED,
+        }}]
+    async with db.users.watch(pipeline) as stream:
+        logger.info("User cache listening to users change stream")
+        async for change in stream:
+            user_id = change["documentKey"]["_id"]
+            cache.invalidate(user_id)
+            if on_change is None:
+                continue
+            operation = change.get("operationType")
+            if operation == "delete":
+                on_change(user_id, None)
+            elif operation in ("insert", "replace"):
+                on_change(user_id, change.get("fullDocument", {}).get("profile", {}))
+            elif change.get("profileChanged"):
+                doc = await db.users.find_one({"_id": user_id}, {"profile": 1})
+                on_change(user_id, None if doc is None else doc.get("profile", {}))
+
+
+async def poll_invalidations_once(
+    db,
+    cache: UserCache,
+    since: datetime,
+    on_change: Optional[ChangeCallback] = None,
+) -> datetime:
+    """Invalidate users updated after `since`; returns the new high-water mark."""
+    newest = since
+    projection = {"_id": 1, "updated_at": 1}
+    if on_change is not None:
+        projection["profile"] = 1
+    cursor = db.users.find({"updated_at": {"$gt": since}}, projection)
+    async for doc in cursor:
+        cache.invalidate(doc["_id"])
+        if on_change is not None:
+            on_change(doc["_id"], doc.get("profile", {}))
+        updated_at = doc["updated_at"]
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        newest = max(newest, updated_at)
+    return newest
+
+
+async def poll_invalidations(
+    db,
+    cache: UserCache,
+    interval: float,
+    on_change: Optional[ChangeCallback] = None,
+) -> None:
+    """Polling fallback for servers without change streams."""
+    logger.info("User cache polling users.updated_at every %ss", interval)
+    since = datetime.now(timezone.utc)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            since = await poll_invalidations_once(db, cache, since, on_change)
+        except PyMongoError as e:
+            logger.error("User cache poll failed: %s", e)
+
+
+async def run_invalidation_listener(
+    db,
+    cache: UserCache = user_cache,
+    on_change: Optional[ChangeCallback] = None,
+) -> None:
+    """Keep `cache` (and whatever `on_change` maintains) coherent with writes from any worker or script."""
+    while True:
+        try:
+            await watch_invalidations(db, cache, on_change)
+        except OperationFailure as e:
+            if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                break
+            logger.error("Users change stream failed: %s", e)
+        except PyMongoError as e:
+            logger.error("Users change stream failed: %s", e)
+        # Changes may have been missed while the stream was down
+        cache.clear()
+        await asyncio.sleep(settings.USER_CACHE_POLL_SECONDS)
+    await poll_invalidations(db, cache, settings.USER_CACHE_POLL_SECONDS, on_change)
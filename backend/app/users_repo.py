@@ -0,0 +1,140 @@
+"""
+Data access for the users collection.
+
+Every read takes a projection for its use case so handlers never pull
+`password_hash` (or the full document) unless they need it, and profile
+writes return the updated document in the same round trip.
+
+Profiles returned from here are always in the current normalized form
+(see `app.profile_schema`).
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+from .models import UserPublic
+from .profile_patch import ClubNotFoundError, missing_clubs_message
+from .profile_schema import ensure_current
+
+# Identity only: event tracking and other endpoints that just need who the user is
+REF_PROJECTION = {"_id": 1, "email": 1}
+# Everything safe to return to the client (`/me`, suggestions)
+PUBLIC_PROJECTION = {"_id": 1, "username": 1, "email": 1, "profile": 1}
+# Login needs the hash to verify the password
+LOGIN_PROJECTION = {**PUBLIC_PROJECTION, "password_hash": 1}
+
+
+def _current(doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    # Profiles written before schema versioning are normalized on read
+    if doc is not None and "profile" in doc:
+        doc["profile"] = ensure_current(doc["profile"])
+    return doc
+
+
+async def find_by_id(
+    db,
+    user_id: str,
+    projection: Dict[str, int] = PUBLIC_PROJECTION,
+) -> Optional[Dict[str, Any]]:
+    return _current(await db.users.find_one({"_id": user_id}, projection))
+
+
+async def find_by_email(
+    db,
+    email: str,
+    projection: Dict[str, int] = PUBLIC_PROJECTION,
+) -> Optional[Dict[str, Any]]:
+    return _current(await db.users.find_one({"email": email.lower()}, projection))
+
+
+async def email_exists(db, email: str) -> bool:
+    return await db.users.find_one({"email": email.lower()}, {"_id": 1}) is not None
+
+
+async def insert_user(db, doc: Dict[str, Any]) -> None:
+    await db.users.insert_one(doc)
+
+
+async def update_profile(
+    db,
+    user_id: str,
+    profile: Dict[str, Any],
+    now: datetime,
+) -> Optional[Dict[str, Any]]:
+    """Replace the (normalized) profile and return the updated public fields in one round trip."""
+    return await db.users.find_one_and_update(
+        {"_id": user_id},
+        {"$set": {"profile": profile, "updated_at": now}},
+        projection=PUBLIC_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def _stamped(update: Any, now: datetime) -> Any:
+    """`update` (document or pipeline) also setting `updated_at`."""
+    if isinstance(update, list):
+        return update + [{"$set": {"updated_at": now}}]
+    return {**update, "$set": {**update.get("$set", {}), "updated_at": now}}
+
+
+def _step_filter(user_id: str, conditions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"_id": user_id, "$and": conditions} if conditions else {"_id": user_id}
+
+
+async def apply_profile_updates(
+    db,
+    user_id: str,
+    steps: List[Tuple[Any, Dict[str, Any]]],
+    now: datetime,
+) -> Optional[Dict[str, Any]]:
+    """
+    Apply field-level update steps (see `app.profile_patch`) in order.
+
+    Every step stamps `updated_at` (so polling workers see it), and the
+    last one returns the updated public fields, so a single-step patch is
+    one round trip.
+
+    Raises:
+        ClubNotFoundError: a step's `filter` (clubs that must exist) didn't
+            match. The first step carries every condition of the patch, so
+            nothing has been written unless the profile changed
+            concurrently between steps.
+    """
+    async def not_applied(conditions: List[Dict[str, Any]]) -> None:
+        # Nothing matched: a missing user is reported as None, a failed
+        # step condition as an error
+        if conditions and await db.users.find_one({"_id": user_id}, {"_id": 1}) is not None:
+            raise ClubNotFoundError(missing_clubs_message(conditions))
+
+    *head, (last, last_options) = steps
+    for update, options in head:
+        options = dict(options)
+        conditions = options.pop("filter", [])
+        result = await db.users.update_one(_step_filter(user_id, conditions), _stamped(update, now), **options)
+        if result.matched_count == 0:
+            await not_applied(conditions)
+            return None
+
+    last_options = dict(last_options)
+    conditions = last_options.pop("filter", [])
+    updated = await db.users.find_one_and_update(
+        _step_filter(user_id, conditions),
+        _stamped(last, now),
+        projection=PUBLIC_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+        **last_options,
+    )
+    if updated is None:
+        await not_applied(conditions)
+    return _current(updated)
+
+
+def to_public(doc: Dict[str, Any]) -> UserPublic:
+    return UserPublic(
+        id=doc["_id"],
+        username=doc["username"],
+        email=doc["email"],
+        profile=doc.get("profile", {}),
+    )
@@ -0,0 +1 @@
+"""In-process performance benchmarks for the BirdieDeals API (not run by pytest)."""
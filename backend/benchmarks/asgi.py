@@ -0,0 +1,104 @@
+"""Helpers for driving the ASGI app directly, without an HTTP client or socket."""
+
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+# App calls still running background tasks after their response was sent
+_pending: Set[asyncio.Task] = set()
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def latency_summary(timings: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max in milliseconds (sorts `timings` in place)."""
+    timings.sort()
+    return {
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+        "max_ms": round(timings[-1] * 1000, 3),
+    }
+
+
+def _scope(method: str, path: str, query: bytes, headers: List[Tuple[bytes, bytes]]) -> Dict[str, Any]:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query,
+        "root_path": "",
+        # Browsers and mobile clients all accept gzip
+        "headers": [(b"host", b"bench"), (b"accept-encoding", b"gzip"), *headers],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+
+
+async def request(
+    app,
+    method: str,
+    path: str,
+    query: bytes = b"",
+    token: Optional[str] = None,
+    json_body: Any = None,
+) -> Tuple[int, float]:
+    """
+    Send one request and return (status, seconds until the response was complete).
+
+    Like a real client, this returns as soon as the last body chunk is sent;
+    background tasks keep running and are awaited by `wait_pending`.
+    """
+    headers = []
+    body = b""
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    if json_body is not None:
+        body = json.dumps(json_body).encode()
+        headers.append((b"content-type", b"application/json"))
+        headers.append((b"content-length", str(len(body)).encode()))
+
+    status = 0
+    done = asyncio.Event()
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            done.set()
+
+    start = time.perf_counter()
+    task = asyncio.ensure_future(app(_scope(method, path, query, headers), receive, send))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+    waiter = asyncio.ensure_future(done.wait())
+    await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+    elapsed = time.perf_counter() - start
+    waiter.cancel()
+    if task.done() and task.exception() is not None:
+        return 500, elapsed
+    return status, elapsed
+
+
+async def wait_pending() -> None:
+    """Wait for background work started by earlier requests to finish."""
+    if _pending:
+        await asyncio.gather(*list(_pending), return_exceptions=True)
@@ -0,0 +1,174 @@
+"""
+Local stand-in for the Klaviyo API, for offline development and load tests.
+
+Implements the endpoints `app.klaviyo` calls (profile import, events and
+the bulk profile/event jobs), answering the way Klaviyo does, with
+configurable latency, random server errors and 429 throttling from a
+token bucket (with a Retry-After header). GET /_stats returns request
+counts by path and response status.
+
+Run it standalone and point the backend at it:
+    FAKE_KLAVIYO_LATENCY_MS=150 FAKE_KLAVIYO_RATE_LIMIT=10 \\
+        uvicorn benchmarks.fake_klaviyo:app --port 8010
+    KLAVIYO_BASE_URL=http://127.0.0.1:8010 KLAVIYO_API_KEY=fake uvicorn app.main:app
+
+Settings (constructor arguments, or FAKE_KLAVIYO_* environment variables
+for the module-level `app`):
+- LATENCY_MS / JITTER_MS: response delay, normally distributed
+- ERROR_RATE: share of requests answered with a 500 (0-1)
+- RATE_LIMIT / BURST: sustained requests per second and bucket size
+  (unset: no throttling)
+"""
+
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+from uuid import uuid4
+
+# Path -> (expected data.type, response status, response resource type or None for an empty body)
+ENDPOINTS: Dict[str, Tuple[str, int, Optional[str]]] = {
+    "/api/profile-import": ("profile", 200, "profile"),
+    "/api/events": ("event", 202, None),
+    "/api/profile-bulk-import-jobs": ("profile-bulk-import-job", 202, "profile-bulk-import-job"),
+    "/api/event-bulk-create-jobs": ("event-bulk-create-job", 202, None),
+}
+
+
+def _error(status: int, code: str, detail: str) -> Dict[str, Any]:
+    return {"errors": [{"id": uuid4().hex, "status": status, "code": code, "title": detail, "detail": detail}]}
+
+
+class FakeKlaviyo:
+    """ASGI app imitating the subset of the Klaviyo API the backend uses."""
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit: Optional[float] = None,
+        burst: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.burst = burst or (max(1, math.ceil(rate_limit)) if rate_limit else 0)
+        self._rng = random.Random(seed)
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self.requests: Counter = Counter()
+        self.responses: Counter = Counter()
+
+    @classmethod
+    def from_env(cls) -> "FakeKlaviyo":
+        def number(name: str, default: Optional[float]) -> Optional[float]:
+            value = os.getenv(f"FAKE_KLAVIYO_{name}")
+            return float(value) if value else default
+
+        burst = number("BURST", None)
+        seed = number("SEED", None)
+        return cls(
+            latency_ms=number("LATENCY_MS", 0.0),
+            jitter_ms=number("JITTER_MS", 0.0),
+            error_rate=number("ERROR_RATE", 0.0),
+            rate_limit=number("RATE_LIMIT", None),
+            burst=int(burst) if burst else None,
+            seed=int(seed) if seed is not None else None,
+        )
+
+    def config(self) -> Dict[str, Any]:
+        return {
+            "latencyMs": self.latency_ms,
+            "jitterMs": self.jitter_ms,
+            "errorRate": self.error_rate,
+            "rateLimit": self.rate_limit,
+            "burst": self.burst,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": dict(self.requests),
+            "responses": {f"{path} {status}": n for (path, status), n in sorted(self.responses.items())},
+        }
+
+    def _take_token(self) -> float:
+        """0 if the request may proceed, else seconds until a token is available."""
+        if not self.rate_limit:
+            return 0.0
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate_limit)
+        self._refilled = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate_limit
+
+    async def _delay(self) -> None:
+        if self.latency_ms or self.jitter_ms:
+            delay_ms = self._rng.gauss(self.latency_ms, self.jitter_ms) if self.jitter_ms else self.latency_ms
+            await asyncio.sleep(max(0.0, delay_ms) / 1000)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        path = scope["path"]
+        if scope["method"] == "GET" and path == "/_stats":
+            await _respond(send, 200, self.stats())
+            return
+        self.requests[path] += 1
+        status, payload, headers = await self._handle(scope, path, body)
+        self.responses[(path, status)] += 1
+        await _respond(send, status, payload, headers)
+
+    async def _handle(self, scope, path: str, body: bytes):
+        if scope["method"] != "POST" or path not in ENDPOINTS:
+            return 404, _error(404, "not_found", "Not found."), []
+        headers = {k.decode().lower(): v.decode() for k, v in scope["headers"]}
+        if not headers.get("authorization", "").startswith("Klaviyo-API-Key "):
+            return 401, _error(401, "not_authenticated", "Authentication credentials were not provided."), []
+        if "revision" not in headers:
+            return 400, _error(400, "invalid", "Missing revision header."), []
+
+        retry_after = self._take_token()
+        if retry_after:
+            wait = math.ceil(retry_after)
+            detail = f"Request was throttled. Expected available in {wait} second{'s' if wait != 1 else ''}."
+            return 429, _error(429, "throttled", detail), [(b"retry-after", str(wait).encode())]
+
+        await self._delay()
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return 500, _error(500, "error", "A server error occurred."), []
+
+        expected_type, status, resource = ENDPOINTS[path]
+        try:
+            data_type = json.loads(body)["data"]["type"]
+        except (ValueError, KeyError, TypeError):
+            data_type = None
+        if data_type != expected_type:
+            return 400, _error(400, "invalid", f"Expected data.type '{expected_type}'."), []
+        return status, {"data": {"type": resource, "id": uuid4().hex}} if resource else None, []
+
+
+async def _respond(send, status: int, payload, extra_headers=()) -> None:
+    body = json.dumps(payload).encode() if payload is not None else b""
+    headers = [(b"content-type", b"application/vnd.api+json")] if body else []
+    headers.extend(extra_headers)
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+app = FakeKlaviyo.from_env()
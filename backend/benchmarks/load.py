@@ -0,0 +1,272 @@
+"""
+Load benchmarks: realistic request mixes against the app, in-process.
+
+The ASGI app runs in this process against an in-memory MongoDB stand-in
+(mongomock-motor) and a fake Klaviyo server (see `benchmarks.fake_klaviyo`)
+listening on loopback, so no database or Klaviyo key is needed. Each
+scenario runs a fixed number of requests from `--concurrency` simulated
+clients following a weighted endpoint mix; requests are chosen from a
+seeded RNG so runs are repeatable.
+
+Latency is measured until the response is complete (background tasks such
+as Klaviyo calls run afterwards, as they do in production). Results are
+written as JSON; pass `--compare` with an earlier results file to print
+throughput and p99 deltas per endpoint.
+
+The startup warm-up tasks in `app.main.lifespan` are not run (mongomock has
+no change streams or server pings); only the deal event flusher is started.
+
+Usage:
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.load [--scenario browse --scenario mixed]
+        [--requests 1000] [--concurrency 32] [--users 200] [--seed 1]
+        [--klaviyo-latency-ms 150 --klaviyo-error-rate 0.05 --klaviyo-rate-limit 10]
+        [--output benchmarks/results/load.json] [--compare OLD.json]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import platform
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+os.environ.setdefault("MONGO_DB", "birdiedeals_bench")
+os.environ.setdefault("KLAVIYO_API_KEY", "benchmark-key")
+
+from .asgi import latency_summary, request, wait_pending  # noqa: E402
+from .fake_klaviyo import FakeKlaviyo  # noqa: E402
+from .report import change, git_commit, load_results, write_results  # noqa: E402
+from .synthetic import golfer_profile  # noqa: E402
+
+PASSWORD = "BenchPassword123!"
+
+# Scenario -> {endpoint: weight}
+SCENARIOS: Dict[str, Dict[str, int]] = {
+    "browse": {"featured": 1},
+    "login_storm": {"login": 1},
+    "suggested": {"suggested": 1},
+    "click_burst": {"redirect": 7, "events": 3},
+    "mixed": {"featured": 40, "suggested": 25, "events": 15, "redirect": 10, "me": 5, "login": 5},
+}
+
+async def seed_users(db, count: int, rng: random.Random) -> List[Dict[str, str]]:
+    """Insert `count` users sharing one password; returns their ids, emails and tokens."""
+    from app.auth import create_access_token, hash_password
+
+    password_hash = hash_password(PASSWORD)
+    docs = [
+        {
+            "_id": str(uuid4()),
+            "username": f"bench_{i}",
+            "email": f"bench_{i}@example.com",
+            "password_hash": password_hash,
+            "profile": golfer_profile(rng),
+        }
+        for i in range(count)
+    ]
+    await db.users.insert_many(docs)
+    return [{"id": d["_id"], "email": d["email"], "token": create_access_token(subject=d["_id"])} for d in docs]
+
+
+def _requests(users: List[Dict[str, str]], deal_ids: List[str]) -> Dict[str, Callable]:
+    """Endpoint name -> fn(rng) returning request() arguments."""
+    from app.auth import create_click_token
+
+    click_tokens = {u["id"]: create_click_token(u["id"]) for u in users}
+
+    def featured(rng):
+        return ("GET", "/api/deals/featured", {})
+
+    def suggested(rng):
+        return ("GET", "/api/deals/suggested", {"token": rng.choice(users)["token"]})
+
+    def me(rng):
+        return ("GET", "/api/me", {"token": rng.choice(users)["token"]})
+
+    def login(rng):
+        return ("POST", "/api/auth/login", {"json_body": {"email": rng.choice(users)["email"], "password": PASSWORD}})
+
+    def redirect(rng):
+        user = rng.choice(users)
+        return ("GET", f"/r/{rng.choice(deal_ids)}", {"query": f"t={click_tokens[user['id']]}".encode()})
+
+    def events(rng):
+        deals = rng.sample(deal_ids, 8)
+        batch = [{"type": "impression", "dealId": d, "eventId": uuid4().hex} for d in deals]
+        batch.append({"type": rng.choice(["view", "click"]), "dealId": deals[0], "eventId": uuid4().hex})
+        return ("POST", "/api/deals/events", {"token": rng.choice(users)["token"], "json_body": {"events": batch}})
+
+    return {
+        "featured": featured, "suggested": suggested, "me": me,
+        "login": login, "redirect": redirect, "events": events,
+    }
+
+
+async def run_scenario(
+    app,
+    mix: Dict[str, int],
+    builders: Dict[str, Callable],
+    requests: int,
+    concurrency: int,
+    seed: int,
+) -> Dict[str, Any]:
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    rng = random.Random(seed)
+    plan: List[Tuple[str, Tuple]] = []
+    for name in rng.choices(names, weights, k=requests):
+        plan.append((name, builders[name](rng)))
+
+    timings: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    next_index = 0
+
+    async def client():
+        nonlocal next_index
+        while next_index < len(plan):
+            name, (method, path, kwargs) = plan[next_index]
+            next_index += 1
+            status, elapsed = await request(app, method, path, **kwargs)
+            timings[name].append(elapsed)
+            if status >= 400:
+                errors[name] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+    await wait_pending()
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(requests / duration, 1),
+        "endpoints": {
+            name: {
+                "count": len(values),
+                "errors": errors[name],
+                "throughput_rps": round(len(values) / duration, 1),
+                **latency_summary(values),
+            }
+            for name, values in sorted(timings.items())
+        },
+    }
+
+
+async def run(
+    scenarios: List[str],
+    requests: int,
+    concurrency: int,
+    users: int,
+    seed: int,
+    fake: Optional[FakeKlaviyo] = None,
+) -> Dict[str, Any]:
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        raise SystemExit("mongomock-motor is required: pip install -r benchmarks/requirements.txt")
+    import uvicorn
+
+    from app import db as app_db
+    from app.deal_events import run_event_flusher
+    from app.deals_data import get_featured_deals
+    from app.config import settings
+    from app.main import app
+
+    logging.disable(logging.WARNING)
+    app_db._client = AsyncMongoMockClient()
+    db = app_db.get_db()
+
+    fake = fake or FakeKlaviyo()
+    server = uvicorn.Server(uvicorn.Config(fake, host="127.0.0.1", port=0, log_level="error", lifespan="off"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    settings.KLAVIYO_BASE_URL = f"http://127.0.0.1:{port}"
+    flusher = asyncio.create_task(run_event_flusher(db))
+
+    rng = random.Random(seed)
+    seeded = await seed_users(db, users, rng)
+    builders = _requests(seeded, [d.id for d in get_featured_deals()])
+
+    results = {}
+    try:
+        for name in scenarios:
+            # Warm-up pass (not recorded) so imports and caches don't skew the first scenario
+            await run_scenario(app, SCENARIOS[name], builders, min(200, requests), concurrency, seed)
+            results[name] = await run_scenario(app, SCENARIOS[name], builders, requests, concurrency, seed)
+    finally:
+        flusher.cancel()
+        server.should_exit = True
+        await server_task
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "users": users,
+            "seed": seed,
+            "klaviyo": {**fake.config(), **fake.stats()},
+            "mongoStandIn": "mongomock-motor",
+            "mixes": {name: SCENARIOS[name] for name in scenarios},
+        },
+        "scenarios": results,
+    }
+
+
+def print_results(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    for name, scenario in results["scenarios"].items():
+        print(f"\n{name}: {scenario['throughput_rps']} req/s "
+              f"({scenario['requests']} requests, concurrency {scenario['concurrency']})")
+        print(f"  {'endpoint':<10} {'count':>6} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        base = (baseline or {}).get("scenarios", {}).get(name, {}).get("endpoints", {})
+        for endpoint, stats in scenario["endpoints"].items():
+            line = (f"  {endpoint:<10} {stats['count']:>6} {stats['errors']:>6} {stats['throughput_rps']:>8} "
+                    f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}")
+            if endpoint in base:
+                line += f"  p99 {change(stats['p99_ms'], base[endpoint]['p99_ms'])} vs {baseline['meta'].get('commit')}"
+            print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run in-process load benchmarks against the API.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable; default: all)")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32, help="simulated concurrent clients")
+    parser.add_argument("--users", type=int, default=200, help="users to seed")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--klaviyo-latency-ms", type=float, default=0.0, help="fake Klaviyo response delay")
+    parser.add_argument("--klaviyo-error-rate", type=float, default=0.0, help="share of fake Klaviyo 500s")
+    parser.add_argument("--klaviyo-rate-limit", type=float, help="fake Klaviyo requests/second before 429s")
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/load-<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    scenarios = args.scenario or list(SCENARIOS)
+    fake = FakeKlaviyo(
+        latency_ms=args.klaviyo_latency_ms,
+        jitter_ms=args.klaviyo_latency_ms / 4,
+        error_rate=args.klaviyo_error_rate,
+        rate_limit=args.klaviyo_rate_limit,
+        seed=args.seed,
+    )
+    results = asyncio.run(run(scenarios, args.requests, args.concurrency, args.users, args.seed, fake))
+
+    print_results(results, load_results(args.compare))
+    write_results("load", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Micro-benchmarks for the recommendation and risk functions.
+
+Measures `compute_wedge_wear_risk`, `compute_gapping_risk` and
+`build_klaviyo_profile_properties` per profile shape (bag sizes, missing
+fields), and `_suggest_deals` (with and without co-occurrence history) plus
+rule compilation per synthetic catalog size, so scaling with the catalog
+is visible.
+
+Each case reports:
+- ns_per_op: median of `--repeat` timed loops (each auto-sized to ~0.1 s)
+- peak_bytes: peak memory allocated during one call (tracemalloc)
+- alloc_sites: source lines whose allocations are still alive after the
+  call returns (including the returned value)
+
+CPython has no per-call allocation counter, so peak traced memory stands
+in for "allocations per call".
+
+Usage:
+    python -m benchmarks.micro [--sizes 17,1000,100000,1000000] [--repeat 5]
+        [--output benchmarks/results/micro.json] [--compare OLD.json]
+"""
+
+import argparse
+import gc
+import logging
+import os
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+from .report import change, git_commit, load_results, write_results  # noqa: E402
+from .synthetic import deal_catalog, profile_shapes  # noqa: E402
+
+DEFAULT_SIZES = [17, 1_000, 100_000, 1_000_000]
+TARGET_LOOP_SECONDS = 0.1
+HISTORY_USERS = 2_000
+HISTORY_EVENTS_PER_USER = 10
+
+
+def _loop(fn: Callable[[], Any], number: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter_ns() - start) / number
+
+
+def measure(fn: Callable[[], Any], repeat: int = 5) -> Dict[str, Any]:
+    """Time `fn` (ns/op) and trace the memory one call allocates."""
+    fn()  # warm caches (and lazily rebuilt structures)
+    number = 1
+    while True:
+        elapsed = _loop(fn, number) * number
+        if elapsed >= TARGET_LOOP_SECONDS * 1e9 or number >= 1_000_000:
+            break
+        number = max(number * 2, int(number * TARGET_LOOP_SECONDS * 1e9 / max(elapsed, 1)))
+
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        timings = [_loop(fn, number) for _ in range(repeat)]
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        sites = len(tracemalloc.take_snapshot().statistics("lineno"))
+    finally:
+        tracemalloc.stop()
+    del result
+
+    return {
+        "ns_per_op": round(statistics.median(timings)),
+        "min_ns_per_op": round(min(timings)),
+        "loops": number,
+        "peak_bytes": peak - base,
+        "alloc_sites": sites,
+    }
+
+
+@contextmanager
+def use_catalog(deals: List[Any]) -> Iterator[None]:
+    """
+    Temporarily replace the deal catalog.
+
+    The catalog indexes are mutated in place (other modules hold references
+    to them) and the rule engine is rebuilt against the new catalog.
+    """
+    from app import deals_data, rules
+
+    deals_data.load_catalog()  # so the real catalog isn't loaded over the synthetic one
+    saved = (list(deals_data.FEATURED_DEALS), dict(deals_data.DEALS_BY_ID),
+             dict(deals_data.DEALS_BY_CATEGORY), dict(deals_data.DEALS_BY_TAG), rules._engine)
+
+    def install(featured, by_id, by_category, by_tag):
+        deals_data.FEATURED_DEALS[:] = featured
+        for index, values in ((deals_data.DEALS_BY_ID, by_id),
+                              (deals_data.DEALS_BY_CATEGORY, by_category),
+                              (deals_data.DEALS_BY_TAG, by_tag)):
+            index.clear()
+            index.update(values)
+
+    by_category: Dict[str, List[Any]] = {}
+    by_tag: Dict[str, List[Any]] = {}
+    for deal in deals:
+        by_category.setdefault(deal.category, []).append(deal)
+        for tag in deal.tags or []:
+            by_tag.setdefault(tag, []).append(deal)
+    install(deals, {d.id: d for d in deals}, by_category, by_tag)
+    rules._engine = None
+    try:
+        yield
+    finally:
+        install(*saved[:4])
+        rules._engine = saved[4]
+
+
+def _history_model(deal_ids: List[str], seed: int):
+    """A co-occurrence model trained on synthetic views/clicks over `deal_ids`."""
+    from app.cooccurrence import CooccurrenceModel
+
+    rng = random.Random(seed)
+    model = CooccurrenceModel()
+    hot = deal_ids[:500]  # engagement concentrates on a few deals, as in production
+    for user in range(HISTORY_USERS):
+        for _ in range(HISTORY_EVENTS_PER_USER):
+            model.record(f"u{user}", rng.choice(hot), rng.choice(["view", "view", "click"]))
+    model.rebuild_neighbors()
+    return model, rng.sample(hot, 5)
+
+
+def run(sizes: List[int], repeat: int, seed: int) -> Dict[str, Any]:
+    from app.klaviyo import build_klaviyo_profile_properties, compute_gapping_risk, compute_wedge_wear_risk
+    from app.routers import deals_routes
+    from app.rules import get_rule_engine
+
+    logging.disable(logging.WARNING)
+    shapes = profile_shapes(seed)
+    profile_cases: Dict[str, Dict[str, Any]] = {}
+    for shape, profile in shapes.items():
+        profile_cases[shape] = {
+            "compute_wedge_wear_risk": measure(lambda: compute_wedge_wear_risk(profile), repeat),
+            "compute_gapping_risk": measure(lambda: compute_gapping_risk(profile), repeat),
+            "build_klaviyo_profile_properties": measure(lambda: build_klaviyo_profile_properties(profile), repeat),
+        }
+
+    profile = shapes["bag-14"]
+    catalog_cases: Dict[str, Dict[str, Any]] = {}
+    for size in sizes:
+        deals = deal_catalog(size, seed)
+        with use_catalog(deals):
+            start = time.perf_counter_ns()
+            get_rule_engine()
+            compile_ns = time.perf_counter_ns() - start
+
+            model, recent = _history_model([d.id for d in deals], seed)
+            saved_model = deals_routes.cooccurrence_model
+            deals_routes.cooccurrence_model = model
+            try:
+                catalog_cases[str(size)] = {
+                    "rules_compile": {"ns_per_op": compile_ns, "loops": 1},
+                    "_suggest_deals": measure(lambda: deals_routes._suggest_deals(profile), repeat),
+                    "_suggest_deals+history": measure(lambda: deals_routes._suggest_deals(profile, recent), repeat),
+                }
+            finally:
+                deals_routes.cooccurrence_model = saved_model
+        del deals
+        gc.collect()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "profiles": profile_cases,
+        "catalogs": catalog_cases,
+    }
+
+
+def print_results(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    baseline = baseline or {}
+    print(f"  {'case':<34} {'function':<34} {'ns/op':>12} {'peak B':>9} {'sites':>6}")
+    for group, label in (("profiles", "profile"), ("catalogs", "deals")):
+        for case, functions in results[group].items():
+            for fn, stats in functions.items():
+                base = baseline.get(group, {}).get(case, {}).get(fn, {})
+                print(f"  {label + ' ' + case:<34} {fn:<34} {stats['ns_per_op']:>12,} "
+                      f"{stats.get('peak_bytes', ''):>9} {stats.get('alloc_sites', ''):>6} "
+                      f"{change(stats['ns_per_op'], base.get('ns_per_op'))}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmark the recommendation and risk functions.")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated synthetic catalog sizes")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/micro-<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = run([int(s) for s in args.sizes.split(",")], args.repeat, args.seed)
+    print_results(results, load_results(args.compare))
+    write_results("micro", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Latency of GET /r/{deal_id} driven in-process through the ASGI app.
+
+Calls the app directly with a minimal ASGI scope (no HTTP client or socket),
+so the numbers cover routing, token verification, the catalog lookup and
+queueing the click. Target: p99 under 1 ms.
+
+Usage:
+    python -m benchmarks.redirect [--requests 20000]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+from typing import Dict
+from uuid import uuid4
+
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+from .asgi import latency_summary, request  # noqa: E402
+
+
+async def run(requests: int) -> Dict[str, float]:
+    from app.auth import create_click_token
+    from app.deal_events import event_buffer
+    from app.main import app
+
+    # Klaviyo calls are no-ops without an API key; silence their warnings
+    logging.disable(logging.WARNING)
+    query = f"t={create_click_token(str(uuid4()))}".encode()
+    for _ in range(200):  # warm-up
+        await request(app, "GET", "/r/d1", query)
+
+    timings = []
+    for _ in range(requests):
+        status, elapsed = await request(app, "GET", "/r/d1", query)
+        timings.append(elapsed)
+        assert status == 302, status
+        if len(event_buffer) > 10_000:
+            event_buffer.drain(len(event_buffer))
+
+    return {"requests": requests, **latency_summary(timings)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the /r/{deal_id} redirect in-process.")
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.requests))
+    for key, value in result.items():
+        print(f"{key:>8}: {value:.3f}" if isinstance(value, float) else f"{key:>8}: {value}")
+    if result["p99_ms"] >= 1.0:
+        raise SystemExit("p99 is over 1 ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Saving and comparing benchmark results across commits."""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_results(path: Optional[Path]) -> Optional[Dict[str, Any]]:
+    return json.loads(path.read_text()) if path else None
+
+
+def write_results(kind: str, results: Dict[str, Any], output: Optional[Path] = None) -> Path:
+    """Write results as JSON (default: results/<kind>-<commit>.json)."""
+    output = output or RESULTS_DIR / f"{kind}-{results['meta']['commit'] or 'local'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + "\n")
+    print(f"\nResults written to {output}", file=sys.stderr)
+    return output
+
+
+def change(current: float, baseline: Optional[float]) -> str:
+    """Percent change vs baseline, e.g. '+4.2%' ('' without a baseline)."""
+    if not baseline:
+        return ""
+    return f"{(current - baseline) / baseline * 100:+.1f}%"
@@ -0,0 +1,97 @@
+"""Deterministic synthetic golfer profiles and deal catalogs for the benchmarks."""
+
+import random
+from typing import Any, Dict, List, Optional, Sequence
+
+# (name, loft) for a full 14-club bag, longest first
+FULL_BAG = [
+    ("Driver", 10.5), ("3 Wood", 15), ("5 Wood", 18), ("4 Hybrid", 22), ("5 Iron", 27),
+    ("6 Iron", 30), ("7 Iron", 34), ("8 Iron", 38), ("9 Iron", 42), ("PW", 46),
+    ("50° Wedge", 50), ("54° Wedge", 54), ("58° Wedge", 58), ("Putter", 3),
+]
+BRANDS = ["Titleist", "TaylorMade", "Callaway", "Ping", "Cleveland", "Mizuno"]
+BUDGETS = ["Value-First", "Balanced", "Performance-First"]
+PROFILE_FIELDS = [
+    "handicap", "driverCarry", "sevenIronCarry", "roundsPerMonth", "monthsPlayedPerYear",
+    "budgetSensitivity", "willingToBuyUsed", "preferredBrands", "region",
+]
+
+
+def golfer_profile(
+    rng: random.Random,
+    bag_size: Optional[int] = None,
+    with_carries: bool = True,
+    missing: Sequence[str] = (),
+) -> Dict[str, Any]:
+    """
+    A normalized golfer profile.
+
+    `bag_size` clubs are taken from a full bag (random size if None); clubs
+    get a carry distance scaled from the driver carry unless `with_carries`
+    is False (so carries are estimated from loft). Fields in `missing` are
+    left out.
+    """
+    from app.profile_schema import normalize_profile
+
+    driver_carry = rng.randint(180, 290)
+    if bag_size is None:
+        bag_size = rng.randint(0, len(FULL_BAG))
+    clubs = []
+    for name, loft in sorted(rng.sample(FULL_BAG, bag_size), key=lambda c: c[1]):
+        club = {"name": name, "loft": loft, "brand": rng.choice(BRANDS)}
+        if with_carries and name != "Putter":
+            # Roughly 2.6 yards per degree of loft below the driver, with jitter (and gaps)
+            club["carryYards"] = max(40, int(driver_carry - (loft - 10.5) * 2.6 + rng.randint(-8, 8)))
+        clubs.append(club)
+
+    profile = {
+        "handicap": round(rng.uniform(0, 30), 1),
+        "driverCarry": driver_carry,
+        "sevenIronCarry": int(driver_carry * 0.62),
+        "roundsPerMonth": rng.randint(0, 12),
+        "monthsPlayedPerYear": rng.randint(4, 12),
+        "budgetSensitivity": rng.choice(BUDGETS),
+        "willingToBuyUsed": rng.random() < 0.5,
+        "preferredBrands": rng.sample(BRANDS, 2),
+        "region": rng.choice(["Northeast", "Southeast", "Midwest", "West"]),
+        "clubs": clubs,
+    }
+    for field in missing:
+        profile.pop(field, None)
+    return normalize_profile(profile)
+
+
+def profile_shapes(seed: int = 1) -> Dict[str, Dict[str, Any]]:
+    """Named profiles covering bag sizes and missing data."""
+    rng = random.Random(seed)
+    return {
+        "empty": golfer_profile(rng, bag_size=0, missing=PROFILE_FIELDS),
+        "no-bag": golfer_profile(rng, bag_size=0),
+        "bag-7": golfer_profile(rng, bag_size=7),
+        "bag-14": golfer_profile(rng, bag_size=14),
+        "bag-14-lofts-only": golfer_profile(rng, bag_size=14, with_carries=False),
+        "bag-14-missing-fields": golfer_profile(
+            rng, bag_size=14, with_carries=False, missing=["driverCarry", "roundsPerMonth", "budgetSensitivity"],
+        ),
+    }
+
+
+def deal_catalog(size: int, seed: int = 1) -> List[Any]:
+    """
+    `size` deals shaped like the real catalog (same categories and tags).
+
+    Deals are built with `model_construct` (no validation) so a million-deal
+    catalog can be generated in seconds.
+    """
+    from app.deals_data import get_featured_deals
+    from app.models import Deal
+
+    rng = random.Random(seed)
+    templates = [d.model_dump() for d in get_featured_deals()]
+    deals = []
+    for i in range(size):
+        fields = dict(templates[i % len(templates)])
+        fields["id"] = f"s{i}"
+        fields["price"] = round(fields["price"] * rng.uniform(0.7, 1.3), 2)
+        deals.append(Deal.model_construct(**fields))
+    return deals
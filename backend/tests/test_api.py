@@ -6,6 +6,9 @@ These tests verify the REST API endpoints work correctly.
 
 import pytest
 from unittest.mock import patch, AsyncMock
+from uuid import uuid4
+
+from app.config import settings
 
 
 class TestHealthEndpoint:
@@ -14,11 +17,60 @@ class TestHealthEndpoint:
     @pytest.mark.asyncio
     async def test_health_check(self, http_client):
         """Test /health endpoint returns ok."""
-        response = await http_client.get("/health")
+        with patch("app.main.missing_indexes_snapshot", return_value=[]):
+            response = await http_client.get("/health")
         assert response.status_code == 200
         assert response.json() == {"ok": True}
+
+        with patch("app.main.missing_indexes_snapshot", return_value=None):
+            response = await http_client.get("/health")
+        assert response.json() == {"ok": True, "indexes": "unknown"}
         print("✓ Health check endpoint works")
 
+    @pytest.mark.asyncio
+    async def test_health_reports_missing_indexes(self, http_client):
+        """Test /health lists indexes missing at the last check."""
+        with patch("app.main.missing_indexes_snapshot", return_value=["users.email_unique"]):
+            response = await http_client.get("/health")
+        
+        assert response.status_code == 200
+        assert response.json()["missingIndexes"] == ["users.email_unique"]
+        print("✓ Health check reports missing indexes")
+
+    @pytest.mark.asyncio
+    async def test_pool_stats(self, http_client):
+        """Test /health/pool exposes connection pool utilization."""
+        response = await http_client.get("/health/pool")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert {"maxPoolSize", "open", "checkedOut", "waitQueue", "utilization"} <= set(data)
+        print(f"✓ Pool stats: {data}")
+
+    def test_pool_stats_per_server(self):
+        """Test pool counts are kept per server and utilization is per pool."""
+        from types import SimpleNamespace
+        from app.db import PoolStatsListener
+
+        stats = PoolStatsListener()
+        a, b = ("a", 27017), ("b", 27017)
+        for address in (a, b):
+            stats.pool_created(SimpleNamespace(address=address, options={"maxPoolSize": 2}))
+            for _ in range(2):
+                stats.connection_created(SimpleNamespace(address=address))
+                stats.connection_check_out_started(SimpleNamespace(address=address))
+                stats.connection_checked_out(SimpleNamespace(address=address))
+        stats.connection_checked_in(SimpleNamespace(address=b))
+
+        data = stats.snapshot()
+        assert (data["open"], data["checkedOut"], data["waitQueue"]) == (4, 3, 0)
+        assert data["utilization"] == 1.0  # busiest pool, not 3 / 2
+        assert data["pools"]["b:27017"]["utilization"] == 0.5
+
+        stats.pool_closed(SimpleNamespace(address=a))
+        assert stats.checked_out == 1 and stats.open == 2
+        print("✓ Pool stats tracked per server")
+
 
 class TestAuthEndpoints:
     """Test authentication endpoints."""
@@ -153,6 +205,63 @@ class TestUserEndpoints:
                 print("✓ Profile update successful")
 
 
+    @pytest.mark.asyncio
+    async def test_patch_profile(self, http_client, sample_user_data):
+        """Test field-level profile patch."""
+        with patch("app.routers.auth_routes.on_account_created", new_callable=AsyncMock):
+            with patch("app.routers.user_routes.on_bag_updated", new_callable=AsyncMock) as mock_bag:
+                register_response = await http_client.post("/api/auth/register", json=sample_user_data)
+                token = register_response.json()["token"]
+                
+                response = await http_client.patch(
+                    "/api/profile",
+                    headers={"Authorization": f"Bearer {token}"},
+                    json={"ops": [
+                        {"op": "set", "path": "handicap", "value": 9},
+                        {"op": "push_club", "value": {"name": "Putter", "brand": "Odyssey"}},
+                    ]}
+                )
+                
+                assert response.status_code == 200
+                profile = response.json()["user"]["profile"]
+                assert profile["handicap"] == 9
+                assert profile["driverCarry"] == sample_user_data["profile"]["driverCarry"]
+                assert profile["clubs"][-1]["name"] == "Putter"
+                assert mock_bag.call_args.kwargs["changed_fields"] == {"handicap", "clubs"}
+                print("✓ Profile patch successful")
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("clubs, ops", [
+        (True, [{"op": "update_club", "index": 10, "value": {"loft": 56}}]),
+        (False, [{"op": "update_club", "index": 0, "value": {"loft": 56}}]),
+        (True, [{"op": "update_club", "name": "Nope", "value": {"loft": 56}}]),
+        (True, [{"op": "remove_club", "name": "Nope"}]),
+        (True, [{"op": "remove_club", "index": 10}]),
+        # Two update steps: the missing club is caught before the first is written
+        (True, [
+            {"op": "set", "path": "handicap", "value": 3},
+            {"op": "update_club", "index": 10, "value": {"loft": 56}},
+            {"op": "remove_club", "name": "Driver"},
+        ]),
+    ])
+    async def test_patch_missing_club(self, http_client, sample_user_data, clubs, ops):
+        """Addressing a club the profile doesn't have is a 404 and writes nothing."""
+        if not clubs:
+            del sample_user_data["profile"]["clubs"]
+        with patch("app.routers.auth_routes.on_account_created", new_callable=AsyncMock):
+            with patch("app.routers.user_routes.on_bag_updated", new_callable=AsyncMock) as mock_bag:
+                register_response = await http_client.post("/api/auth/register", json=sample_user_data)
+                headers = {"Authorization": f"Bearer {register_response.json()['token']}"}
+
+                response = await http_client.patch("/api/profile", headers=headers, json={"ops": ops})
+                assert response.status_code == 404
+                mock_bag.assert_not_called()
+
+                profile = (await http_client.get("/api/me", headers=headers)).json()["user"]["profile"]
+                assert profile == register_response.json()["user"]["profile"]
+                print(f"✓ Missing club rejected: {response.json()['detail']}")
+
+
 class TestDealsEndpoints:
     """Test deals endpoints."""
 
@@ -217,3 +326,113 @@ class TestDealsEndpoints:
                 data = response.json()
                 assert data["ok"] is True
                 print("✓ Deal click tracking works")
+
+    @pytest.mark.asyncio
+    async def test_track_deal_events_batch(self, http_client, sample_user_data):
+        """Test batched deal event ingestion with dedupe."""
+        with patch("app.routers.auth_routes.on_account_created", new_callable=AsyncMock):
+            with patch("app.routers.deals_routes.on_deal_events", new_callable=AsyncMock) as mock_events:
+                register_response = await http_client.post("/api/auth/register", json=sample_user_data)
+                token = register_response.json()["token"]
+                headers = {"Authorization": f"Bearer {token}"}
+                events = [
+                    {"type": "impression", "dealId": "d1"},
+                    {"type": "impression", "dealId": "d1"},
+                    {"type": "impression", "dealId": "d2"},
+                    {"type": "view", "dealId": "d1", "eventId": "e-1"},
+                    {"type": "click", "dealId": "missing"},
+                ]
+
+                response = await http_client.post("/api/deals/events", headers=headers, json={"events": events})
+                assert response.status_code == 200
+                assert response.json() == {"accepted": 3, "duplicates": 1, "unknownDeals": 1}
+                assert mock_events.call_count == 1
+
+                # A retry of the same client event is dropped
+                retry = await http_client.post("/api/deals/events", headers=headers, json={"events": events[3:4]})
+                assert retry.json()["duplicates"] == 1
+                print("✓ Batched deal events deduped and accepted")
+
+
+class TestRedirect:
+    """Test the affiliate redirect endpoint."""
+
+    @pytest.fixture(autouse=True)
+    def _jwt_secret(self):
+        with patch.object(settings, "JWT_SECRET", "test-secret"):
+            yield
+
+    @pytest.mark.asyncio
+    async def test_redirect_with_click_token(self, http_client):
+        """Test a signed click token redirects and attributes the click."""
+        from app.auth import create_click_token
+        from app.deals_data import get_deal_by_id
+
+        with patch("app.routers.redirect_routes.on_deal_clicked", new_callable=AsyncMock) as mock_clicked:
+            token = create_click_token(str(uuid4()))
+            response = await http_client.get(f"/r/d1?t={token}")
+
+            assert response.status_code == 302
+            assert response.headers["location"] == get_deal_by_id("d1").url
+            assert mock_clicked.call_count == 1
+            print("✓ Redirect with click token")
+
+    @pytest.mark.asyncio
+    async def test_replayed_click_recorded_once(self, http_client):
+        """Test repeat clicks with the same token only redirect after the first."""
+        from app.auth import create_click_token
+
+        with patch("app.routers.redirect_routes.on_deal_clicked", new_callable=AsyncMock) as mock_clicked, \
+                patch("app.routers.redirect_routes.record_interaction") as mock_interaction:
+            token = create_click_token(str(uuid4()))
+            for _ in range(5):
+                assert (await http_client.get(f"/r/d1?t={token}")).status_code == 302
+            assert (await http_client.get(f"/r/d2?t={token}")).status_code == 302
+
+            assert mock_clicked.call_count == 2
+            assert mock_interaction.call_count == 2
+            print("✓ Replayed click deduped")
+
+    @pytest.mark.asyncio
+    async def test_redirect_without_valid_token(self, http_client):
+        """Test missing or tampered tokens still redirect, unattributed."""
+        with patch("app.routers.redirect_routes.on_deal_clicked", new_callable=AsyncMock) as mock_clicked:
+            assert (await http_client.get("/r/d1")).status_code == 302
+            assert (await http_client.get("/r/d1?t=forged.token")).status_code == 302
+            assert mock_clicked.call_count == 0
+            assert (await http_client.get("/r/no-such-deal")).status_code == 404
+            print("✓ Unattributed redirect and unknown deal")
+
+    def test_click_token_round_trip(self):
+        """Test click tokens verify, and reject tampering and expiry."""
+        from app.auth import create_click_token, verify_click_token
+
+        user_id = str(uuid4())
+        token = create_click_token(user_id)
+        assert verify_click_token(token) == user_id
+        assert verify_click_token(create_click_token("legacy-id")) == "legacy-id"
+        assert verify_click_token(token[:-2] + ("AA" if not token.endswith("AA") else "BB")) is None
+        assert verify_click_token(create_click_token(user_id, ttl_seconds=-1)) is None
+        print(f"✓ Click token ({len(token)} chars) verified")
+
+    def test_click_token_key(self):
+        """Test click tokens need JWT_SECRET and aren't signed with it directly."""
+        import base64
+        import hashlib
+        import hmac
+
+        from app.auth import CLICK_TOKEN_SIG_BYTES, create_click_token, verify_click_token
+
+        token = create_click_token(str(uuid4()))
+        payload_part, _ = token.split(".")
+        payload = base64.urlsafe_b64decode(payload_part + "=" * (-len(payload_part) % 4))
+        for key in (b"test-secret", b""):
+            sig = hmac.new(key, payload, hashlib.sha256).digest()[:CLICK_TOKEN_SIG_BYTES]
+            forged = f"{payload_part}.{base64.urlsafe_b64encode(sig).rstrip(b'=').decode()}"
+            assert verify_click_token(forged) is None
+
+        with patch.object(settings, "JWT_SECRET", None):
+            with pytest.raises(RuntimeError):
+                create_click_token(str(uuid4()))
+            assert verify_click_token(token) is None
+        print("✓ Click tokens use a derived key and require JWT_SECRET")
@@ -0,0 +1,71 @@
+"""
+Tests for the bulk user import/export job.
+
+These tests verify record validation and JSONL parsing/serialization
+(no MongoDB required).
+"""
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from app.auth import hash_password
+from app.jobs.bulk_users import InvalidRecord, export_line, iter_records, validate_record
+
+
+class TestBulkUsers:
+    """Test import record validation and export serialization."""
+
+    def test_valid_record(self, sample_profile_with_gap):
+        """Valid records are normalized and keep their plaintext password for hashing."""
+        fields = validate_record({
+            "username": "golfer",
+            "email": "Golfer@Example.com",
+            "password": "password123",
+            "profile": sample_profile_with_gap,
+        })
+
+        assert fields["email"] == "golfer@example.com"
+        assert fields["password"] == "password123"
+        assert "password_hash" not in fields
+        assert fields["profile"]["handicap"] == sample_profile_with_gap["handicap"]
+        print("✓ Valid record normalized")
+
+    def test_existing_password_hash(self):
+        """Records may carry an existing argon2 hash instead of a password."""
+        password_hash = hash_password("password123")
+        fields = validate_record({"username": "golfer", "email": "g@example.com", "password_hash": password_hash})
+
+        assert fields["password_hash"] == password_hash
+        assert "password" not in fields
+        print("✓ Existing hash accepted")
+
+    @pytest.mark.parametrize("record", [
+        "not an object",
+        {"username": "golfer", "email": "not-an-email", "password": "password123"},
+        {"username": "golfer", "email": "g@example.com", "password": "short"},
+        {"username": "golfer", "email": "g@example.com", "password_hash": "plaintext"},
+        {"username": "golfer", "email": "g@example.com", "password": "password123", "profile": {"handicap": "low"}},
+    ])
+    def test_invalid_records(self, record):
+        """Bad emails, passwords, hashes and profiles are rejected."""
+        with pytest.raises(InvalidRecord):
+            validate_record(record)
+        print(f"✓ Rejected: {record}")
+
+    def test_iter_records(self):
+        """Blank lines are skipped and unparseable lines come back raw."""
+        lines = ['{"a": 1}\n', "\n", "{broken\n"]
+
+        assert list(iter_records(lines)) == [(1, {"a": 1}), (3, "{broken")]
+        print("✓ JSONL records parsed")
+
+    def test_export_line(self):
+        """Exported users are one JSON object per line."""
+        now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        line = export_line({"username": "golfer", "email": "g@example.com", "profile": {}, "created_at": now})
+
+        assert line.endswith("\n")
+        assert json.loads(line)["created_at"] == str(now)
+        print("✓ Export line serialized")
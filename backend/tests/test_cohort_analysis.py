@@ -0,0 +1,38 @@
+"""
+Tests for the offline cohort analysis job.
+
+These tests verify the per-batch flag computation and cohort counts
+(no MongoDB required).
+"""
+
+from app.jobs.cohort_analysis import analyze_batch, compute_user_flags
+
+
+class TestCohortAnalysis:
+    """Test per-user flags and aggregated cohort counts."""
+
+    def test_user_flags(self, sample_profile_with_gap):
+        """Flags capture wedge wear and every gap type in the bag."""
+        flags = compute_user_flags(sample_profile_with_gap)
+
+        assert flags["wedgeWearRisk"] == "high"
+        assert flags["hasGap"] is True
+        assert flags["gapTypes"] == ["top-of-bag"]
+        assert flags["gapCount"] == 2
+        print(f"✓ User flags: {flags}")
+
+    def test_batch_counts(self, sample_profile_with_gap, high_frequency_profile):
+        """Cohort counts are aggregated across the batch."""
+        batch = [
+            ("u1", sample_profile_with_gap),
+            ("u2", high_frequency_profile),
+            ("u3", {}),
+        ]
+        results, counts = analyze_batch(batch)
+
+        assert [user_id for user_id, _ in results] == ["u1", "u2", "u3"]
+        assert counts["users"] == 3
+        assert counts["wedgeWearRisk:high"] == 2
+        assert counts["hasGap"] == 1
+        assert counts["gapType:top-of-bag"] == 1
+        print(f"✓ Cohort counts: {dict(counts)}")
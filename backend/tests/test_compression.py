@@ -0,0 +1,184 @@
+"""
+Tests for response compression.
+
+These tests verify Accept-Encoding negotiation, the size/type rules for
+what gets compressed, the precompressed body cache and the middleware's
+handling of streamed responses (no MongoDB required).
+"""
+
+import gzip
+
+import pytest
+
+from app.compression import (
+    ENCODERS,
+    CompressionMiddleware,
+    PrecompressedCache,
+    available_encodings,
+    compressible,
+    negotiate,
+)
+
+JSON_BODY = b'{"imageUrl":"https://images.unsplash.com/photo-1535131749006-b7f58c99034b?w=400"}' * 40
+
+
+def _app(body: bytes, headers=(), chunks: int = 1):
+    """An ASGI app sending `body` (as `chunks` body messages) with `headers`."""
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                        *headers],
+        })
+        size = len(body) // chunks
+        for i in range(chunks):
+            last = i == chunks - 1
+            await send({"type": "http.response.body", "body": body[i * size:None if last else (i + 1) * size],
+                        "more_body": not last})
+    return app
+
+
+async def _call(middleware, accept_encoding: bytes = b"gzip"):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding)]}
+    await middleware(scope, receive, send)
+    headers = {k.decode(): v.decode() for k, v in sent[0]["headers"]}
+    return headers, b"".join(m.get("body", b"") for m in sent[1:]), sent
+
+
+class TestNegotiation:
+    """Test choosing an encoding from Accept-Encoding."""
+
+    def test_preference_order(self):
+        """Ties go to the server's preference; q-values win over it."""
+        assert negotiate("gzip, br, zstd", ("zstd", "br", "gzip")) == "zstd"
+        assert negotiate("gzip;q=1.0, br;q=0.5", ("br", "gzip")) == "gzip"
+        assert negotiate("GZIP", ("gzip",)) == "gzip"
+        print("✓ Preference order and q-values respected")
+
+    def test_refused_and_wildcard(self):
+        """q=0 refuses an encoding; * covers the rest; nothing acceptable means identity."""
+        assert negotiate("br;q=0, *", ("br", "gzip")) == "gzip"
+        assert negotiate("gzip;q=0", ("gzip",)) is None
+        assert negotiate("", ("gzip",)) is None
+        assert negotiate("deflate", ("gzip",)) is None
+        assert negotiate("gzip;q=bogus", ("gzip",)) is None
+        print("✓ Refused and wildcard encodings handled")
+
+    def test_available_encodings(self):
+        """Only installed encoders are offered."""
+        assert available_encodings("snappy, gzip") == ("gzip",)
+        assert available_encodings("") == ()
+        assert set(available_encodings("zstd,br,gzip")) == set(ENCODERS)
+        print(f"✓ Installed encodings: {sorted(ENCODERS)}")
+
+
+class TestCompressible:
+    """Test which responses are worth compressing."""
+
+    def test_rules(self):
+        """Text/JSON responses qualify; encoded, no-transform, 304 and binary responses don't."""
+        json_headers = {b"content-type": b"application/json"}
+        assert compressible(200, json_headers)
+        assert compressible(200, {b"content-type": b"text/plain; version=0.0.4"})
+        assert compressible(200, {b"content-type": b"application/problem+json"})
+        assert not compressible(304, json_headers)
+        assert not compressible(200, {b"content-type": b"image/png"})
+        assert not compressible(200, {**json_headers, b"content-encoding": b"br"})
+        assert not compressible(200, {**json_headers, b"cache-control": b"no-transform"})
+        print("✓ Compressible responses identified")
+
+
+class TestCompressionMiddleware:
+    """Test compressing responses in the middleware."""
+
+    async def test_gzip_round_trip(self):
+        """Bodies are compressed with the right headers and decompress to the original."""
+        headers, body, _ = await _call(CompressionMiddleware(_app(JSON_BODY), minimum_size=1024, encodings=("gzip",)))
+        assert headers["content-encoding"] == "gzip"
+        assert headers["content-length"] == str(len(body))
+        assert headers["vary"] == "Accept-Encoding"
+        assert gzip.decompress(body) == JSON_BODY
+        print(f"✓ gzip: {len(JSON_BODY)} -> {len(body)} bytes")
+
+    async def test_identity_and_small(self):
+        """Clients without a usable encoding and small bodies get the original bytes."""
+        middleware = CompressionMiddleware(_app(JSON_BODY), minimum_size=1024, encodings=("gzip",))
+        headers, body, _ = await _call(middleware, b"identity")
+        assert body == JSON_BODY and "content-encoding" not in headers
+        assert headers["vary"] == "Accept-Encoding"  # the response could have differed
+
+        small = CompressionMiddleware(_app(b'{"ok":true}'), minimum_size=1024, encodings=("gzip",))
+        headers, body, _ = await _call(small)
+        assert body == b'{"ok":true}' and "content-encoding" not in headers and "vary" not in headers
+        print("✓ Identity and small responses unchanged")
+
+    async def test_existing_vary_kept(self):
+        """Accept-Encoding is added to an existing Vary header."""
+        app = _app(JSON_BODY, [(b"vary", b"Origin")])
+        headers, _, _ = await _call(CompressionMiddleware(app, minimum_size=1024, encodings=("gzip",)))
+        assert headers["vary"] == "Origin, Accept-Encoding"
+        print("✓ Vary header merged")
+
+    async def test_streamed_passthrough(self):
+        """Streamed bodies are sent unchanged, message by message."""
+        middleware = CompressionMiddleware(_app(JSON_BODY, chunks=3), minimum_size=1024, encodings=("gzip",))
+        headers, body, sent = await _call(middleware)
+        assert "content-encoding" not in headers
+        assert body == JSON_BODY and len(sent) == 4
+        print("✓ Streamed response passed through")
+
+    async def test_public_responses_cached(self):
+        """Cache-Control: public bodies are compressed once; others every time."""
+        cache = PrecompressedCache(max_entries=2)
+        public = CompressionMiddleware(
+            _app(JSON_BODY, [(b"cache-control", b"public, max-age=300")]), 1024, ("gzip",), cache,
+        )
+        first = await _call(public)
+        second = await _call(public)
+        assert (cache.misses, cache.hits, len(cache)) == (1, 1, 1)
+        assert second[1] == first[1] and gzip.decompress(second[1]) == JSON_BODY
+
+        private = CompressionMiddleware(_app(JSON_BODY), 1024, ("gzip",), cache)
+        await _call(private)
+        assert (cache.misses, cache.hits) == (1, 1)
+        print("✓ Precompressed cache used for public responses only")
+
+    def test_cache_evicts_oldest(self):
+        """The cache keeps at most max_entries bodies."""
+        cache = PrecompressedCache(max_entries=2)
+        for i in range(3):
+            cache.get("gzip", JSON_BODY + str(i).encode())
+        assert len(cache) == 2
+        cache.get("gzip", JSON_BODY + b"0")
+        assert cache.misses == 4
+        print("✓ Oldest cached body evicted")
+
+    @pytest.mark.parametrize("encoding, module", [("br", "brotli"), ("zstd", "zstandard")])
+    async def test_optional_encoders(self, encoding, module):
+        """brotli and zstd are used when their packages are installed."""
+        lib = pytest.importorskip(module)
+        middleware = CompressionMiddleware(_app(JSON_BODY), minimum_size=1024, encodings=(encoding, "gzip"))
+        headers, body, _ = await _call(middleware, f"gzip, {encoding}".encode())
+        assert headers["content-encoding"] == encoding
+        decompressed = lib.decompress(body) if module == "brotli" else lib.ZstdDecompressor().decompress(body)
+        assert decompressed == JSON_BODY
+        print(f"✓ {encoding}: {len(JSON_BODY)} -> {len(body)} bytes")
+
+    async def test_featured_compressed(self, http_client):
+        """Featured deals are sent compressed and cacheable."""
+        response = await http_client.get("/api/deals/featured", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["cache-control"].startswith("public")
+        assert int(response.headers["content-length"]) < len(response.content)
+        assert len(response.json()["deals"]) > 0
+        print(f"✓ Featured deals: {len(response.content)} -> {response.headers['content-length']} bytes")
@@ -0,0 +1,76 @@
+"""
+Tests for item-item collaborative filtering.
+
+These tests verify:
+- Incremental co-occurrence updates and the top-k neighbor table
+- Blending co-occurrence scores into suggested deals
+"""
+
+from unittest.mock import patch
+
+from app.cooccurrence import CooccurrenceModel
+from app.routers.deals_routes import _suggest_deals
+
+
+class TestCooccurrenceModel:
+    """Test the sparse co-occurrence matrix and neighbor lookups."""
+
+    def test_neighbors_from_shared_history(self):
+        """Deals viewed by the same users become neighbors."""
+        model = CooccurrenceModel()
+        for user in ("u1", "u2", "u3"):
+            model.record(user, "d1", "view")
+            model.record(user, "d3", "view")
+        model.record("u4", "d1", "view")
+        model.record("u4", "d7", "view")
+
+        neighbors = model.neighbors("d1")
+        assert [deal_id for deal_id, _ in neighbors] == ["d3", "d7"]
+        assert neighbors[0][1] > neighbors[1][1]
+        print(f"✓ Neighbors of d1: {neighbors}")
+
+    def test_neighbor_table_updates_incrementally(self):
+        """New events refresh only the affected rows."""
+        model = CooccurrenceModel(k=1)
+        model.record("u1", "d1", "view")
+        model.record("u1", "d2", "view")
+        assert model.neighbors("d1")[0][0] == "d2"
+
+        for user in ("u2", "u3"):
+            model.record(user, "d1", "click")
+            model.record(user, "d5", "click")
+        assert model.neighbors("d1")[0][0] == "d5"
+        print("✓ Neighbor table refreshed after new events")
+
+    def test_score_excludes_seeds(self):
+        """Scores are normalized and never include the seed deals."""
+        model = CooccurrenceModel()
+        model.record("u1", "d1", "view")
+        model.record("u1", "d2", "view")
+        model.record("u1", "d3", "view")
+
+        scores = model.score(["d1", "d2"])
+        assert set(scores) == {"d3"}
+        assert scores["d3"] == 1.0
+        print(f"✓ Scores: {scores}")
+
+
+class TestBlendedSuggestions:
+    """Test co-occurrence blending in _suggest_deals."""
+
+    def test_adds_cooccurring_deals(self, high_frequency_profile):
+        """Deals similar golfers engaged with are added to suggestions."""
+        model = CooccurrenceModel()
+        for user in ("u1", "u2"):
+            model.record(user, "d1", "view")
+            model.record(user, "d12", "click")
+
+        with patch("app.routers.deals_routes.cooccurrence_model", model):
+            plain, _, _ = _suggest_deals(high_frequency_profile)
+            blended, _, categories = _suggest_deals(high_frequency_profile, ["d1"])
+
+        assert "d12" not in {d.id for d in plain}
+        extra = next(d for d in blended if d.id == "d12")
+        assert extra.matchReason == "Golfers with similar interests also checked this out"
+        assert "balls" in categories
+        print(f"✓ Co-occurrence added {extra.title} ({extra.matchScore})")
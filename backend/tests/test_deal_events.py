@@ -0,0 +1,195 @@
+"""
+Tests for the local deal event store.
+
+These tests verify the ring buffer, retrying failed flush writes, how a
+flushed batch is grouped into hourly buckets and counter updates, and
+client event handling (no MongoDB required).
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from app.deal_events import (
+    BUCKET_MAX_EVENTS,
+    EventBuffer,
+    RecentKeys,
+    COUNTS_COLLECTION,
+    EVENTS_COLLECTION,
+    build_writes,
+    client_time,
+    event_buffer,
+    flush_events,
+    hour_bucket,
+    run_event_flusher,
+)
+from app.config import settings
+from app.deps import get_current_user_ref
+from app.main import app
+
+
+def _event(deal_id, kind="view", minute=0, user_id="u1"):
+    return {
+        "user_id": user_id,
+        "deal_id": deal_id,
+        "kind": kind,
+        "ts": datetime(2024, 5, 1, 10, minute, tzinfo=timezone.utc),
+    }
+
+
+class _Collection:
+    """Records bulk writes; fails the op indexes in `fail` (or everything with `error`)."""
+
+    def __init__(self, fail=(), error=None):
+        self.fail, self.error, self.calls = set(fail), error, []
+
+    async def bulk_write(self, ops, ordered=True):
+        self.calls.append(list(ops))
+        if self.error is not None:
+            raise self.error
+        failed = [i for i in range(len(ops)) if i in self.fail]
+        if failed:
+            self.fail = set()  # succeeds on retry
+            raise BulkWriteError({"writeErrors": [{"index": i, "code": 2, "errmsg": "x"} for i in failed]})
+
+
+class TestEventBuffer:
+    """Test the bounded in-memory buffer."""
+
+    def test_drops_oldest_when_full(self):
+        """A full buffer drops its oldest events instead of blocking."""
+        buffer = EventBuffer(capacity=3)
+        for i in range(5):
+            buffer.append(_event(f"d{i}"))
+
+        assert len(buffer) == 3
+        assert buffer.dropped == 2
+        assert [e["deal_id"] for e in buffer.drain(10)] == ["d2", "d3", "d4"]
+        print(f"✓ Buffer stats: {buffer.stats()}")
+
+    def test_ready_when_batch_is_full(self):
+        """The flusher is woken once a full batch is waiting."""
+        buffer = EventBuffer(capacity=10)
+        buffer.append(_event("d1"), batch_size=2)
+        assert not buffer.ready.is_set()
+        buffer.append(_event("d2"), batch_size=2)
+        assert buffer.ready.is_set()
+        buffer.drain(10)
+        assert not buffer.ready.is_set()
+        print("✓ Ready signal follows batch size")
+
+
+class TestFlush:
+    """Test retrying failed writes without applying any twice."""
+
+    async def test_only_failed_ops_retried(self):
+        """Committed bucket writes and applied counter updates aren't repeated."""
+        db = {EVENTS_COLLECTION: _Collection(), COUNTS_COLLECTION: _Collection(fail={1})}
+        buffer = EventBuffer()
+        for event in (_event("d1"), _event("d2"), _event("d3")):
+            buffer.append(event)
+
+        assert await flush_events(db, buffer) == 0
+        assert sum(len(ops) for ops in buffer.unwritten.values()) == 1
+        buffer.append(_event("d4"))
+
+        assert await flush_events(db, buffer) == 3
+        assert len(db[EVENTS_COLLECTION].calls) == 1
+        retried = db[COUNTS_COLLECTION].calls[1]
+        assert retried == [db[COUNTS_COLLECTION].calls[0][1]]
+        assert not buffer.unwritten and len(buffer) == 1  # d4 waits for the next flush
+        print(f"✓ Only the failed counter update retried: {buffer.stats()}")
+
+    async def test_flusher_backs_off(self):
+        """Persistent failures are retried with growing delays, then dropped."""
+        db = {name: _Collection(error=AutoReconnect("down")) for name in (EVENTS_COLLECTION, COUNTS_COLLECTION)}
+        buffer = EventBuffer()
+        for i in range(3):
+            buffer.append(_event(f"d{i}"), batch_size=1)
+
+        with patch.object(settings, "EVENT_FLUSH_SECONDS", 0.01):
+            task = asyncio.create_task(run_event_flusher(db, buffer))
+            await asyncio.sleep(0.2)
+            task.cancel()
+        attempts = len(db[EVENTS_COLLECTION].calls)
+        assert 2 <= attempts <= 6  # 20, 40, 80 ms... rather than a hot loop
+        assert not buffer.ready.is_set()
+        print(f"✓ {attempts} flush attempts in 200 ms with backoff")
+
+
+class TestBuildWrites:
+    """Test grouping a batch into bucket and counter updates."""
+
+    def test_one_update_per_deal_hour(self):
+        """Events for the same deal and hour share one bucket and one counter update."""
+        events = [
+            _event("d1", "view", 1),
+            _event("d1", "view", 5, user_id="u2"),
+            _event("d1", "click", 6),
+            _event("d2", "view", 7),
+        ]
+        bucket_ops, counter_ops = build_writes(events)
+
+        assert len(bucket_ops) == 2
+        assert len(counter_ops) == 2
+        d1 = next(op for op in counter_ops if op._filter["_id"].startswith("d1:"))
+        assert d1._doc["$inc"] == {"view": 2, "click": 1}
+        assert d1._doc["$setOnInsert"]["hour"] == hour_bucket(events[0]["ts"])
+        print("✓ Batch grouped per deal-hour")
+
+    def test_large_hour_split_across_buckets(self):
+        """A hot deal's events are split into bucket-sized chunks."""
+        events = [_event("d1", minute=i % 60) for i in range(BUCKET_MAX_EVENTS + 1)]
+        bucket_ops, counter_ops = build_writes(events)
+
+        assert [op._doc["$inc"]["n"] for op in bucket_ops] == [BUCKET_MAX_EVENTS, 1]
+        assert counter_ops[0]._doc["$inc"] == {"view": BUCKET_MAX_EVENTS + 1}
+        print("✓ Hot deal-hour split into buckets")
+
+
+class TestClientEvents:
+    """Test client timestamps and retry dedupe."""
+
+    def test_client_time(self):
+        """Plausible client times are kept; missing or implausible ones use receive time."""
+        now = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+        assert client_time(datetime(2024, 5, 1, 11, 59, tzinfo=timezone.utc), now).minute == 59
+        assert client_time(datetime(2024, 5, 1, 11, 59), now).tzinfo is not None
+        assert client_time(None, now) == now
+        assert client_time(datetime(2024, 5, 1, 13, 0, tzinfo=timezone.utc), now) == now
+        assert client_time(datetime(2024, 4, 1, 12, 0, tzinfo=timezone.utc), now) == now
+        print("✓ Client timestamps clamped")
+
+    async def test_offset_timestamps_bucketed_in_utc(self, http_client):
+        """A +05:30 client time lands in its UTC hour bucket and counter id."""
+        utc_hour = hour_bucket(datetime.now(timezone.utc)) - timedelta(hours=1)
+        local = utc_hour.astimezone(timezone(timedelta(hours=5, minutes=30)))  # hh:30 local
+        app.dependency_overrides[get_current_user_ref] = lambda: {"_id": "tz-user", "email": "tz@example.com"}
+        try:
+            event_buffer.drain(len(event_buffer))
+            response = await http_client.post("/api/deals/events", json={
+                "events": [{"type": "impression", "dealId": "d1", "ts": local.isoformat()}],
+            })
+        finally:
+            app.dependency_overrides.pop(get_current_user_ref)
+        assert response.json()["accepted"] == 1
+
+        event = event_buffer.drain(len(event_buffer))[-1]
+        assert event["ts"] == utc_hour and event["ts"].utcoffset() == timedelta(0)
+        _, counter_ops = build_writes([event])
+        assert counter_ops[0]._filter["_id"] == f"d1:{utc_hour.isoformat()}"
+        assert counter_ops[0]._filter["_id"].endswith(":00:00+00:00")
+        print(f"✓ {local.isoformat()} bucketed at {utc_hour.isoformat()}")
+
+    def test_recent_keys(self):
+        """Recently seen keys are rejected; the oldest are forgotten first."""
+        keys = RecentKeys(capacity=2)
+
+        assert keys.add("a") and keys.add("b")
+        assert not keys.add("a")
+        assert keys.add("c")  # evicts "b"
+        assert keys.add("b")
+        print("✓ Recent keys deduped")
@@ -106,6 +106,59 @@ class TestGappingDetection:
         print(f"✓ Mid-bag gap detected: {result['gapDetails']}")
 
 
+    def test_reports_every_gap_and_overlap(self):
+        """All gaps and overlaps are reported, not just the first one."""
+        profile = {
+            "clubs": [
+                {"name": "Driver", "carryYards": 250},
+                {"name": "3 Wood", "carryYards": 225},
+                {"name": "5 Wood", "carryYards": 222},
+                {"name": "5 Iron", "carryYards": 180},
+                {"name": "PW", "carryYards": 120},
+                {"name": "Putter"},
+            ]
+        }
+        result = compute_gapping_risk(profile)
+
+        assert result["gapType"] == "top-of-bag"
+        assert [(g["upper"], g["lower"]) for g in result["gaps"]] == [
+            ("Driver", "3 Wood"),
+            ("5 Wood", "5 Iron"),
+            ("5 Iron", "PW"),
+        ]
+        assert result["gaps"][2]["gapType"] == "mid-bag"
+        assert result["hasOverlap"] is True
+        assert [(o["upper"], o["lower"]) for o in result["overlaps"]] == [("3 Wood", "5 Wood")]
+        print(f"✓ Found {len(result['gaps'])} gaps and {len(result['overlaps'])} overlap")
+
+    def test_estimates_carry_from_loft_and_anchors(self):
+        """Clubs without carryYards are estimated from loft and carry anchors."""
+        profile = {
+            "driverCarry": 250,
+            "sevenIronCarry": 160,
+            "clubs": [
+                {"name": "Driver", "loft": 10.5},
+                {"name": "7 Iron"},
+                {"name": "Wedge", "loft": 56, "carryYards": 95},
+            ],
+        }
+        result = compute_gapping_risk(profile)
+
+        assert result["estimatedClubs"] == ["Driver", "7 Iron"]
+        carries = {g["upper"]: g["upperCarry"] for g in result["gaps"]}
+        assert carries == {"Driver": 250, "7 Iron": 160}
+        print(f"✓ Estimated carries: {carries}")
+
+    def test_no_anchors_skips_clubs_without_carry(self):
+        """Without anchors, clubs lacking carryYards can't be estimated."""
+        profile = {"clubs": [{"name": "7 Iron", "loft": 31}, {"name": "PW", "carryYards": 110}]}
+        result = compute_gapping_risk(profile)
+
+        assert result["hasGap"] is False
+        assert result["estimatedClubs"] == []
+        print("✓ Clubs without carry or anchors are skipped")
+
+
 class TestBuildProfileProperties:
     """Test Klaviyo profile property building."""
 
@@ -142,6 +195,29 @@ class TestBuildProfileProperties:
         assert props["gap_type"] == "top-of-bag"
         print(f"✓ Gapping info included: {props['gap_type']}")
 
+    def test_partial_properties_for_changed_fields(self, sample_profile_with_gap):
+        """Only properties derived from changed fields are built."""
+        props = build_klaviyo_profile_properties(sample_profile_with_gap, {"handicap"})
+        assert props == {"handicap": 15}
+
+        props = build_klaviyo_profile_properties(sample_profile_with_gap, {"driverCarry"})
+        assert props["driver_carry"] == 230
+        assert props["has_gapping_issue"] is True
+        assert "club_count" not in props
+        print(f"✓ Partial properties: {props}")
+
+    def test_partial_properties_clear_removed_fields(self, sample_profile_with_gap):
+        """Changed fields that are now empty are sent as None so Klaviyo clears them."""
+        profile = {k: v for k, v in sample_profile_with_gap.items() if k not in ("region", "clubs")}
+        props = build_klaviyo_profile_properties(profile, {"region", "clubs"})
+        assert props["region"] is None
+        assert props["club_count"] is None and props["club_types"] is None
+        assert props["has_gapping_issue"] is False and props["gap_type"] is None
+        assert "handicap" not in props
+
+        assert None not in build_klaviyo_profile_properties(profile).values()
+        print(f"✓ Removed fields cleared: {props}")
+
 
 class TestKlaviyoAPICalls:
     """Test Klaviyo API integration (mocked)."""
@@ -152,12 +228,12 @@ class TestKlaviyoAPICalls:
         with patch("app.klaviyo.settings") as mock_settings:
             mock_settings.KLAVIYO_API_KEY = "test-api-key"
             
-            with patch("httpx.AsyncClient") as mock_client:
+            with patch("app.klaviyo.get_client") as mock_client:
                 mock_response = MagicMock()
                 mock_response.status_code = 201
                 mock_response.json.return_value = {"data": {"id": "klaviyo-profile-123"}}
                 
-                mock_client.return_value.__aenter__.return_value.post = AsyncMock(return_value=mock_response)
+                mock_client.return_value.post = AsyncMock(return_value=mock_response)
                 
                 result = await upsert_profile(
                     user_id="user-123",
@@ -175,11 +251,11 @@ class TestKlaviyoAPICalls:
         with patch("app.klaviyo.settings") as mock_settings:
             mock_settings.KLAVIYO_API_KEY = "test-api-key"
             
-            with patch("httpx.AsyncClient") as mock_client:
+            with patch("app.klaviyo.get_client") as mock_client:
                 mock_response = MagicMock()
                 mock_response.status_code = 202
                 
-                mock_client.return_value.__aenter__.return_value.post = AsyncMock(return_value=mock_response)
+                mock_client.return_value.post = AsyncMock(return_value=mock_response)
                 
                 result = await track_event(
                     event_name="Account Created",
@@ -191,6 +267,38 @@ class TestKlaviyoAPICalls:
                 assert result is True
                 print("✓ Event tracking successful")
 
+    @pytest.mark.asyncio
+    async def test_base_url_setting(self):
+        """Requests go to KLAVIYO_BASE_URL (e.g. a local stand-in)."""
+        with patch("app.klaviyo.settings") as mock_settings:
+            mock_settings.KLAVIYO_API_KEY = "test-api-key"
+            mock_settings.KLAVIYO_BASE_URL = "http://127.0.0.1:8010"
+
+            with patch("app.klaviyo.get_client") as mock_client:
+                mock_response = MagicMock()
+                mock_response.status_code = 202
+                post = AsyncMock(return_value=mock_response)
+                mock_client.return_value.post = post
+
+                await track_event("Deal Clicked", "user-123", None)
+
+                assert post.call_args.args[0] == "http://127.0.0.1:8010/api/events"
+                print("✓ Base URL setting used")
+
+    @pytest.mark.asyncio
+    async def test_shared_client(self):
+        """One client is created on first use and reused until closed."""
+        from app import klaviyo
+
+        client = klaviyo.get_client()
+        try:
+            assert klaviyo.get_client() is client
+        finally:
+            await klaviyo.close_client()
+        assert client.is_closed
+        assert klaviyo._client is None
+        print("✓ Klaviyo client shared and closed")
+
     @pytest.mark.asyncio
     async def test_no_api_key_skips_calls(self):
         """Test that missing API key gracefully skips Klaviyo calls."""
@@ -0,0 +1,64 @@
+"""
+Tests for the logging setup.
+
+These tests verify JSON-lines formatting, sampling of high-frequency
+messages and that queued records are formatted lazily.
+"""
+
+import json
+import logging
+import queue
+
+from app.logging_setup import JsonFormatter, LazyQueueHandler, SampleFilter
+
+
+def _record(msg, *args, **extra):
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, msg, args, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+class TestJsonFormatter:
+    """Test the JSON-lines output."""
+
+    def test_fields_and_extra(self):
+        """Message args are interpolated and `extra` fields become keys."""
+        line = JsonFormatter().format(_record("Flushed %d events", 3, user_id="u1"))
+        entry = json.loads(line)
+
+        assert entry["msg"] == "Flushed 3 events"
+        assert entry["level"] == "INFO"
+        assert entry["logger"] == "app.test"
+        assert entry["user_id"] == "u1"
+        assert "args" not in entry
+        print(f"✓ JSON line: {line}")
+
+
+class TestSampleFilter:
+    """Test sampling of high-frequency messages."""
+
+    def test_keeps_one_in_n(self):
+        """Sampled records pass once per N per template; others always pass."""
+        sample_filter = SampleFilter()
+        kept = [sample_filter.filter(_record("Event %s", i, sample=10)) for i in range(25)]
+
+        assert sum(kept) == 3
+        assert kept[0] and kept[10] and kept[20]
+        assert all(sample_filter.filter(_record("Unsampled")) for _ in range(5))
+        print("✓ 1 in 10 kept")
+
+
+class TestLazyQueueHandler:
+    """Test that enqueueing doesn't format."""
+
+    def test_record_enqueued_unformatted(self):
+        """The caller only enqueues; args are formatted by the listener."""
+        q = queue.SimpleQueue()
+        handler = LazyQueueHandler(q)
+        handler.handle(_record("Clubs %s", ["Driver", "7 Iron"]))
+        record = q.get_nowait()
+
+        assert record.args == (["Driver", "7 Iron"],)
+        assert record.getMessage() == "Clubs ['Driver', '7 Iron']"
+        print("✓ Record enqueued unformatted")
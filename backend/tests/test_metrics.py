@@ -0,0 +1,54 @@
+"""
+Tests for the metrics subsystem.
+
+These tests verify histogram/counter recording, the Prometheus text
+rendering and per-route recording by the middleware.
+"""
+
+from app.metrics import Counter, Histogram
+
+
+class TestMetricTypes:
+    """Test recording and rendering."""
+
+    def test_histogram_buckets(self):
+        """Observations land in cumulative `le` buckets with sum and count."""
+        hist = Histogram("test_seconds", "Test.", ["route"], buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            hist.observe(value, "/a")
+        text = "\n".join(hist.render())
+
+        assert 'test_seconds_bucket{route="/a",le="0.1"} 2' in text
+        assert 'test_seconds_bucket{route="/a",le="1"} 3' in text
+        assert 'test_seconds_bucket{route="/a",le="+Inf"} 4' in text
+        assert 'test_seconds_count{route="/a"} 4' in text
+        assert "# TYPE test_seconds histogram" in text
+        print("✓ Histogram rendered")
+
+    def test_counter_labels_escaped(self):
+        """Label values are escaped in the text format."""
+        counter = Counter("test_total", "Test.", ["path"])
+        counter.inc('a"b')
+        counter.inc('a"b')
+
+        assert 'test_total{path="a\\"b"} 2' in counter.render()
+        print("✓ Counter rendered")
+
+
+class TestMetricsEndpoint:
+    """Test middleware recording and the /metrics endpoint."""
+
+    async def test_route_latency_recorded(self, http_client):
+        """Requests are recorded by route template and status."""
+        from app.metrics import HTTP_REQUESTS
+
+        before = HTTP_REQUESTS.value("GET", "/api/deals/featured", "200")
+        await http_client.get("/api/deals/featured")
+        assert HTTP_REQUESTS.value("GET", "/api/deals/featured", "200") == before + 1
+
+        response = await http_client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'http_request_duration_seconds_count{method="GET",route="/api/deals/featured"}' in response.text
+        assert "deal_event_buffer_pending" in response.text
+        print("✓ /metrics exports route latency")
@@ -7,6 +7,7 @@ These tests verify:
 - Data persistence
 """
 
+import asyncio
 import pytest
 from uuid import uuid4
 from datetime import datetime, timezone
@@ -110,6 +111,30 @@ class TestProfileOperations:
         assert len(user["profile"]["clubs"]) == len(new_profile["clubs"])
         print(f"✓ Profile updated: handicap {new_profile['handicap']}, {len(new_profile['clubs'])} clubs")
 
+    @pytest.mark.asyncio
+    async def test_update_profile_single_round_trip(self, test_db, sample_user_data):
+        """Test the repository returns the updated public fields without the hash."""
+        from app import users_repo
+
+        user_id = str(uuid4())
+        await test_db.users.insert_one({
+            "_id": user_id,
+            "username": sample_user_data["username"],
+            "email": sample_user_data["email"],
+            "password_hash": hash_password(sample_user_data["password"]),
+            "profile": {"handicap": 20},
+        })
+
+        updated = await users_repo.update_profile(
+            test_db, user_id, {"handicap": 9}, datetime.now(timezone.utc)
+        )
+
+        assert updated["profile"] == {"handicap": 9}
+        assert "password_hash" not in updated
+        ref = await users_repo.find_by_id(test_db, user_id, users_repo.REF_PROJECTION)
+        assert set(ref) == {"_id", "email"}
+        print("✓ Profile updated and returned in one round trip")
+
     @pytest.mark.asyncio
     async def test_add_club_to_bag(self, test_db, sample_user_data):
         """Test adding a new club to user's bag."""
@@ -219,3 +244,83 @@ class TestClubDataStructure:
         
         assert len(users) >= 1
         print(f"✓ Found {len(users)} user(s) with TaylorMade clubs")
+
+
+class TestIndexes:
+    """Test index bootstrap."""
+
+    @pytest.mark.asyncio
+    async def test_ensure_indexes(self, test_db):
+        """Test all expected indexes are created and email is unique."""
+        from pymongo.errors import DuplicateKeyError
+        from app.indexes import ensure_indexes, find_missing_indexes
+
+        missing = await ensure_indexes(test_db)
+        assert missing == []
+        assert await find_missing_indexes(test_db) == []
+
+        email = f"unique_{uuid4().hex[:8]}@test.com"
+        await test_db.users.insert_one({"_id": str(uuid4()), "email": email})
+        with pytest.raises(DuplicateKeyError):
+            await test_db.users.insert_one({"_id": str(uuid4()), "email": email})
+        print("✓ Indexes created; duplicate email rejected")
+
+    @pytest.mark.asyncio
+    async def test_checks_retry_when_unreachable(self):
+        """An unreachable database reports unknown and is retried with backoff."""
+        from unittest.mock import AsyncMock, patch
+        from pymongo.errors import ServerSelectionTimeoutError
+        from app import indexes
+
+        delays = []
+
+        async def sleep(seconds):
+            delays.append(seconds)
+            if len(delays) == 4:
+                raise asyncio.CancelledError
+
+        ensure = AsyncMock(side_effect=[ServerSelectionTimeoutError("down"), ServerSelectionTimeoutError("down"), []])
+        find = AsyncMock(side_effect=ServerSelectionTimeoutError("down"))
+        with patch.object(indexes, "_missing", []), \
+                patch.object(indexes, "ensure_indexes", ensure), \
+                patch.object(indexes, "find_missing_indexes", find), \
+                patch("app.indexes.asyncio.sleep", sleep):
+            with pytest.raises(asyncio.CancelledError):
+                await indexes.run_index_checks(object())
+            assert indexes.missing_indexes_snapshot() is None
+
+        retry = indexes.INDEX_RETRY_SECONDS
+        assert delays == [retry, retry * 2, indexes.INDEX_CHECK_SECONDS, retry]
+        assert ensure.await_count == 3 and find.await_count == 1
+        print("✓ Failed index checks report unknown and retry")
+
+
+class TestDealEvents:
+    """Test flushing buffered deal events and reading the counters."""
+
+    @pytest.mark.asyncio
+    async def test_flush_and_counts(self, test_db):
+        """Flushed events land in hour buckets and pre-aggregated counters."""
+        from datetime import timedelta
+        from app.deal_events import (
+            COUNTS_COLLECTION, EVENTS_COLLECTION, EventBuffer, deal_counts, flush_events, load_events, record_event,
+        )
+
+        buffer = EventBuffer(capacity=100)
+        now = datetime.now(timezone.utc)
+        deal_id = f"deal_{uuid4().hex[:8]}"
+        for user in ("u1", "u2", "u3", "u4"):
+            record_event(user, deal_id, "view", now, buffer=buffer)
+        record_event("u1", deal_id, "click", now, buffer=buffer)
+
+        try:
+            assert await flush_events(test_db, buffer) == 5
+            counts = await deal_counts(test_db, since=now - timedelta(hours=1), deal_ids=[deal_id])
+            assert counts[deal_id] == {"view": 4, "click": 1, "ctr": 0.25}
+
+            events = [e async for e in load_events(test_db, now - timedelta(hours=1)) if e["deal_id"] == deal_id]
+            assert [e["kind"] for e in events] == ["view"] * 4 + ["click"]
+            print(f"✓ Deal counts: {counts[deal_id]}")
+        finally:
+            await test_db[EVENTS_COLLECTION].delete_many({"deal_id": deal_id})
+            await test_db[COUNTS_COLLECTION].delete_many({"deal_id": deal_id})
@@ -0,0 +1,142 @@
+"""
+Tests for field-level profile updates.
+
+These tests verify PATCH operations translate into targeted MongoDB
+updates and report the changed profile fields.
+"""
+
+import pytest
+
+from app.models import ProfileOperation
+from app.profile_patch import ProfilePatchError, build_profile_updates
+
+
+def _ops(*specs):
+    return [ProfileOperation(**spec) for spec in specs]
+
+
+class TestBuildProfileUpdates:
+    """Test operation -> update translation."""
+
+    def test_merges_compatible_ops_into_one_update(self):
+        """Independent fields and pushes share a single update document."""
+        steps, changed = build_profile_updates(_ops(
+            {"op": "set", "path": "handicap", "value": 9.4},
+            {"op": "push_club", "value": {"name": "4 Hybrid", "carryYards": 190}},
+            {"op": "push_club", "value": {"name": "60° Wedge", "carryYards": 70}},
+        ))
+
+        assert steps == [({
+            "$set": {"profile.handicap": 9.4},
+            "$push": {"profile.clubs": {
+                "$each": [
+                    {"name": "4 Hybrid", "carryYards": 190, "usage": "primary"},
+                    {"name": "60° Wedge", "carryYards": 70, "usage": "primary"},
+                ],
+                "$sort": {"carryYards": -1},
+            }},
+        }, {})]
+        assert changed == {"handicap", "clubs"}
+        print("✓ Compatible ops merged into one update")
+
+    def test_update_club_by_name_uses_array_filter(self):
+        """Updating a club by name targets it with an array filter, then re-sorts by carry."""
+        steps, changed = build_profile_updates(_ops(
+            {"op": "update_club", "name": "Driver", "value": {"carryYards": 255}},
+        ))
+
+        assert steps == [
+            (
+                {"$set": {"profile.clubs.$[club].carryYards": 255}},
+                {"array_filters": [{"club.name": "Driver"}], "filter": [{"profile.clubs.name": "Driver"}]},
+            ),
+            ({"$push": {"profile.clubs": {"$each": [], "$sort": {"carryYards": -1}}}}, {}),
+        ]
+        assert changed == {"clubs"}
+        print("✓ Club updated by name")
+
+    def test_update_club_by_index_requires_club(self):
+        """Updating a club by index only applies if the profile has a club there."""
+        steps, _ = build_profile_updates(_ops(
+            {"op": "set", "path": "handicap", "value": 9},
+            {"op": "update_club", "index": 3, "value": {"loft": 56}},
+        ))
+
+        assert steps == [(
+            {"$set": {"profile.handicap": 9, "profile.clubs.3.loft": 56}},
+            {"filter": [{"profile.clubs.3": {"$exists": True}}]},
+        )]
+        print("✓ Club index must exist")
+
+    def test_first_step_checks_every_club(self):
+        """The first step carries all club conditions, so a missing club writes nothing."""
+        steps, _ = build_profile_updates(_ops(
+            {"op": "update_club", "name": "Driver", "value": {"loft": 9}},
+            {"op": "update_club", "index": 4, "value": {"loft": 46}},
+            {"op": "remove_club", "name": "Putter"},
+        ))
+
+        assert len(steps) == 3
+        assert steps[0][1]["filter"] == [
+            {"profile.clubs.name": "Driver"},
+            {"profile.clubs.4": {"$exists": True}},
+            {"profile.clubs.name": "Putter"},
+        ]
+        assert steps[1][1] == {"filter": [{"profile.clubs.4": {"$exists": True}}]}
+        assert steps[2][1] == {"filter": [{"profile.clubs.name": "Putter"}]}
+        print("✓ All club conditions checked before writing")
+
+    @pytest.mark.parametrize("specs", [
+        [{"op": "push_club", "value": {"name": "Putter"}}, {"op": "update_club", "index": 0, "value": {"loft": 3}}],
+        [{"op": "remove_club", "name": "Putter"}, {"op": "remove_club", "index": 1}],
+        [{"op": "push_club", "value": {"name": "Putter"}}, {"op": "remove_club", "name": "Putter"}],
+        [{"op": "update_club", "index": 0, "value": {"name": "Big Stick"}}, {"op": "remove_club", "name": "Driver"}],
+        [{"op": "set", "path": "clubs", "value": []}, {"op": "update_club", "name": "Driver", "value": {"loft": 9}}],
+    ])
+    def test_rejects_clubs_changed_earlier_in_patch(self, specs):
+        """Clubs can't be addressed after an op in the same patch that may add, remove or move them."""
+        with pytest.raises(ProfilePatchError):
+            build_profile_updates(_ops(*specs))
+
+    def test_conflicting_ops_split_into_steps(self):
+        """Ops touching the same array path run as separate updates."""
+        steps, _ = build_profile_updates(_ops(
+            {"op": "update_club", "name": "Driver", "value": {"loft": 9}},
+            {"op": "remove_club", "name": "Putter"},
+            {"op": "push_club", "value": {"name": "Putter", "brand": "Odyssey"}},
+        ))
+
+        assert len(steps) == 3
+        assert steps[1][0] == {"$pull": {"profile.clubs": {"name": "Putter"}}}
+        assert steps[2][0]["$push"]["profile.clubs"]["$each"][0]["name"] == "Putter"
+        print("✓ Conflicting ops split into ordered steps")
+
+    @pytest.mark.parametrize("spec", [
+        {"op": "set", "path": "clubs.0.name", "value": "x"},
+        {"op": "set", "path": "$where", "value": "x"},
+        {"op": "update_club", "value": {"loft": 10}},
+        {"op": "push_club", "value": {"$bad": 1}},
+        {"op": "set", "path": "nickname", "value": "x"},
+        {"op": "set", "path": "handicap", "value": "low"},
+        {"op": "push_club", "value": {"brand": "Ping"}},
+        {"op": "update_club", "index": 0, "value": {"carryYards": "far"}},
+    ])
+    def test_rejects_invalid_ops(self, spec):
+        """Paths are restricted to known profile/club fields and values must validate."""
+        with pytest.raises(ProfilePatchError):
+            build_profile_updates(_ops(spec))
+
+    def test_values_are_normalized(self):
+        """Values are coerced to profile types and unset fields fall back to defaults."""
+        steps, changed = build_profile_updates(_ops(
+            {"op": "set", "path": "driverCarry", "value": "245"},
+            {"op": "unset", "path": "budgetSensitivity"},
+            {"op": "unset", "path": "region"},
+        ))
+
+        assert steps == [({
+            "$set": {"profile.driverCarry": 245, "profile.budgetSensitivity": "Balanced"},
+            "$unset": {"profile.region": ""},
+        }, {})]
+        assert changed == {"driverCarry", "budgetSensitivity", "region"}
+        print("✓ Patch values normalized")
@@ -0,0 +1,81 @@
+"""
+Tests for the normalized golfer profile storage form.
+
+These tests verify write-time normalization and the on-read upgrade of
+profiles stored before schema versioning (no MongoDB required).
+"""
+
+import pytest
+from pydantic import ValidationError
+
+from app.profile_schema import PROFILE_SCHEMA_VERSION, ensure_current, normalize_profile
+
+
+class TestNormalizeProfile:
+    """Test write-time validation and normalization."""
+
+    def test_normalizes_profile(self, sample_user_data):
+        """Numbers are coerced, clubs sorted by carry and the version stamped."""
+        profile = {
+            **sample_user_data["profile"],
+            "driverCarry": "240",
+            "yearsPlaying": 5,
+            "unknownField": "dropped",
+            "region": None,
+            "clubs": [
+                {"name": "Putter"},
+                {"name": "7 Iron", "carryYards": 150},
+                {"name": "Driver", "carryYards": "240"},
+            ],
+        }
+        normalized = normalize_profile(profile)
+
+        assert normalized["driverCarry"] == 240
+        assert normalized["yearsPlaying"] == "5"
+        assert "unknownField" not in normalized
+        assert "region" not in normalized
+        assert [c["name"] for c in normalized["clubs"]] == ["Driver", "7 Iron", "Putter"]
+        assert normalized["budgetSensitivity"] == "Balanced"
+        assert normalized["schemaVersion"] == PROFILE_SCHEMA_VERSION
+        print(f"✓ Normalized profile: {normalized}")
+
+    def test_rejects_invalid_profile(self):
+        """Invalid values fail validation at write time."""
+        with pytest.raises(ValidationError):
+            normalize_profile({"handicap": "scratch"})
+        print("✓ Invalid profile rejected")
+
+
+class TestEnsureCurrent:
+    """Test reading profiles stored before schema versioning."""
+
+    def test_current_profile_returned_as_is(self):
+        """Profiles with the current version skip normalization entirely."""
+        profile = normalize_profile({"handicap": 12})
+
+        assert ensure_current(profile) is profile
+        print("✓ Current profile untouched")
+
+    def test_legacy_profile_repaired(self):
+        """Invalid legacy fields and unnamed clubs are dropped, not fatal."""
+        legacy = {
+            "handicap": "scratch",
+            "roundsPerMonth": 6,
+            "clubs": [{"carryYards": 200}, {"name": "PW", "carryYards": "far"}, {"name": "Driver", "carryYards": 250}],
+        }
+        profile = ensure_current(legacy)
+
+        assert "handicap" not in profile
+        assert profile["roundsPerMonth"] == 6
+        assert profile["clubs"] == [
+            {"name": "Driver", "carryYards": 250, "usage": "primary"},
+            {"name": "PW", "usage": "primary"},
+        ]
+        assert profile["schemaVersion"] == PROFILE_SCHEMA_VERSION
+        assert legacy["handicap"] == "scratch"  # input isn't mutated
+        print(f"✓ Legacy profile repaired: {profile}")
+
+    def test_missing_profile(self):
+        """A missing profile reads as an empty normalized profile."""
+        assert ensure_current(None)["schemaVersion"] == PROFILE_SCHEMA_VERSION
+        print("✓ Missing profile normalized")
@@ -0,0 +1,117 @@
+"""
+Tests for in-worker profiling.
+
+These tests verify the sampling profiler's collapsed stacks, admin
+protection of the debug endpoints and header-triggered cProfile capture
+(no MongoDB required).
+"""
+
+import threading
+import time
+from unittest.mock import patch
+
+from app.profiling import RequestProfiles, RequestProfilerMiddleware, SamplingProfiler, request_profiles
+
+
+def _busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestSamplingProfiler:
+    """Test stack sampling."""
+
+    def test_collapsed_stacks(self):
+        """Running threads are sampled into root-first collapsed stacks."""
+        stop = threading.Event()
+        worker = threading.Thread(target=_busy_loop, args=(stop,))
+        worker.start()
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.start()
+        time.sleep(0.1)
+        profiler.stop()
+        stop.set()
+        worker.join()
+
+        collapsed = profiler.collapsed()
+        busy = [line for line in collapsed.splitlines() if "_busy_loop" in line]
+        assert profiler.samples > 0
+        assert busy
+        stack, count = busy[0].rsplit(" ", 1)
+        assert stack.split(";")[-1].startswith("_busy_loop") and int(count) > 0
+        assert "sampling-profiler" not in collapsed
+        print(f"✓ {profiler.samples} samples, {len(busy)} busy-loop stacks")
+
+
+class TestDebugEndpoints:
+    """Test admin protection of /debug."""
+
+    async def test_requires_admin_token(self, http_client):
+        """Hidden without ADMIN_TOKEN, forbidden with a wrong token."""
+        with patch("app.config.settings.ADMIN_TOKEN", ""):
+            response = await http_client.get("/debug/profile", params={"seconds": 0.01})
+            assert response.status_code == 404
+
+        with patch("app.config.settings.ADMIN_TOKEN", "secret"):
+            response = await http_client.get(
+                "/debug/profile", params={"seconds": 0.01}, headers={"X-Admin-Token": "wrong"},
+            )
+            assert response.status_code == 403
+
+            response = await http_client.get(
+                "/debug/profile", params={"seconds": 0.05}, headers={"X-Admin-Token": "secret"},
+            )
+            assert response.status_code == 200
+            assert int(response.headers["X-Profile-Samples"]) > 0
+        print("✓ Debug endpoints need the admin token")
+
+
+class TestRequestProfiler:
+    """Test header-triggered cProfile capture."""
+
+    async def _call(self, middleware, headers):
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": "/api/deals/suggested", "headers": headers}
+        await middleware(scope, receive, send)
+        return dict(sent[0]["headers"])
+
+    async def test_profiles_with_header_and_token(self):
+        """Only requests with X-Profile: 1 and a valid admin token are profiled."""
+        async def app(scope, receive, send):
+            sum(range(10_000))
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"{}"})
+
+        profiles = RequestProfiles()
+        middleware = RequestProfilerMiddleware(app, profiles=profiles)
+        with patch("app.config.settings.ADMIN_TOKEN", "secret"):
+            headers = await self._call(middleware, [(b"x-profile", b"1")])
+            assert b"x-profile-id" not in headers
+
+            headers = await self._call(middleware, [(b"x-profile", b"1"), (b"x-admin-token", b"secret")])
+        report = profiles.get(headers[b"x-profile-id"].decode())
+
+        assert report.startswith("GET /api/deals/suggested")
+        assert "function calls" in report
+        assert not profiles.active
+        print("✓ cProfile report captured")
+
+    async def test_report_endpoint(self, http_client):
+        """Stored reports are served to admins."""
+        profile_id = request_profiles.add("GET /api/deals/suggested\n\nreport")
+        with patch("app.config.settings.ADMIN_TOKEN", "secret"):
+            response = await http_client.get(
+                f"/debug/profile/requests/{profile_id}", headers={"X-Admin-Token": "secret"},
+            )
+            missing = await http_client.get("/debug/profile/requests/nope", headers={"X-Admin-Token": "secret"})
+
+        assert response.status_code == 200 and response.text.endswith("report")
+        assert missing.status_code == 404
+        print("✓ Report endpoint")
@@ -0,0 +1,81 @@
+"""
+Tests for fast JSON responses.
+
+These tests verify encoding of models, pre-encoded bytes and plain
+payloads (with and without orjson), and that routes returning server-built
+models skip FastAPI's response_model re-validation (no MongoDB required).
+"""
+
+import json
+from unittest.mock import patch
+
+import fastapi.routing
+
+from app.deals_data import get_featured_deals
+from app.models import DealEventsResponse, FeaturedDealsResponse
+from app.responses import FastJSONResponse, encode
+
+
+class TestEncode:
+    """Test what gets encoded and how."""
+
+    def test_model_matches_pydantic(self):
+        """Models encode exactly as model_dump_json()."""
+        model = FeaturedDealsResponse(deals=get_featured_deals())
+        assert encode(model) == model.model_dump_json().encode()
+        print(f"✓ Model encoded: {len(encode(model))} bytes")
+
+    def test_bytes_pass_through(self):
+        """Pre-encoded payloads are sent unchanged."""
+        body = b'{"cached":true}'
+        assert encode(body) is body
+        assert FastJSONResponse(body).body is body
+        print("✓ Bytes passed through")
+
+    def test_plain_payloads(self):
+        """Dicts encode compactly as UTF-8, with or without orjson."""
+        payload = {"ok": True, "name": "Mizuno Pro 225 – irons", 7: [1.5, None]}
+        expected = {"ok": True, "name": "Mizuno Pro 225 – irons", "7": [1.5, None]}
+        assert json.loads(encode(payload)) == expected
+        with patch("app.responses.orjson", None):
+            fallback = encode(payload)
+        assert json.loads(fallback) == expected
+        assert b'"ok":true' in fallback and "–".encode() in fallback
+        print("✓ Plain payloads encoded (orjson and fallback)")
+
+
+class TestFastRoutes:
+    """Test routes using the fast response path."""
+
+    async def test_featured_body_cached(self, http_client):
+        """Featured deals match the response model and are encoded once."""
+        with patch("app.routers.deals_routes.encode", wraps=encode) as encoder:
+            first = await http_client.get("/api/deals/featured")
+            second = await http_client.get("/api/deals/featured")
+        assert first.status_code == 200
+        assert first.headers["content-type"] == "application/json"
+        assert first.json() == FeaturedDealsResponse(deals=get_featured_deals()).model_dump(mode="json")
+        assert second.content == first.content
+        assert encoder.call_count <= 1  # zero if an earlier test already cached it
+        print(f"✓ Featured deals served from cache ({len(first.content)} bytes)")
+
+    async def test_skips_response_model_validation(self, http_client):
+        """Returning FastJSONResponse bypasses serialize_response; plain returns still use it."""
+        with patch("fastapi.routing.serialize_response", wraps=fastapi.routing.serialize_response) as serialize:
+            response = await http_client.get("/api/deals/featured")
+            assert response.status_code == 200
+            assert serialize.call_count == 0
+
+            response = await http_client.get("/health")
+            assert response.json()["ok"] is True
+            assert response.headers["content-type"] == "application/json"
+            assert serialize.call_count == 1
+        print("✓ Server-built models skip re-validation")
+
+    def test_status_and_headers(self):
+        """The response keeps status code and headers."""
+        response = FastJSONResponse(DealEventsResponse(accepted=2), status_code=202, headers={"X-Test": "1"})
+        assert response.status_code == 202
+        assert response.headers["x-test"] == "1"
+        assert json.loads(response.body) == {"accepted": 2, "duplicates": 0, "unknownDeals": 0}
+        print("✓ Status and headers kept")
@@ -0,0 +1,89 @@
+"""
+Tests for the declarative recommendation rule engine.
+
+These tests verify:
+- Condition compilation
+- Rule evaluation against precomputed candidates
+- Hot reload when the rules file changes
+"""
+
+import json
+import os
+
+import pytest
+
+from app.rules import RuleEngine, RuleError, compile_condition
+
+
+def _write_rules(path, rules):
+    path.write_text(json.dumps({"rules": rules}))
+
+
+class TestConditions:
+    """Test condition trees compile into predicates."""
+
+    def test_compiles_nested_conditions(self):
+        """all/any/not and comparison operators combine correctly."""
+        predicate = compile_condition({"all": [
+            {"field": "handicap", "op": "gte", "value": 15},
+            {"any": [
+                {"field": "budget", "op": "contains", "value": "value"},
+                {"not": {"field": "willingToBuyUsed", "op": "eq", "value": False}},
+            ]},
+        ]})
+
+        assert predicate({"handicap": 18, "budget": "value-first"}) is True
+        assert predicate({"handicap": 18, "budget": "balanced", "willingToBuyUsed": False}) is False
+        assert predicate({"handicap": None, "budget": "value-first"}) is False
+        print("✓ Nested conditions compiled")
+
+    def test_unknown_operator_rejected(self):
+        """Unknown operators fail at compile time, not per request."""
+        with pytest.raises(RuleError):
+            compile_condition({"field": "handicap", "op": "approx", "value": 1})
+        print("✓ Unknown operator rejected")
+
+
+class TestRuleEngine:
+    """Test rule evaluation and hot reload."""
+
+    def test_default_rules_match_profile(self, sample_profile_with_gap):
+        """Bundled rules pick wedges, a gap filler and a used driver."""
+        picks, reasons, categories, _ = RuleEngine().evaluate(sample_profile_with_gap)
+
+        assert [p.id for p in picks][:3] == ["d1", "d4", "d2"]
+        assert picks[1].matchReason.startswith("Detected 30 yard gap")
+        assert "gap at the top of your bag" in reasons
+        assert "balls" in categories
+        print(f"✓ Default rules picked {[p.id for p in picks]}")
+
+    def test_unless_picked_skips_rule(self, tmp_path):
+        """A rule is skipped once its category has been picked."""
+        path = tmp_path / "rules.json"
+        _write_rules(path, [
+            {"id": "a", "select": {"categories": ["balls"]}, "score": 0.9, "reason": "first"},
+            {"id": "b", "select": {"categories": ["balls"], "tags": ["3-piece"]},
+             "unlessPicked": "balls", "score": 0.8, "reason": "second"},
+        ])
+        picks, _, _, _ = RuleEngine(path).evaluate({})
+
+        assert [p.matchReason for p in picks] == ["first"]
+        print("✓ unlessPicked prevents duplicate categories")
+
+    def test_hot_reload(self, tmp_path):
+        """Changing the file swaps rules; a broken file keeps the old ones."""
+        path = tmp_path / "rules.json"
+        _write_rules(path, [{"select": {"categories": ["putter"]}, "score": 0.5, "reason": "putter"}])
+        engine = RuleEngine(path)
+        assert engine.evaluate({})[0][0].category == "putter"
+
+        _write_rules(path, [{"select": {"categories": ["apparel"]}, "score": 0.5, "reason": "apparel"}])
+        os.utime(path, (1, 1))
+        engine._next_check = 0
+        assert engine.evaluate({})[0][0].category == "apparel"
+
+        path.write_text("{not json")
+        os.utime(path, (2, 2))
+        engine._next_check = 0
+        assert engine.evaluate({})[0][0].category == "apparel"
+        print("✓ Rules hot-reloaded")
@@ -0,0 +1,122 @@
+"""
+Tests for similar-golfer lookup.
+
+These tests verify:
+- Profile embedding shape and defaults
+- LSH index upsert, re-indexing and nearest-neighbor queries
+- Loading the index without stalling the event loop, and applying
+  changes from other workers
+"""
+
+import asyncio
+
+from app.similarity import (
+    EMBEDDING_DIM,
+    ProfileIndex,
+    embed_profile,
+    load_profile_index,
+    profile_index,
+    refresh_profile,
+)
+
+
+class _Cursor:
+    """Minimal async cursor over in-memory user documents."""
+
+    def __init__(self, docs):
+        self._docs = list(docs)
+
+    async def to_list(self, length):
+        batch, self._docs = self._docs[:length], self._docs[length:]
+        return batch
+
+
+class _Users:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection, batch_size):
+        return _Cursor(self.docs)
+
+
+class _DB:
+    def __init__(self, docs):
+        self.users = _Users(docs)
+
+
+class TestProfileEmbedding:
+    """Test profile -> vector mapping."""
+
+    def test_fixed_dimension(self, sample_user_data):
+        """Every profile maps to the same vector length."""
+        assert len(embed_profile(sample_user_data["profile"])) == EMBEDDING_DIM
+        assert len(embed_profile({})) == EMBEDDING_DIM
+        print(f"✓ Embedding dimension: {EMBEDDING_DIM}")
+
+
+class TestProfileIndex:
+    """Test the random-projection LSH index."""
+
+    def test_finds_near_duplicate_profile(self, sample_user_data, high_frequency_profile):
+        """A near-identical profile is returned as the closest golfer."""
+        profile = sample_user_data["profile"]
+        index = ProfileIndex()
+        index.upsert("same", embed_profile({**profile, "handicap": 13}))
+        index.upsert("other", embed_profile(high_frequency_profile))
+
+        results = index.query(embed_profile(profile), k=2, exclude="me")
+        assert results[0][0] == "same"
+        assert results[0][1] > 0.95
+        print(f"✓ Nearest golfers: {results}")
+
+    def test_upsert_moves_user(self, sample_user_data, high_frequency_profile):
+        """Re-indexing a changed profile replaces the old entry."""
+        index = ProfileIndex()
+        index.upsert("u1", embed_profile(sample_user_data["profile"]))
+        index.upsert("u1", embed_profile(high_frequency_profile))
+
+        assert len(index) == 1
+        results = index.query(embed_profile(high_frequency_profile), k=5)
+        assert results == [("u1", results[0][1])]
+
+        index.remove("u1")
+        assert index.query(embed_profile(high_frequency_profile)) == []
+        print("✓ Upsert and remove keep buckets consistent")
+
+
+class TestIndexMaintenance:
+    """Test loading the index and following other workers' writes."""
+
+    async def test_load_keeps_event_loop_responsive(self, sample_user_data):
+        """Batches are embedded off the event loop, so other tasks run during the load."""
+        docs = [{"_id": f"load-{i}", "profile": {**sample_user_data["profile"], "handicap": i % 30}} for i in range(300)]
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        try:
+            count = await load_profile_index(_DB(docs), batch_size=50)
+        finally:
+            task.cancel()
+        assert count == 300
+        assert ticks >= 6  # at least once per batch
+        assert profile_index.query(embed_profile(docs[0]["profile"]), k=1)
+        for doc in docs:
+            profile_index.remove(doc["_id"])
+        print(f"✓ Loaded {count} profiles; event loop ran {ticks} times meanwhile")
+
+    def test_refresh_profile(self, sample_user_data, high_frequency_profile):
+        """Changes seen on the users change stream re-index or drop the user."""
+        refresh_profile("remote", sample_user_data["profile"])
+        refresh_profile("remote", high_frequency_profile)
+        results = profile_index.query(embed_profile(high_frequency_profile), k=50)
+        assert ("remote", results[0][1]) in results
+
+        refresh_profile("remote", None)
+        assert "remote" not in dict(profile_index.query(embed_profile(high_frequency_profile), k=50))
+        print("✓ Remote profile changes applied to the index")
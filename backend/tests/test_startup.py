@@ -0,0 +1,92 @@
+"""
+Tests for cold start cost.
+
+These tests import the app in a fresh interpreter and check that import
+stays free of side effects and startup work (catalog validation, HTTP
+clients, .env parsing, the logging thread, output), and that the app's own import time stays
+within budget (no MongoDB required).
+"""
+
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# The app's own import time (app.main minus FastAPI itself, which the app
+# can't avoid) as a share of FastAPI's. Measured relative to FastAPI so the
+# budget holds on slow and fast machines: ~0.5 before startup work moved to
+# the lifespan, ~0.45 after; a new heavy eager import (e.g. numpy) blows it.
+OWN_IMPORT_BUDGET = 0.75
+
+# Only needed once the app is serving (Klaviyo calls, span export)
+DEFERRED_MODULES = ["httpx"]
+
+_CHECK = """
+import json, sys
+import app.main
+from app import deals_data, klaviyo, logging_setup
+print(json.dumps({
+    "modules": [m for m in %r if m in sys.modules],
+    "catalog_loaded": deals_data._loaded,
+    "klaviyo_client": klaviyo._client is not None,
+    "logging_listener": logging_setup._listener is not None,
+}))
+"""
+
+
+def _import_times() -> dict:
+    """Cumulative microseconds per top-level import of `import app.main`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)$", line)
+        if match and len(match.group(2)) <= 2:
+            times[match.group(3)] = int(match.group(1))
+    return times
+
+
+class TestColdStart:
+    """Test what importing the app does (and doesn't do)."""
+
+    def test_import_has_no_startup_work(self):
+        """Importing the app doesn't print, build the catalog, create HTTP clients or start logging."""
+        result = subprocess.run(
+            [sys.executable, "-c", _CHECK % DEFERRED_MODULES],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        )
+        lines = result.stdout.strip().splitlines()
+        assert len(lines) == 1, f"unexpected output at import: {lines[:-1]}"
+        state = json.loads(lines[0])
+        assert state == {
+            "modules": [], "catalog_loaded": False, "klaviyo_client": False, "logging_listener": False,
+        }
+        print(f"✓ Import is side-effect free: {state}")
+
+    def test_import_time_budget(self):
+        """The app's own import time stays within budget relative to FastAPI's."""
+        # Best of three; a loaded machine only makes single runs slower
+        shares = []
+        for _ in range(3):
+            times = _import_times()
+            shares.append((times["app.main"] - times["fastapi"]) / times["fastapi"])
+        assert min(shares) < OWN_IMPORT_BUDGET, f"app import cost {min(shares):.2f}x FastAPI's"
+        print(f"✓ App import cost {min(shares):.2f}x FastAPI's (budget {OWN_IMPORT_BUDGET})")
+
+
+class TestLazyCatalog:
+    """Test the catalog is built on first use."""
+
+    def test_accessors_load_catalog(self):
+        """Accessors (and the rule engine) see the validated catalog."""
+        from app.deals_data import FEATURED_DEALS, get_deal_by_id, get_featured_deals, load_catalog
+
+        assert get_deal_by_id("d1").id == "d1"
+        assert get_featured_deals() is FEATURED_DEALS
+        assert len(FEATURED_DEALS) == len(load_catalog())
+        print(f"✓ Catalog loaded on first use: {len(FEATURED_DEALS)} deals")
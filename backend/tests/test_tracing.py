@@ -0,0 +1,129 @@
+"""
+Tests for request tracing.
+
+These tests verify request ids, span parenting across the request,
+MongoDB command spans and the file/OTLP export formats (no MongoDB
+required).
+"""
+
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from app.tracing import MongoCommandTracer, SpanExporter, TracingMiddleware, otlp_payload, span
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+async def _call(middleware, headers=()):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/api/deals/suggested", "headers": list(headers)}
+    await middleware(scope, receive, send)
+    return dict(sent[0]["headers"])
+
+
+class TestTracingMiddleware:
+    """Test request ids and spans per request."""
+
+    async def test_request_id_header(self, http_client):
+        """Every response carries a request id; an incoming traceparent is continued."""
+        response = await http_client.get("/health")
+        assert len(response.headers["X-Request-Id"]) == 32
+
+        response = await http_client.get("/health", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+        assert response.headers["X-Request-Id"] == TRACE_ID
+        print("✓ Request id returned")
+
+    async def test_spans_follow_the_request(self, tmp_path):
+        """Spans opened while handling a request (and after the response) share its trace."""
+        exporter = SpanExporter(path=str(tmp_path / "spans.jsonl"))
+
+        async def app(scope, receive, send):
+            with span("_suggest_deals"):
+                pass
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"{}"})
+            with span("task on_recommendation_generated"):
+                with span("klaviyo POST /api/events", "client"):
+                    pass
+
+        with patch("app.tracing.exporter", exporter):
+            headers = await _call(TracingMiddleware(app, exporter), [(b"traceparent", f"00-{TRACE_ID}-{PARENT_ID}-01".encode())])
+        assert headers[b"x-request-id"] == TRACE_ID.encode()
+        assert await exporter.export() == 4
+
+        spans = {s["name"]: s for s in map(json.loads, (tmp_path / "spans.jsonl").read_text().splitlines())}
+        root = spans["GET /api/deals/suggested"]
+        assert root["parentSpanId"] == PARENT_ID
+        assert root["attributes"]["http.status_code"] == 200
+        assert {s["traceId"] for s in spans.values()} == {TRACE_ID}
+        assert spans["_suggest_deals"]["parentSpanId"] == root["spanId"]
+        task = spans["task on_recommendation_generated"]
+        assert task["parentSpanId"] == root["spanId"]
+        assert spans["klaviyo POST /api/events"]["parentSpanId"] == task["spanId"]
+        print(f"✓ {len(spans)} spans in one trace")
+
+    def test_span_noop_outside_request(self):
+        """Without a traced request, span() does nothing."""
+        with span("anything") as s:
+            assert s is None
+        print("✓ No-op outside requests")
+
+
+class TestMongoCommandTracer:
+    """Test MongoDB command spans."""
+
+    async def test_command_span(self, tmp_path):
+        """A command span is a child of the current span and takes the driver's duration."""
+        exporter = SpanExporter(path=str(tmp_path / "spans.jsonl"))
+        tracer = MongoCommandTracer()
+
+        async def app(scope, receive, send):
+            event = SimpleNamespace(request_id=7, connection_id=("db", 27017), command_name="find",
+                                    database_name="birdiedeals", duration_micros=1500)
+            tracer.started(event)
+            tracer.succeeded(event)
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        with patch("app.tracing.exporter", exporter):
+            await _call(TracingMiddleware(app, exporter))
+        spans = exporter.drain()
+
+        command = next(s for s in spans if s.name == "mongodb find")
+        assert command.parent_id == spans[-1].span_id
+        assert command.end_ns - command.start_ns == 1_500_000
+        assert command.attributes["db.operation"] == "find"
+        print("✓ MongoDB command span recorded")
+
+
+class TestOtlpPayload:
+    """Test the OTLP/HTTP JSON export format."""
+
+    async def test_payload_shape(self):
+        """Spans are grouped under the service resource with typed attributes."""
+        exporter = SpanExporter(path="unused")
+
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 500, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        with patch("app.tracing.exporter", exporter):
+            await _call(TracingMiddleware(app, exporter))
+        payload = otlp_payload(exporter.drain())
+
+        resource_spans = payload["resourceSpans"][0]
+        assert resource_spans["resource"]["attributes"][0]["value"]["stringValue"] == "birdiedeals-api"
+        otlp_span = resource_spans["scopeSpans"][0]["spans"][0]
+        assert otlp_span["kind"] == 2
+        assert {"key": "http.status_code", "value": {"intValue": "500"}} in otlp_span["attributes"]
+        assert "parentSpanId" not in otlp_span
+        print("✓ OTLP payload")
@@ -0,0 +1,176 @@
+"""
+Tests for the per-worker user cache.
+
+These tests verify:
+- LRU/TTL behavior and derived values
+- Read-through puts racing with invalidations
+- Change stream invalidation and change callbacks
+- Polling-based invalidation (requires MongoDB)
+"""
+
+import pytest
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from app.indexes import INDEXES
+from app.user_cache import UserCache, poll_invalidations_once, watch_invalidations
+
+
+class _Stream:
+    """Async context manager/iterator yielding canned change events."""
+
+    def __init__(self, changes):
+        self._changes = iter(changes)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._changes)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class TestUserCache:
+    """Test cache reads, eviction and invalidation."""
+
+    def test_read_through_and_invalidate(self):
+        """Cached users are served until invalidated, with derived data dropped too."""
+        cache = UserCache()
+        cache.put({"_id": "u1", "email": "a@example.com", "profile": {}})
+        calls = []
+        compute = lambda: calls.append(1) or "gap"
+
+        assert cache.get("u1")["email"] == "a@example.com"
+        assert cache.get_derived("u1", "risk", compute) == "gap"
+        assert cache.get_derived("u1", "risk", compute) == "gap"
+        assert len(calls) == 1
+
+        cache.invalidate("u1")
+        assert cache.get("u1") is None
+        assert cache.stats()["invalidations"] == 1
+        print(f"✓ Cache stats: {cache.stats()}")
+
+    def test_lru_and_ttl(self):
+        """Oldest entries are evicted and expired entries are misses."""
+        cache = UserCache(max_entries=2)
+        for user_id in ("u1", "u2", "u3"):
+            cache.put({"_id": user_id})
+        assert cache.get("u1") is None
+        assert cache.get("u3") is not None
+
+        expired = UserCache(ttl_seconds=0)
+        expired.put({"_id": "u1"})
+        assert expired.get("u1") is None
+        print("✓ LRU eviction and TTL expiry")
+
+
+class TestReadThroughRace:
+    """Test read-through puts racing with invalidations."""
+
+    def test_put_skipped_after_invalidation(self):
+        """A document read before an invalidation for that user isn't cached."""
+        cache = UserCache(max_entries=2)
+        mark = cache.mark()
+        cache.invalidate("u1")  # arrives while u1 is being read
+        cache.put({"_id": "u1"}, read_since=mark)
+        cache.put({"_id": "u2"}, read_since=mark)
+        assert cache.get("u1") is None
+        assert cache.get("u2") is not None
+
+        mark = cache.mark()
+        cache.put({"_id": "u1"}, read_since=mark)  # read after the invalidation
+        assert cache.get("u1") is not None
+        print("✓ Stale read-through put skipped")
+
+    def test_forgotten_invalidations_are_conservative(self):
+        """Once older invalidations are forgotten (or the cache cleared), older reads aren't cached."""
+        cache = UserCache(max_entries=2)
+        mark = cache.mark()
+        for user_id in ("u1", "u2", "u3"):  # u1's tick is dropped
+            cache.invalidate(user_id)
+        cache.put({"_id": "u1"}, read_since=mark)
+        assert cache.get("u1") is None
+
+        mark = cache.mark()
+        cache.clear()
+        cache.put({"_id": "u9"}, read_since=mark)
+        assert cache.get("u9") is None
+        print("✓ Unknown invalidation history treated as changed")
+
+
+class TestChangeStream:
+    """Test change stream invalidation."""
+
+    async def test_changes_invalidate_and_notify(self):
+        """Every change invalidates; only profile changes reach on_change, with the stored profile."""
+        changes = [
+            {"documentKey": {"_id": "u1"}, "operationType": "insert", "fullDocument": {"profile": {"handicap": 9}}},
+            {"documentKey": {"_id": "u2"}, "operationType": "update", "profileChanged": True},
+            {"documentKey": {"_id": "u3"}, "operationType": "update", "profileChanged": False},  # e.g. analytics
+            {"documentKey": {"_id": "u4"}, "operationType": "delete"},
+        ]
+        watched = {}
+        lookups = []
+
+        class _Users:
+            def watch(self, pipeline, **options):
+                watched.update(options, pipeline=pipeline)
+                return _Stream(changes)
+
+            async def find_one(self, query, projection):
+                lookups.append(query["_id"])
+                return {"_id": query["_id"], "profile": {"handicap": 4}}
+
+        class _DB:
+            users = _Users()
+
+        cache = UserCache()
+        for user_id in ("u1", "u2", "u3", "u4"):
+            cache.put({"_id": user_id})
+        seen = []
+        await watch_invalidations(_DB(), cache, on_change=lambda user_id, profile: seen.append((user_id, profile)))
+
+        assert len(cache) == 0
+        assert seen == [("u1", {"handicap": 9}), ("u2", {"handicap": 4}), ("u4", None)]
+        assert lookups == ["u2"]
+        assert "full_document" not in watched and "resume_after" not in watched
+        assert "profileChanged" in watched["pipeline"][0]["$project"]
+        print("✓ Change stream invalidated users and reported profile changes")
+
+
+class TestPollingInvalidation:
+    """Test the updated_at polling fallback."""
+
+    def test_poll_query_indexed(self):
+        """Polls use an index on updated_at instead of scanning users."""
+        keys = [dict(model.document["key"]) for model in INDEXES["users"]]
+        assert {"updated_at": 1} in keys
+        print("✓ users.updated_at indexed")
+
+    @pytest.mark.asyncio
+    async def test_poll_invalidates_updated_users(self, test_db):
+        """Users updated after the high-water mark are invalidated."""
+        since = datetime.now(timezone.utc) - timedelta(seconds=5)
+        changed_id, stale_id = str(uuid4()), str(uuid4())
+        await test_db.users.insert_many([
+            {"_id": changed_id, "email": f"{changed_id}@test.com", "updated_at": datetime.now(timezone.utc)},
+            {"_id": stale_id, "email": f"{stale_id}@test.com", "updated_at": since - timedelta(minutes=1)},
+        ])
+        cache = UserCache()
+        cache.put({"_id": changed_id})
+        cache.put({"_id": stale_id})
+
+        newest = await poll_invalidations_once(test_db, cache, since)
+
+        assert cache.get(changed_id) is None
+        assert cache.get(stale_id) is not None
+        assert newest > since
+        print("✓ Polling invalidated the updated user")